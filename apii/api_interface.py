@@ -1,9 +1,15 @@
 from typing import Any, Dict, Optional
 
+from concurrent.futures import ThreadPoolExecutor
+
+import itertools
 import sys
 
 from apii.caller import Caller
+from apii.journal import Journal
+from apii.planner import MachinePlan, NetworkPlan, Planner
 from apii.sdi_calls import SDICalls
+from apii.sdi_map import SDIMap, network_key
 from authorizer.authorizer import Authorizer
 from database.apii_interface import APIIInterface
 from database.db import Database
@@ -20,12 +26,28 @@ class APIInterface:
     The calls themselves are handled by the rest of the subsystem, accessed via the authorizer and sdi_calls objects.
 
     Creates the caller and sdi_calls object to prepare the subsystem for future calls.
+
+    Calls are made by up to workers threads at once. Only the calls run in the worker threads, every database read and
+    write stays on the thread that created the APIInterface, as the database connection is bound to it.
+
+    With a journal, calls recorded by an earlier run are answered from it, so a resumed run rebuilds the same SDI and
+    its ids without making them again.
+
+    Everything built is recorded in an SDIMap. Given the map of an earlier run, update brings that SDI up to date
+    instead of creating a new one, only making the calls for networks, machines and interfaces that are new or changed.
     """
 
-    def __init__(self, authorizer: Authorizer, database: Database) -> None:
-        self.__caller = Caller(authorizer)
-        self.__sdi_calls = SDICalls(self.__caller)
+    def __init__(self, authorizer: Authorizer, database: Database, workers: int = 1, journal: Optional[Journal] = None,
+                 sdi_map: Optional[SDIMap] = None) -> None:
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+
+        self.__workers = workers
+        self.__sdi_map = sdi_map or SDIMap()
+        self.__caller = Caller(authorizer, workers)
+        self.__sdi_calls = SDICalls(self.__caller, journal)
         self.__database = APIIInterface(database)
+        self.__planner = Planner(self.__database)
 
     def __make_call(self, api_call: str, args: Dict[str, Any] = {}) -> Optional[Any]:
         """
@@ -55,86 +77,173 @@ class APIInterface:
                 sdi_num += 1  # Ensures no two SDIs are named identically for that user.
 
         self.__make_call("create_sdi", {"user_pk": user_pk, "name": "PCAP_SDI_{}".format(sdi_num), "description": description})
+        self.__sdi_map = SDIMap(self.__sdi_calls.get_sdi_id())
 
-    def add_machines(self) -> None:
+    def update(self, sdi_id: str) -> None:
         """
-        Method to add machines to the SDI. Retrieves a list of machines from the database, each of which is a list of IPs
-        used by that machine. Each machine is created and saved in the database. The information is then used to create
-        network interfaces for each IP corresponding to that machine. The new interface is also saved.
+        Update method to bring the existing SDI sdi_id up to date, in place of start and provision. The SDIMap of the
+        earlier runs on that SDI is first checked against the networks and machines the SDI still has, so objects
+        deleted from it since are created again. Networks and machines missing from the topology now are left alone.
         """
-        machine_list = self.__database.get_machines()
-        if machine_list:
-            printnonl("Adding machines... ")
+        self.__sdi_calls.set_sdi_id(sdi_id)
+        self.__sdi_map.sdi_id = sdi_id
 
-        for i, machine in enumerate(machine_list):                                                 # Machines default to workstations.
-            printnonl("{} ".format(len(machine_list) - i))
-            new_sdi_machine = self.__make_call("create_machine", {"name": "machine{}".format(i + 1), "role": "workstation"})
+        networks = self.__make_call("get_networks")
+        if networks is not None:
+            live = set(network["id"] for network in networks)
+            self.__sdi_map.networks = {key: entry for key, entry in self.__sdi_map.networks.items() if entry["id"] in live}
 
-            if new_sdi_machine is not None:
-                self.__database.insert_machine_id(machine[0][0], new_sdi_machine["id"], new_sdi_machine["name"])
-                for ip, vlan in machine:                                                 # Interfaces initially unplugged.
-                    new_machine_interface = self.__make_call("create_machine_interface", {"machine_id": new_sdi_machine["id"], "network": None, "nic": "e1000"})
+        machines = self.__make_call("get_machines")
+        if machines is not None:
+            live = set(machine["id"] for machine in machines)
+            self.__sdi_map.machines = {mac: entry for mac, entry in self.__sdi_map.machines.items() if entry["id"] in live}
 
-                    if new_machine_interface is not None:
-                        if 0 < vlan < 4095:
-                            self.__make_call("delete_machine_vlan", {"machine_id": new_sdi_machine["id"], "interface_id": new_machine_interface["id"], "vlan_id": 1})
-                            self.__make_call("add_machine_vlan", {"machine_id": new_sdi_machine["id"], "interface_id": new_machine_interface["id"], "vlan": vlan})
-                        self.__database.insert_interface_id(new_sdi_machine["id"], new_machine_interface["id"], ip)
+        self.provision()
 
-        if machine_list:
-            print("0")
+    def get_sdi_map(self) -> SDIMap:
+        return self.__sdi_map
 
-    def add_networks(self) -> None:
+    def provision(self) -> None:
+        """
+        Method to build the contents of the SDI from the plans of the Planner. Networks come first, as machines are
+        created with their interfaces already plugged into them. Machines are created as routers or workstations, so
+        no later call is needed to connect or specify them.
+        """
+        self.add_networks()
+        self.add_machines()
+
+    def add_machines(self) -> None:
         """
-        Method to add networks to the SDI. Retrieves a list of network IPs from the database. Each network is created as a
-        switch, which is saved in the database for future reference.
+        Method to add machines to the SDI. Retrieves the planned machines, each with its role and the interfaces used
+        by that machine. Each machine is created and saved in the database, then its network interfaces are created
+        plugged into their network, put on their vlan and given their IP. The new interfaces are also saved. Networks
+        must have been added first.
+
+        Machines already in the SDIMap, found by their MAC address or by their IP address behind a router, are not
+        created again. Only a changed role, new interfaces and interfaces moved to another network or vlan are sent,
+        and new machines are numbered after the mapped ones.
         """
-        network_list = self.__database.get_networks()
-        if network_list:
-            printnonl("Adding networks... ")
+        plan_list = self.__planner.plan_machines()
+        machines = self.__sdi_map.machines
+
+        numbers = itertools.count(len(machines) + 1)
+        for plan in plan_list:
+            if plan.mac not in machines:
+                plan.name = "machine{}".format(next(numbers))
 
-        for i, network in enumerate(network_list):
-            printnonl("{} ".format(len(network_list) - i))
-            new_switch = self.__make_call("create_network", {"name": "Network_{}".format(i + 1), "mode": "switch"})
+        with ThreadPoolExecutor(self.__workers) as executor:
+            futures = [executor.submit(self.__update_machine, plan, machines.get(plan.mac)) for plan in plan_list]
 
-            if new_switch is not None:
-                self.__make_call("delete_service", {"network_id": new_switch["id"], "vid": 1})
-                self.__make_call("add_service", {"network_id": new_switch["id"], "vid": network["vlan"]})
-                self.__make_call("edit_service", {"network_id": new_switch["id"], "dhcp": True, "vid": network["vlan"], "ip": network["network"], "netmask": network["mask"]})
-                self.__database.insert_network_id(network["network"], network["vlan"], new_switch["id"], new_switch["name"])
+            if futures:
+                printnonl("Adding machines... ")
 
-        if network_list:
-            print("0")
+            for i, (plan, future) in enumerate(zip(plan_list, futures)):
+                printnonl("{} ".format(len(futures) - i))
+                entry = future.result()
 
-    def connect(self) -> None:
+                if entry is not None:
+                    machines[plan.mac] = entry
+                    self.__database.insert_machine_id(plan.interfaces[0].ip, entry["id"], entry["name"])
+                    for interface in plan.interfaces:
+                        if interface.ip in entry["interfaces"]:
+                            self.__database.insert_interface_id(entry["id"], entry["interfaces"][interface.ip]["id"], interface.ip)
+
+            if futures:
+                print("0")
+
+    def __update_machine(self, plan: MachinePlan, entry: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Worker thread half of add_machines. Creates the machine if it is not mapped yet, or corrects its role, then
+        brings its interfaces in order, as they need the machine id. Returns the new map entry of the machine, or None
+        if the machine failed. Changes that failed are left out of the entry, so the next update retries them.
+        """
+        if entry is None:
+            new_sdi_machine = self.__make_call("create_machine", plan.create_args())
+            if new_sdi_machine is None:
+                return None
+            entry = {"id": new_sdi_machine["id"], "name": new_sdi_machine["name"], "role": plan.role, "interfaces": {}}
+        else:
+            entry = dict(entry, interfaces=dict(entry["interfaces"]))
+            if entry["role"] != plan.role and self.__make_call("edit_machine", {"machine_id": entry["id"], "role": plan.role}) is not None:
+                entry["role"] = plan.role
+
+        for interface in plan.interfaces:
+            mapped = entry["interfaces"].get(interface.ip)
+
+            if mapped is None:
+                new_machine_interface = self.__make_call("create_machine_interface", interface.create_args(entry["id"]))
+                if new_machine_interface is not None:
+                    for api_call, args in interface.vlan_calls(entry["id"], new_machine_interface["id"]):
+                        self.__make_call(api_call, args)
+                    entry["interfaces"][interface.ip] = {"id": new_machine_interface["id"], "vlan": interface.vlan,
+                                                         "network_id": interface.network_id}
+                continue
+
+            mapped = dict(mapped)
+            ids = {"machine_id": entry["id"], "interface_id": mapped["id"]}
+            if mapped["network_id"] != interface.network_id:
+                if self.__make_call("edit_machine_interface", dict(ids, network=interface.network_id)) is not None:
+                    mapped["network_id"] = interface.network_id
+            if mapped["vlan"] != interface.vlan:
+                results = [self.__make_call(api_call, args)
+                           for api_call, args in interface.change_vlan_calls(entry["id"], mapped["id"], mapped["vlan"])]
+                if not results or results[-1] is not None:     # The interface is on the new vlan once it is added.
+                    mapped["vlan"] = interface.vlan
+            entry["interfaces"][interface.ip] = mapped
+
+        return entry
+
+    def add_networks(self) -> None:
         """
-        Method to connect machines to networks. Retrieves a list of machines from the database as done in add_machines.
-        Each IP is then passed to the database to return machine, interface, and network ids, saved from the earlier
-        calls. These are used to edit machine interfaces to connect them to the right network.
+        Method to add networks to the SDI. Retrieves the planned networks from the database. Each network is created as
+        a switch serving its vlan, which is saved in the database for future reference.
+
+        Networks already in the SDIMap, found by their address and vlan, are not created again, only a changed mask is
+        sent. Mapped networks are saved in the database as well, as the machine plans refer to their ids.
         """
-        machine_list = self.__database.get_machines()
-        if machine_list:
-            printnonl("Connecting machines to networks... ")
+        plan_list = self.__planner.plan_networks()
+        networks = self.__sdi_map.networks
+
+        numbers = itertools.count(len(networks) + 1)
+        for plan in plan_list:
+            if network_key(plan.network, plan.vlan) not in networks:
+                plan.name = "Network_{}".format(next(numbers))
+
+        with ThreadPoolExecutor(self.__workers) as executor:
+            futures = [executor.submit(self.__update_network, plan, networks.get(network_key(plan.network, plan.vlan)))
+                       for plan in plan_list]
+
+            if futures:
+                printnonl("Adding networks... ")
+
+            for i, (plan, future) in enumerate(zip(plan_list, futures)):
+                printnonl("{} ".format(len(futures) - i))
+                entry = future.result()
 
-        for i, machine in enumerate(machine_list):
-            printnonl("{} ".format(len(machine_list) - i))
-            for ip, vlan in machine:
-                connection = self.__database.get_connections(ip, vlan)
-                if connection is not None:
-                    self.__make_call("edit_machine_interface", {"machine_id": connection["machine_id"], "interface_id": connection["interface_id"], "network": connection["network_id"]})
-                    self.__make_call("edit_machine_vlan", {"machine_id": connection["machine_id"], "interface_id": connection["interface_id"], "vlan_id": vlan, "ip": ip})
+                if entry is not None:
+                    networks[network_key(plan.network, plan.vlan)] = entry
+                    self.__database.insert_network_id(plan.network, plan.vlan, entry["id"], entry["name"])
 
-        if machine_list:
-            print("0")
+            if futures:
+                print("0")
 
-    def specify_machines(self) -> None:
+    def __update_network(self, plan: NetworkPlan, entry: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
         """
-        Method to define routers in the SDI. Retrieves a list of machine IDs from the database, each of which is a
-        router. The API is then called to convert those workstations to routers.
+        Worker thread half of add_networks. Creates the switch and sets up its vlan service if it is not mapped yet, or
+        corrects the mask of its service. Returns the new map entry of the network, or None if the switch failed.
         """
-        router_list = self.__database.get_routers()
-        for router in router_list:
-            self.__make_call("edit_machine", {"machine_id": router, "role": "router"})
+        if entry is None:
+            new_switch = self.__make_call("create_network", plan.create_args())
+            if new_switch is None:
+                return None
+
+            for api_call, args in plan.service_calls(new_switch["id"]):
+                self.__make_call(api_call, args)
+            return {"id": new_switch["id"], "name": new_switch["name"], "mask": plan.mask}
+
+        if entry["mask"] != plan.mask and self.__make_call(*plan.address_call(entry["id"])) is not None:
+            return dict(entry, mask=plan.mask)
+        return entry
 
     def print_success(self) -> None:
         domain = self.__caller.get_domain()
@@ -4,18 +4,47 @@ Caller class interacts with the SDI OS API directly, returning responses to the
 
 from typing import Any, Dict, Optional
 
+import email.utils
+import random
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
 from apii.api_calls import CALLS, Method
+from apii.rate_limiter import RateLimiter
 from authorizer.authorizer import Authorizer
 
+# Times a call is sent before its failure is reported
+MAX_ATTEMPTS = 5
+
+# Retry delays in seconds, doubling from BACKOFF_BASE up to BACKOFF_CAP
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+
+# Responses telling the server is overloaded, the request was not processed
+OVERLOAD_STATUS = (429, 503)
+
 
 class Caller:
-    def __init__(self, authorizer: Authorizer) -> None:
+    def __init__(self, authorizer: Authorizer, workers: int = 1) -> None:
         """
-        Uses the passed-in Authorizer to connect to the SDI API, then sets default values.
+        Uses the passed-in Authorizer to connect to the SDI API, then sets default values. The session keeps a
+        connection open for each of the workers threads making calls at once, and the rate limiter lowers the number
+        of calls in flight below workers while the server is overloaded.
         """
         self.__authorizer = authorizer
         self.__session = authorizer.connect()
+        for prefix in ("https://", "http://"):
+            self.__session.mount(prefix, HTTPAdapter(pool_maxsize=max(workers, 10)))
         self.__domain = authorizer.get_domain()
+        self.__rate_limiter = RateLimiter(workers)
+
+    def get_rate_limit(self) -> int:
+        """
+        Returns the number of calls currently allowed in flight.
+        """
+        return self.__rate_limiter.get_limit()
 
     def get_domain(self) -> str:
         return self.__domain[:-4]
@@ -27,8 +56,11 @@ class Caller:
         the body of the coming HTTP request. Finally, based upon the request type of the call needed, a request is made to
         the SDI OS API. The response is formatted and returned to the requester, or an error is generated if the HTTP
         request failed.
+
+        Transient failures are retried, waiting as long as a Retry-After header asks or else a jittered, exponentially
+        growing delay. GET, PUT and DELETE are retried on 429 and 5xx responses and on connection errors. POST is only
+        retried on 429 and 503, as any other failure may have created the object already.
         """
-        self.__session = self.__authorizer.refresh_tokens()
         command_info = CALLS[command]
         extension = command_info.path.format(**extensions)
         request_type = command_info.method
@@ -38,16 +70,28 @@ class Caller:
 
         url = "{}{}".format(self.__domain, extension)
 
-        if request_type == Method.GET:
-            response = self.__session.get(url)
-        elif request_type == Method.POST:
-            response = self.__session.post(url, data=body)
-        elif request_type == Method.PUT:
-            response = self.__session.put(url, data=body)
-        elif request_type == Method.DELETE:
-            response = self.__session.delete(url, data=body)
-        else:
-            return None
+        for attempt in range(MAX_ATTEMPTS):
+            last_attempt = attempt == MAX_ATTEMPTS - 1
+            self.__session = self.__authorizer.refresh_tokens()
+
+            self.__rate_limiter.acquire()
+            start = time.monotonic()
+            try:
+                response = self.__send(request_type, url, body)
+            except requests.exceptions.ConnectionError:
+                self.__rate_limiter.release(time.monotonic() - start, True)
+                if request_type == Method.POST or last_attempt:
+                    raise
+                time.sleep(self.__backoff(attempt))
+                continue
+
+            self.__rate_limiter.release(time.monotonic() - start, response.status_code in OVERLOAD_STATUS)
+
+            if not response.ok and not last_attempt and self.__retryable(request_type, response.status_code):
+                time.sleep(self.__retry_after(response) or self.__backoff(attempt))
+                continue
+
+            break
 
         if not response.ok:
             print("Error response connecting to {}".format(url))
@@ -59,3 +103,48 @@ class Caller:
             return response.json()
 
         return response.text
+
+    def __send(self, request_type: Method, url: str, body: Dict[str, Any]) -> requests.Response:
+        """
+        Makes a single request of the given type.
+        """
+        if request_type == Method.GET:
+            return self.__session.get(url)
+        elif request_type == Method.POST:
+            return self.__session.post(url, data=body)
+        elif request_type == Method.PUT:
+            return self.__session.put(url, data=body)
+        return self.__session.delete(url, data=body)
+
+    def __retryable(self, request_type: Method, status_code: int) -> bool:
+        """
+        Whether a failed request may be sent again.
+        """
+        if request_type == Method.POST:
+            return status_code in OVERLOAD_STATUS
+        return status_code == 429 or status_code >= 500
+
+    def __retry_after(self, response: requests.Response) -> Optional[float]:
+        """
+        Seconds to wait asked for by a Retry-After header, given in seconds or as a date, with a little jitter so
+        throttled threads do not all come back at once. None without a usable header.
+        """
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+
+        return min(max(delay, 0.0), BACKOFF_CAP) + random.uniform(0, BACKOFF_BASE)
+
+    def __backoff(self, attempt: int) -> float:
+        """
+        Full jitter exponential backoff: a random delay of up to BACKOFF_BASE * 2^attempt seconds, capped.
+        """
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
@@ -0,0 +1,296 @@
+"""
+Emulator serves an in-memory stand in for the Cypherpath SDI OS API on a local port, so the APII subsystem can be run
+and timed without a live server. Every call in CALLS is routed by its path and method, plus the OAuth token endpoint
+used by the Authorizer. Calls can be slowed down by a fixed latency, and fail at random with a 500 or a 429 response.
+"""
+
+from typing import Any, Dict, List, Optional, Pattern, Set, Tuple, cast
+
+import argparse
+import http.server
+import itertools
+import json
+import random
+import re
+import socketserver
+import threading
+import time
+import urllib.parse
+
+from apii.api_calls import CALLS, Method
+
+TOKEN_PATH = "/api/o/token/"
+API_PREFIX = "/api/"
+TOKEN_LIFETIME = 36000
+
+# Collections whose items are keyed by a value the client sends instead of a generated id
+CLIENT_KEYS = {"vlans": "vlan", "services": "vid"}
+
+# Children every new item of a collection starts with, as on a real server:
+# new interfaces carry vlan 1 and new networks serve vid 1
+DEFAULT_CHILDREN = {"interfaces": ("vlans", "vlan"), "networks": ("services", "vid")}
+
+# Calls answered without touching the stored items
+STATELESS_CALLS = ["edit_sdi", "run_sdi", "configure_sdi", "reorder_drives"]
+
+
+def compile_routes() -> List[Tuple[str, Method, Pattern[str]]]:
+    """
+    Turns the paths in CALLS into patterns. Paths with fewer placeholders are tried first, so a literal segment such
+    as drives/order wins over drives/{disk_slot}.
+    """
+    routes = []
+    for name, call in sorted(CALLS.items(), key=lambda item: item[1].path.count("{")):
+        pattern = re.sub(r"\{(\w+)\}", lambda match: "(?P<{}>[^/]+)".format(match.group(1)), call.path)
+        routes.append((name, call.method, re.compile("^{}{}/?$".format(API_PREFIX, pattern))))
+    return routes
+
+
+class EmulatorServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """
+    HTTP server answering every request in its own thread, like concurrent calls to a real server.
+    """
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], emulator: "Emulator") -> None:
+        super().__init__(address, EmulatorHandler)
+        self.emulator = emulator
+
+
+class EmulatorHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Hands every request to the Emulator and writes out its response.
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True                      # Headers and body go out in separate writes.
+
+    def do_GET(self) -> None:
+        self.__handle(Method.GET)
+
+    def do_POST(self) -> None:
+        self.__handle(Method.POST)
+
+    def do_PUT(self) -> None:
+        self.__handle(Method.PUT)
+
+    def do_DELETE(self) -> None:
+        self.__handle(Method.DELETE)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """
+        Requests are counted by the Emulator instead of logged.
+        """
+        pass
+
+    def __handle(self, method: Method) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = urllib.parse.parse_qs(self.rfile.read(length).decode("utf-8"))
+        form = {key: values[0] for key, values in body.items()}
+
+        emulator = cast(EmulatorServer, self.server).emulator
+        status, headers, response = emulator.handle(method, urllib.parse.urlsplit(self.path).path,
+                                                    self.headers.get("Authorization"), form)
+
+        data = b"" if response is None else json.dumps(response).encode("utf-8")
+        self.send_response(status)
+        for header, value in headers.items():
+            self.send_header(header, value)
+        if response is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class Emulator:
+    """
+    Keeps the users, SDIs, machines, networks and everything below them in memory, created, listed, edited and
+    deleted through the paths in CALLS. Only tokens handed out by the token endpoint are accepted. Faults are only
+    injected into API calls, never into the token endpoint.
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, throttle_rate: float = 0.0,
+                 retry_after: int = 1, host: str = "127.0.0.1", port: int = 0, seed: Optional[int] = None) -> None:
+        if latency < 0:
+            raise ValueError("latency must not be negative")
+        if not 0 <= error_rate <= 1 or not 0 <= throttle_rate <= 1:
+            raise ValueError("error and throttle rates must be between 0 and 1")
+
+        self.__latency = latency
+        self.__error_rate = error_rate
+        self.__throttle_rate = throttle_rate
+        self.__retry_after = retry_after
+        self.__routes = compile_routes()
+        self.__random = random.Random(seed)
+        self.__ids = itertools.count(1)
+        self.__lock = threading.Lock()
+        self.__tokens = set()  # type: Set[str]
+        self.__collections = {}  # type: Dict[str, Dict[str, Dict[str, Any]]]
+        self.__stats = {"calls": 0, "errors": 0, "throttled": 0, "tokens": 0}
+        self.__call_counts = {}  # type: Dict[str, int]
+        self.__host = host
+        self.__server = EmulatorServer((host, port), self)
+        self.__thread = None  # type: Optional[threading.Thread]
+
+    def start(self) -> None:
+        """
+        Serves requests from a background thread until stop is called.
+        """
+        self.__thread = threading.Thread(target=self.__server.serve_forever, name="sdi-os-emulator", daemon=True)
+        self.__thread.start()
+
+    def stop(self) -> None:
+        self.__server.shutdown()
+        self.__server.server_close()
+        if self.__thread is not None:
+            self.__thread.join()
+            self.__thread = None
+
+    def get_domain(self) -> str:
+        """
+        Returns the host and port the emulator listens on, to be used in place of SDIOS_DOMAIN.
+        """
+        return "{}:{}".format(self.__host, self.__server.server_port)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Returns the number of API calls, injected errors and 429 responses and issued tokens, and the count of every
+        call by name.
+        """
+        with self.__lock:
+            stats = dict(self.__stats)  # type: Dict[str, Any]
+            stats["per_call"] = dict(self.__call_counts)
+        return stats
+
+    def handle(self, method: Method, path: str, authorization: Optional[str],
+               form: Dict[str, str]) -> Tuple[int, Dict[str, str], Optional[Any]]:
+        """
+        Answers one request, returning the status, extra headers and JSON body (None for no body).
+        """
+        if path == TOKEN_PATH and method == Method.POST:
+            return self.__issue_token()
+
+        with self.__lock:
+            self.__stats["calls"] += 1
+            authorized = authorization is not None and authorization.split(" ")[-1] in self.__tokens
+            roll = self.__random.random()
+
+        if not authorized:
+            return 401, {}, {"detail": "Authentication credentials were not provided."}
+
+        time.sleep(self.__latency)
+
+        if roll < self.__throttle_rate:
+            with self.__lock:
+                self.__stats["throttled"] += 1
+            return 429, {"Retry-After": str(self.__retry_after)}, {"detail": "Request was throttled."}
+        if roll < self.__throttle_rate + self.__error_rate:
+            with self.__lock:
+                self.__stats["errors"] += 1
+            return 500, {}, {"detail": "Internal server error."}
+
+        for name, call_method, pattern in self.__routes:
+            match = pattern.match(path)
+            if match is not None and call_method == method:
+                with self.__lock:
+                    self.__call_counts[name] = self.__call_counts.get(name, 0) + 1
+                    return self.__call(name, method, path.rstrip("/")[len(API_PREFIX):], match.groupdict(), form)
+
+        return 404, {}, {"detail": "Not found."}
+
+    def __issue_token(self) -> Tuple[int, Dict[str, str], Optional[Any]]:
+        """
+        Answers both the password and the refresh token grant with a new pair of tokens.
+        """
+        with self.__lock:
+            self.__stats["tokens"] += 1
+            number = next(self.__ids)
+            access_token = "access{}".format(number)
+            self.__tokens.add(access_token)
+
+        return 200, {}, {"access_token": access_token,
+                         "token_type": "Bearer",
+                         "expires_in": TOKEN_LIFETIME,
+                         "refresh_token": "refresh{}".format(number),
+                         "scope": "read write"}
+
+    def __call(self, name: str, method: Method, path: str, params: Dict[str, str],
+               form: Dict[str, str]) -> Tuple[int, Dict[str, str], Optional[Any]]:
+        """
+        Runs one routed call against the stored items. Must be called holding the lock.
+        """
+        if name == "storage_general":
+            return 200, {}, [{"user": 1}]
+        if name == "get_users":
+            return 200, {}, [{"pk": 1, "username": "user"}]
+        if name in STATELESS_CALLS:
+            return 200, {}, form
+
+        if method == Method.GET:
+            return 200, {}, list(self.__collections.get(path, {}).values())
+
+        if method == Method.POST:
+            return self.__create(path, form, name == "create_sdi")
+
+        collection_path, key = path.rsplit("/", 1)
+        collection = self.__collections.get(collection_path, {})
+        if key not in collection:
+            return 404, {}, {"detail": "Not found."}
+
+        if method == Method.PUT:
+            collection[key].update(form)
+            return 200, {}, collection[key]
+
+        del collection[key]
+        for child_path in [child for child in self.__collections if child.startswith(path + "/")]:
+            del self.__collections[child_path]
+        return 204, {}, None
+
+    def __create(self, path: str, form: Dict[str, str], sdi: bool) -> Tuple[int, Dict[str, str], Optional[Any]]:
+        """
+        Adds an item to the collection at path, along with its default children.
+        """
+        collection = self.__collections.setdefault(path, {})
+        collection_name = path.rsplit("/", 1)[-1]
+
+        if collection_name in CLIENT_KEYS:
+            key = form.get(CLIENT_KEYS[collection_name], "")
+            if not key or key in collection:
+                return 400, {}, {"detail": "{} {} already exists.".format(collection_name, key)}
+        else:
+            key = "{:08x}".format(next(self.__ids))
+
+        item = dict(form)  # type: Dict[str, Any]
+        item["sdi_id" if sdi else "id"] = key
+        collection[key] = item
+
+        if collection_name in DEFAULT_CHILDREN:
+            child_name, child_key = DEFAULT_CHILDREN[collection_name]
+            self.__collections["{}/{}/{}".format(path, key, child_name)] = {"1": {child_key: "1", "id": "1"}}
+
+        return 201, {}, item
+
+
+def main() -> None:
+    """
+    Runs the emulator in the foreground, for use with a manually configured SDIOS_DOMAIN.
+    """
+    cmds = argparse.ArgumentParser(description="Serve a local SDI OS API emulator.")
+    cmds.add_argument("--port", type=int, default=8000, help="port to listen on (default: %(default)s)")
+    cmds.add_argument("--latency", type=float, default=0.0, help="seconds added to every call (default: %(default)s)")
+    cmds.add_argument("--error-rate", type=float, default=0.0, help="share of calls failing with 500 (default: %(default)s)")
+    cmds.add_argument("--throttle-rate", type=float, default=0.0, help="share of calls answered with 429 (default: %(default)s)")
+    args = cmds.parse_args()
+
+    emulator = Emulator(args.latency, args.error_rate, args.throttle_rate, port=args.port)
+    print("Emulating SDI OS at http://{}/api/".format(emulator.get_domain()))
+    emulator.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        emulator.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Journal keeps a durable record of every mutating SDI OS API call that succeeded, with its response, so a run that
+died partway can be resumed. Resuming replays the recorded responses, ids included, instead of making the calls again,
+and the first call missing from the journal is made for real.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+import json
+import os
+import threading
+
+# Calls keyed by name alone, their arguments differ between runs (create_sdi numbers the SDI by the ones that exist)
+NAME_KEYED_CALLS = ["create_sdi"]
+
+
+def journal_key(api_call: str, args: Dict[str, Any]) -> str:
+    """
+    Canonical form of a call: its name and its arguments in sorted order.
+    """
+    if api_call in NAME_KEYED_CALLS:
+        return api_call
+    return "{} {}".format(api_call, json.dumps(args, sort_keys=True, default=str))
+
+
+class Journal:
+    """
+    JSON lines file of {"call", "args", "response"} entries, each flushed and synced to disk before the call is
+    reported done. One call with the same arguments can occur more than once, such as two interfaces of a machine
+    created on the same network, so responses are replayed per key in the order they were recorded. Calls on one key
+    are only ever made by one thread, in order, which keeps that order the same between runs.
+    """
+
+    def __init__(self, path: str, resume: bool = False) -> None:
+        self.__lock = threading.Lock()
+        self.__recorded = {}  # type: Dict[str, List[Any]]
+        self.__replayed = 0
+
+        if resume:
+            self.__load(path)
+        self.__file = open(path, "a" if resume else "w")
+
+    def __load(self, path: str) -> None:
+        """
+        Reads the entries of an earlier run. A partly written last line, from a run killed mid-write, is skipped.
+        """
+        try:
+            with open(path) as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return
+
+        for line in lines:
+            try:
+                entry = json.loads(line)
+                key = journal_key(entry["call"], entry["args"])
+            except (ValueError, KeyError, TypeError):
+                continue
+            self.__recorded.setdefault(key, []).append(entry["response"])
+
+        # Replays pop from the front
+        for responses in self.__recorded.values():
+            responses.reverse()
+
+    def replay(self, api_call: str, args: Dict[str, Any]) -> Tuple[bool, Optional[Any]]:
+        """
+        Returns (True, response) for a call recorded by the earlier run and not replayed yet, else (False, None).
+        """
+        key = journal_key(api_call, args)
+        with self.__lock:
+            responses = self.__recorded.get(key)
+            if not responses:
+                return False, None
+            self.__replayed += 1
+            return True, responses.pop()
+
+    def record(self, api_call: str, args: Dict[str, Any], response: Any) -> None:
+        """
+        Appends a completed call and makes sure it is on disk before returning.
+        """
+        line = json.dumps({"call": api_call, "args": args, "response": response}, sort_keys=True, default=str)
+        with self.__lock:
+            self.__file.write(line + "\n")
+            self.__file.flush()
+            os.fsync(self.__file.fileno())
+
+    def get_replayed(self) -> int:
+        """
+        Returns the number of calls answered from the journal.
+        """
+        with self.__lock:
+            return self.__replayed
+
+    def close(self) -> None:
+        with self.__lock:
+            self.__file.close()
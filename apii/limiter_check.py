@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Rate limiter check: Drives a RateLimiter through simulated rounds of calls on a simulated clock and checks how its
+limit moves. Latency that varies from call to call around a steady mean must leave the limit at its maximum, and
+the limit must climb back to it after a burst of refused calls. A lasting rise in latency must still lower it. Run
+from the repository root with "make limitercheck".
+"""
+
+from typing import Callable, List
+
+import random
+import sys
+
+from apii.rate_limiter import RateLimiter
+
+MAX_LIMIT = 16
+
+# Latency of a healthy server that is fast on some calls and slow on others
+JITTER_LOW = 0.005
+JITTER_HIGH = 0.05
+
+
+class SimulatedCalls:
+    """
+    Makes calls through a RateLimiter without waiting. The clock moves on by the latency of every call divided by
+    the limit, as when a full set of calls is in flight.
+    """
+
+    def __init__(self, seed: int = 1) -> None:
+        self.__now = 0.0
+        self.__random = random.Random(seed)
+        self.limiter = RateLimiter(MAX_LIMIT, clock=lambda: self.__now)
+
+    def run(self, calls: int, latency: Callable[[random.Random], float], overloaded: bool = False) -> int:
+        """
+        Makes the calls, each taking the latency drawn for it, and returns the limit afterwards.
+        """
+        for _call in range(calls):
+            self.limiter.acquire()
+            seconds = latency(self.__random)
+            self.__now += seconds / self.limiter.get_limit()
+            self.limiter.release(seconds, overloaded)
+        return self.limiter.get_limit()
+
+
+def jitter(generator: random.Random) -> float:
+    return generator.uniform(JITTER_LOW, JITTER_HIGH)
+
+
+def check_limiter() -> List[str]:
+    """
+    Runs every scenario and describes each one whose limit ended up where it should not.
+    """
+    failures = []  # type: List[str]
+
+    steady = SimulatedCalls()
+    lowest = min(steady.run(50, jitter) for _round in range(100))
+    if lowest < MAX_LIMIT:
+        failures.append("jittery latency: limit fell to {} of {}".format(lowest, MAX_LIMIT))
+
+    recovering = SimulatedCalls()
+    recovering.run(500, jitter)
+    refused = recovering.run(20, jitter, overloaded=True)
+    recovered = recovering.run(2000, jitter)
+    if refused >= MAX_LIMIT or recovered < MAX_LIMIT:
+        failures.append("recovery: limit {} after refused calls, {} after 2000 jittery calls".format(
+            refused, recovered))
+
+    slowing = SimulatedCalls()
+    slowing.run(500, jitter)
+    slowed = slowing.run(50, lambda generator: 10 * jitter(generator))
+    if slowed >= MAX_LIMIT:
+        failures.append("rising latency: limit stayed at {}".format(slowed))
+
+    return failures
+
+
+def main() -> int:
+    """
+    Prints every failed scenario, returns the exit status.
+    """
+    failures = check_limiter()
+    for failure in failures:
+        print(failure)
+
+    print("{} failed scenarios".format(len(failures)))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+The Planner turns the interpreted database into the final state of every network and machine of the SDI, and each
+plan lists the fewest API calls reaching that state. Objects are created already in their final shape where the API
+allows it: interfaces are created plugged into their network, machines are created with their final role, and the
+default vlan 1 is only replaced when another vlan is wanted.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from database.apii_interface import APIIInterface
+
+# Vlan every new interface carries and every new network serves
+DEFAULT_VLAN = 1
+
+# A call to make: (api_call, args)
+Call = Tuple[str, Dict[str, Any]]
+
+
+class NetworkPlan:
+    """
+    A switch serving one network on one vlan.
+    """
+
+    def __init__(self, name: str, network: str, mask: str, vlan: int) -> None:
+        self.name = name
+        self.network = network
+        self.mask = mask
+        self.vlan = vlan
+
+    def create_args(self) -> Dict[str, Any]:
+        return {"name": self.name, "mode": "switch"}
+
+    def service_calls(self, network_id: str) -> List[Call]:
+        """
+        Calls setting up the vlan service of the created switch. The default service is only swapped out for
+        another vlan.
+        """
+        calls = []  # type: List[Call]
+        if self.vlan != DEFAULT_VLAN:
+            calls.append(("delete_service", {"network_id": network_id, "vid": DEFAULT_VLAN}))
+            calls.append(("add_service", {"network_id": network_id, "vid": self.vlan}))
+        calls.append(self.address_call(network_id))
+        return calls
+
+    def address_call(self, network_id: str) -> Call:
+        """
+        Call giving the vlan service its network address and mask.
+        """
+        return ("edit_service", {"network_id": network_id, "dhcp": True, "vid": self.vlan, "ip": self.network, "netmask": self.mask})
+
+
+class InterfacePlan:
+    """
+    A machine interface with its address, vlan and the SDI network it is plugged into.
+    """
+
+    def __init__(self, ip: str, vlan: int, network_id: Optional[str]) -> None:
+        self.ip = ip
+        self.vlan = vlan
+        self.network_id = network_id
+
+    def create_args(self, machine_id: str) -> Dict[str, Any]:
+        return {"machine_id": machine_id, "network": self.network_id, "nic": "e1000"}
+
+    def vlan_calls(self, machine_id: str, interface_id: str) -> List[Call]:
+        """
+        Calls putting the created interface on its vlan with its address. Vlans outside 1-4094 can not be set, the
+        interface keeps the default one.
+        """
+        ids = {"machine_id": machine_id, "interface_id": interface_id}
+        if 0 < self.vlan < 4095 and self.vlan != DEFAULT_VLAN:
+            return [("delete_machine_vlan", dict(ids, vlan_id=DEFAULT_VLAN)),
+                    ("add_machine_vlan", dict(ids, vlan=self.vlan, ip=self.ip))]
+        return [("edit_machine_vlan", dict(ids, vlan_id=DEFAULT_VLAN, ip=self.ip))]
+
+    def change_vlan_calls(self, machine_id: str, interface_id: str, old_vlan: int) -> List[Call]:
+        """
+        Calls moving an existing interface from old_vlan to its vlan, keeping its address. Vlans that can not be set
+        count as the default one, so a change between two of them needs no call.
+        """
+        old_vlan, new_vlan = [vlan if 0 < vlan < 4095 else DEFAULT_VLAN for vlan in (old_vlan, self.vlan)]
+        if old_vlan == new_vlan:
+            return []
+        ids = {"machine_id": machine_id, "interface_id": interface_id}
+        return [("delete_machine_vlan", dict(ids, vlan_id=old_vlan)),
+                ("add_machine_vlan", dict(ids, vlan=new_vlan, ip=self.ip))]
+
+
+class MachinePlan:
+    """
+    A machine with its final role and its interfaces. Its MAC address identifies it between runs, or its IP address for
+    a machine behind a router.
+    """
+
+    def __init__(self, name: str, mac: str, router: bool, interfaces: List[InterfacePlan]) -> None:
+        self.name = name
+        self.mac = mac
+        self.role = "router" if router else "workstation"
+        self.interfaces = interfaces
+
+    def create_args(self) -> Dict[str, Any]:
+        return {"name": self.name, "role": self.role}
+
+
+class Planner:
+    """
+    Reads the interpreted networks and machines through the APIIInterface. Machine plans refer to the SDI network
+    ids saved in the database, so they must be made after the networks are created.
+    """
+
+    def __init__(self, database: APIIInterface) -> None:
+        self.__database = database
+
+    def plan_networks(self) -> List[NetworkPlan]:
+        return [NetworkPlan("Network_{}".format(i + 1), network["network"], network["mask"], network["vlan"])
+                for i, network in enumerate(self.__database.get_networks())]
+
+    def plan_machines(self) -> List[MachinePlan]:
+        return [MachinePlan("machine{}".format(i + 1), machine["mac"], machine["router"],
+                            [InterfacePlan(interface["ip"], interface["vlan"], interface["network_id"])
+                             for interface in machine["interfaces"]])
+                for i, machine in enumerate(self.__database.get_machine_topology())]
@@ -0,0 +1,88 @@
+"""
+RateLimiter bounds how many calls the Caller threads have in flight at once, adapting the bound to the server.
+"""
+
+from typing import Callable
+
+import threading
+import time
+
+# Weight of a new sample in the smoothed latency
+LATENCY_SMOOTHING = 0.2
+
+# Weight of a new sample in the baseline latency, low so the baseline only follows lasting changes. Both averages
+# weigh the first samples equally until their weight drops to these, so neither starts out on a single sample
+BASELINE_SMOOTHING = 0.01
+
+# The limit is multiplied by these on a 429 or 503 response, and when latency rises
+OVERLOAD_DECREASE = 0.5
+LATENCY_DECREASE = 0.8
+
+
+class RateLimiter:
+    """
+    Additive increase, multiplicative decrease limit on concurrent calls. The limit starts at max_limit. Every call
+    that completes while the server keeps up raises it by 1/limit, about one per round of calls. A 429 or 503
+    response halves it, and smoothed latency above latency_tolerance times the baseline cuts it by a fifth. The
+    baseline is a slow moving average of the same samples, so latency that varies from call to call around a steady
+    mean is not taken for a slow server. Decreases are at most one per round trip, so one burst of slow or refused
+    calls only counts once.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, latency_tolerance: float = 2.0,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        if min_limit < 1 or max_limit < min_limit:
+            raise ValueError("limits must satisfy 1 <= min_limit <= max_limit")
+
+        self.__min_limit = min_limit
+        self.__max_limit = max_limit
+        self.__latency_tolerance = latency_tolerance
+        self.__limit = float(max_limit)
+        self.__in_flight = 0
+        self.__latency = 0.0
+        self.__baseline = 0.0
+        self.__samples = 0
+        self.__clock = clock
+        self.__last_decrease = float("-inf")
+        self.__condition = threading.Condition()
+
+    def get_limit(self) -> int:
+        """
+        Returns the number of calls currently allowed in flight.
+        """
+        with self.__condition:
+            return int(self.__limit)
+
+    def acquire(self) -> None:
+        """
+        Blocks until another call may be made. Every acquire must be followed by a release.
+        """
+        with self.__condition:
+            while self.__in_flight >= int(self.__limit):
+                self.__condition.wait()
+            self.__in_flight += 1
+
+    def release(self, latency: float, overloaded: bool) -> None:
+        """
+        Ends a call that took latency seconds, overloaded telling whether the server refused it for load, and adjusts
+        the limit.
+        """
+        with self.__condition:
+            self.__in_flight -= 1
+
+            self.__samples += 1
+            self.__latency += (latency - self.__latency) * max(LATENCY_SMOOTHING, 1 / self.__samples)
+            self.__baseline += (latency - self.__baseline) * max(BASELINE_SMOOTHING, 1 / self.__samples)
+
+            slow = self.__latency > self.__baseline * self.__latency_tolerance
+            now = self.__clock()
+
+            if overloaded or slow:
+                if now - self.__last_decrease >= self.__latency:
+                    factor = OVERLOAD_DECREASE if overloaded else LATENCY_DECREASE
+                    self.__limit = max(float(self.__min_limit), self.__limit * factor)
+                    self.__last_decrease = now
+            else:
+                self.__limit = min(float(self.__max_limit), self.__limit + 1 / self.__limit)
+
+            self.__condition.notify_all()
@@ -1,5 +1,7 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
+from apii.api_calls import CALLS, Method
+from apii.journal import Journal
 from apii.machine_calls import Caller, MachineCalls
 
 
@@ -9,23 +11,53 @@ class SDICalls:
     those calls for the Caller or passes it to the Machine_Calls class. Calls prepared here change the SDI settings.
     """
 
-    def __init__(self, caller: Caller) -> None:
+    def __init__(self, caller: Caller, journal: Optional[Journal] = None) -> None:
         """
         Sets and passes the Caller reference, as well as defines the API calls that this class is responsible for.
+        With a journal, every mutating call is looked up in it first and recorded in it once it succeeds.
         """
         self.__caller = caller
+        self.__journal = journal
         self.__machine_calls = MachineCalls(caller)
         self.__known_calls = ["storage_general", "get_users", "get_sdis", "create_sdi", "edit_sdi", "run_sdi", "configure_sdi"]
 
     def get_sdi_id(self) -> str:
         return self.__machine_calls.get_sdi_id()
 
+    def set_sdi_id(self, sdi_id: str) -> None:
+        """
+        Targets an SDI that already exists instead of one created by create_sdi.
+        """
+        self.__machine_calls.set_sdi_id(sdi_id)
+
     def make_call(self, api_call: str, args: Dict[str, Any] = {}) -> Optional[Any]:
         """
         The make_call method, called by the APII, prepares arguments for the Caller. If the API call needed is to be
         handled here, the argument list is converted from a single dict to two dictionaries, for URL extensions and
         API arguments. These are then passed to the caller for API interaction. If an SDI is created, the id is saved in
         the Machine_Calls class. If the call is not known by this class, it is passed to the next class in the chain.
+        Mutating calls already in the journal are answered from it.
+        """
+        journal = self.__journal
+        if api_call not in CALLS or CALLS[api_call].method == Method.GET:   # Reads are always made again.
+            journal = None
+
+        replayed, response = False, None  # type: Tuple[bool, Optional[Any]]
+        if journal is not None:
+            replayed, response = journal.replay(api_call, args)
+
+        if not replayed:
+            response = self.__route_call(api_call, args)
+            if journal is not None and response is not None:
+                journal.record(api_call, args, response)
+
+        if api_call == "create_sdi" and response is not None:
+            self.__machine_calls.set_sdi_id(response["sdi_id"])
+        return response
+
+    def __route_call(self, api_call: str, args: Dict[str, Any]) -> Optional[Any]:
+        """
+        Makes the calls known by this class, passes the others on down the chain.
         """
         if api_call in self.__known_calls:
             extension_dict = dict()
@@ -35,9 +67,6 @@ class SDICalls:
                     extension_dict[arg] = val
                 else:                                  # Everything else passed as arguments.
                     other_dict[arg] = val
-            response = self.__caller.make_call(api_call, extension_dict, other_dict)
-            if api_call == "create_sdi" and response is not None:
-                self.__machine_calls.set_sdi_id(response["sdi_id"])
-            return response
+            return self.__caller.make_call(api_call, extension_dict, other_dict)
         else:
             return self.__machine_calls.make_call(api_call, args)
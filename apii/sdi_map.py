@@ -0,0 +1,67 @@
+"""
+SDIMap remembers what a run built in an SDI: the id, name and settings of every network and machine, keyed by what
+identifies them between runs. A later run updating that SDI compares its new plans against the map and only makes the
+calls for what is new or changed.
+"""
+
+from typing import Any, Dict
+
+import json
+import os
+import re
+
+# Machines behind a router were once keyed by their position, "<router index>:<machine index>"
+POSITIONAL_KEY = re.compile(r"^\d+:\d+$")
+
+
+def network_key(network: str, vlan: int) -> str:
+    """
+    Networks are identified by their address and vlan.
+    """
+    return "{}/{}".format(network, vlan)
+
+
+class SDIMap:
+    """
+    networks: network_key -> {"id", "name", "mask"}
+    machines: mac -> {"id", "name", "role", "interfaces": ip -> {"id", "vlan", "network_id"}}
+    Machines behind a router have no mac of their own and are keyed by the ip of their one interface instead.
+    """
+
+    def __init__(self, sdi_id: str = "") -> None:
+        self.sdi_id = sdi_id
+        self.networks = {}  # type: Dict[str, Dict[str, Any]]
+        self.machines = {}  # type: Dict[str, Dict[str, Any]]
+
+    @staticmethod
+    def load(path: str, sdi_id: str) -> "SDIMap":
+        """
+        Reads the map of the SDI sdi_id. A missing file gives an empty map, a map of another SDI raises ValueError.
+        Machines of older maps keyed by their position are keyed by their ip again.
+        """
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return SDIMap(sdi_id)
+
+        if data.get("sdi_id") != sdi_id:
+            raise ValueError("{} maps SDI {}, not {}".format(path, data.get("sdi_id"), sdi_id))
+
+        sdi_map = SDIMap(sdi_id)
+        sdi_map.networks = data.get("networks", {})
+        sdi_map.machines = {}
+        for key, entry in data.get("machines", {}).items():
+            if POSITIONAL_KEY.match(key) and len(entry["interfaces"]) == 1:
+                key = next(iter(entry["interfaces"]))
+            sdi_map.machines[key] = entry
+        return sdi_map
+
+    def save(self, path: str) -> None:
+        """
+        Writes the map, replacing the old file in one step.
+        """
+        temp_path = "{}.tmp".format(path)
+        with open(temp_path, "w") as f:
+            json.dump({"sdi_id": self.sdi_id, "networks": self.networks, "machines": self.machines}, f, indent=1, sort_keys=True)
+        os.replace(temp_path, path)
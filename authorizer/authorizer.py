@@ -1,5 +1,8 @@
-from typing import cast
+from typing import Any, Dict, Optional, cast
 
+import json
+import os
+import threading
 import time
 
 import requests
@@ -12,64 +15,208 @@ import settings
 # XXX: This is an untyped function, modifying the requests stubs is the fix.
 requests.packages.urllib3.disable_warnings() # type: ignore
 
+# Tokens are renewed this many seconds before they expire
+REFRESH_MARGIN = 120
+
+# SDI OS only accepts a refresh token for this long after the tokens were fetched
+REFRESH_TOKEN_LIFETIME = 24 * 60 * 60
+
+# Seconds the background thread waits after a failed refresh before trying again
+REFRESH_RETRY_INTERVAL = 30
+
 class Authorizer:
     """
     The authorizer authenticates with the Cypherpath SDI OS API and keeps the authentication for the remainder of
     program execution. This object is created by the Driver, and passed to the APII subsystem to be used by the Caller.
+
+    The Caller may be used from several threads, so renewing the tokens is serialized by a lock. With
+    SDIOS_BACKGROUND_REFRESH set, a daemon thread renews them shortly before they expire, so calls do not stall on a
+    refresh. With SDIOS_TOKEN_CACHE set, the tokens are also kept in that file, readable by the owner only, and reused
+    by the next run while they can still be refreshed.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, domain: Optional[str] = None, protocol: str = "https://", token_cache: bool = True) -> None:
         """
-        Prepares future variables, and notes the initial authentication time.
+        Prepares future variables, and notes the initial authentication time. The domain defaults to SDIOS_DOMAIN,
+        another domain and protocol are used to talk to a local emulator. token_cache=False ignores SDIOS_TOKEN_CACHE.
         """
         self.__credentials = settings.SDIOS_CREDS
-        self.__protocol = "https://"
-        self.__redirect = settings.SDIOS_DOMAIN
+        self.__protocol = protocol
+        self.__redirect = domain or settings.SDIOS_DOMAIN
         self.__auth_time = time.time()
+        self.__fetch_time = self.__auth_time
         self.__tokens = {"access_token": "",
                          "token_type": "",
                          "expires_in": 0,
                          "refresh_token": "",
-                         "scope": ""}
+                         "scope": ""}  # type: Dict[str, Any]
         self.__domain = "{}{}:{}@{}/api/o/token/".format(self.__protocol, self.__credentials["client_id"], self.__credentials["client_secret"], self.__redirect)
         self.__session = OAuth2Session(client=LegacyApplicationClient(client_id=self.__credentials["client_id"]))
+        self.__lock = threading.Lock()
+        self.__stopped = threading.Event()
+        self.__refresh_thread = None  # type: Optional[threading.Thread]
+        self.__cache_path = None  # type: Optional[str]
+        if token_cache and settings.SDIOS_TOKEN_CACHE:
+            self.__cache_path = os.path.expanduser(settings.SDIOS_TOKEN_CACHE)
 
     def connect(self) -> OAuth2Session:
         """
-        Connect authenticates with the API for the first time. If no credentials are defined, load is called first
-        using default parameters. Libraries are then used to generate the authentication tokens. The session, used to
-        make future requests, is returned.
+        Connect authenticates with the API for the first time. Cached tokens are used if there are any, otherwise
+        libraries are used to generate the authentication tokens. The session, used to make future requests, is
+        returned.
         """
-        try:
-            self.__tokens = self.__session.fetch_token(token_url=self.__domain, verify=settings.SDIOS_VERIFY_SSL,
-                                                       tenancy=self.__credentials["tenancy"],
-                                                       username=self.__credentials["username"],
-                                                       password=self.__credentials["password"],
-                                                       client_id=self.__credentials["client_id"],
-                                                       client_secret=self.__credentials["client_secret"])
-        except Exception as e:
-            print("Error trying to fetch SDI OS token, check SDIOS_CREDS in settings.py: ", e)
-            exit(-1)
-        self.__auth_time = time.time()  # Saved  for future refreshing.
+        if not self.__load_cache():
+            try:
+                with self.__lock:
+                    self.__fetch_tokens()
+            except Exception as e:
+                print("Error trying to fetch SDI OS token, check SDIOS_CREDS in settings.py: ", e)
+                exit(-1)
+
+        if settings.SDIOS_BACKGROUND_REFRESH and self.__refresh_thread is None:
+            self.__refresh_thread = threading.Thread(target=self.__refresh_loop, name="token-refresh", daemon=True)
+            self.__refresh_thread.start()
+
         return self.__session
 
+    def close(self) -> None:
+        """
+        Stops the background refresh thread, if one was started.
+        """
+        self.__stopped.set()
+        if self.__refresh_thread is not None:
+            self.__refresh_thread.join()
+            self.__refresh_thread = None
+
     def refresh_tokens(self) -> OAuth2Session:
         """
         The refresh_tokens method re-authenticates using the refresh token provided with the other tokens. If the current
-        tokens are valid for two minutes or less, then a new session is created using the refresh token, replacing the
-        old one. The current session (new or old) is returned.
-        NOTE: This will not succeed (and all future calls will fail) if the tokens were retrieved
-        more than 24 hours before this call. Such a case is outside the foreseeable scope of this program.
+        tokens are valid for two minutes or less, then they are renewed, replacing the old ones. The session is
+        returned. Only one thread renews the tokens, the others wait for it and then find them valid.
         """
-        expires = cast(int, self.__tokens["expires_in"])
+        if not self.__needs_refresh():
+            return self.__session
 
-        if (time.time() - self.__auth_time) >= expires - 120:  # Time to refresh!
-            self.__tokens = self.__session.refresh_token(self.__domain, self.__tokens["refresh_token"],
-                                                         timeout=expires,
-                                                         verify=settings.SDIOS_VERIFY_SSL)
-            self.__auth_time = time.time()                                    # Saved for future refreshing.
+        with self.__lock:
+            if self.__needs_refresh():                                        # Another thread may have done it.
+                self.__renew_tokens()
         return self.__session
 
+    def __needs_refresh(self) -> bool:
+        """
+        True when the access token expires within the refresh margin.
+        """
+        expires = cast(int, self.__tokens["expires_in"])
+        return (time.time() - self.__auth_time) >= expires - REFRESH_MARGIN
+
+    def __renew_tokens(self) -> None:
+        """
+        Renews the tokens with the refresh token. The refresh token stops working 24 hours after the tokens were
+        fetched, so past that point, or whenever the refresh fails, new tokens are fetched with the credentials.
+        Must be called holding the lock.
+        """
+        if (time.time() - self.__fetch_time) < REFRESH_TOKEN_LIFETIME - REFRESH_MARGIN:
+            expires = cast(int, self.__tokens["expires_in"])
+            try:
+                self.__tokens = self.__session.refresh_token(self.__domain, self.__tokens["refresh_token"],
+                                                             timeout=expires,
+                                                             verify=settings.SDIOS_VERIFY_SSL)
+                self.__auth_time = time.time()                                # Saved for future refreshing.
+                self.__save_cache()
+                return
+            except Exception as e:
+                print("Error refreshing SDI OS token, fetching new tokens: ", e)
+
+        self.__fetch_tokens()
+
+    def __fetch_tokens(self) -> None:
+        """
+        Generates new tokens from the credentials. Must be called holding the lock.
+        """
+        self.__tokens = self.__session.fetch_token(token_url=self.__domain, verify=settings.SDIOS_VERIFY_SSL,
+                                                   tenancy=self.__credentials["tenancy"],
+                                                   username=self.__credentials["username"],
+                                                   password=self.__credentials["password"],
+                                                   client_id=self.__credentials["client_id"],
+                                                   client_secret=self.__credentials["client_secret"])
+        self.__auth_time = time.time()  # Saved  for future refreshing.
+        self.__fetch_time = self.__auth_time
+        self.__save_cache()
+
+    def __refresh_loop(self) -> None:
+        """
+        Body of the background refresh thread. Sleeps until the tokens are due for renewal, renews them and repeats
+        until close is called.
+        """
+        delay = 0.0
+        while not self.__stopped.wait(delay):
+            try:
+                self.refresh_tokens()
+                expires = cast(int, self.__tokens["expires_in"])
+                delay = max(self.__auth_time + expires - REFRESH_MARGIN - time.time(), 1.0)
+            except Exception as e:
+                print("Error refreshing SDI OS token in the background: ", e)
+                delay = REFRESH_RETRY_INTERVAL
+
+    def __load_cache(self) -> bool:
+        """
+        Loads the tokens of an earlier run from the cache file. They are only used if they were issued to the same
+        client and user by the same server, and can still be refreshed. Returns whether they were loaded.
+        """
+        if self.__cache_path is None:
+            return False
+
+        try:
+            with open(self.__cache_path) as f:
+                cache = json.load(f)
+            if cache["owner"] != self.__cache_owner() or \
+                    (time.time() - cache["fetch_time"]) >= REFRESH_TOKEN_LIFETIME - REFRESH_MARGIN:
+                return False
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+
+        with self.__lock:
+            self.__tokens = cache["tokens"]
+            self.__auth_time = cache["auth_time"]
+            self.__fetch_time = cache["fetch_time"]
+            self.__session.token = self.__tokens
+            try:
+                if self.__needs_refresh():
+                    self.__renew_tokens()
+            except Exception:
+                return False
+
+        return True
+
+    def __save_cache(self) -> None:
+        """
+        Writes the tokens to the cache file, created with owner only permissions and replaced in one step.
+        """
+        if self.__cache_path is None:
+            return
+
+        cache = {"owner": self.__cache_owner(),
+                 "tokens": self.__tokens,
+                 "auth_time": self.__auth_time,
+                 "fetch_time": self.__fetch_time}
+        temp_path = "{}.tmp".format(self.__cache_path)
+
+        try:
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            os.fchmod(fd, 0o600)                                    # A leftover file keeps its old mode otherwise.
+            with os.fdopen(fd, "w") as f:
+                json.dump(cache, f)
+            os.replace(temp_path, self.__cache_path)
+        except OSError as e:
+            print("Error writing the SDI OS token cache {}: ".format(self.__cache_path), e)
+
+    def __cache_owner(self) -> str:
+        """
+        Identifies the server, client and user the cached tokens belong to.
+        """
+        return "{}/{}/{}/{}".format(self.__redirect, self.__credentials["tenancy"],
+                                    self.__credentials["client_id"], self.__credentials["username"])
+
     def get_domain(self) -> str:
         """
         Returns the first half of the URL for all calls to the SDI OS API, used both internally and by the Caller.
@@ -0,0 +1,29 @@
+CREATE INDEX IF NOT EXISTS Packets_source_mac_ip
+ON Packets(source_mac_fk, source_ip_fk);
+
+CREATE INDEX IF NOT EXISTS Packets_dest_mac_ip
+ON Packets(dest_mac_fk, dest_ip_fk);
+
+CREATE INDEX IF NOT EXISTS Packets_type_source_ip
+ON Packets(packet_type_fk, source_ip_fk);
+
+CREATE INDEX IF NOT EXISTS Packets_type_dest_ip
+ON Packets(packet_type_fk, dest_ip_fk);
+
+CREATE INDEX IF NOT EXISTS IPs_machine
+ON IPs(machine_fk);
+
+CREATE INDEX IF NOT EXISTS IPs_network
+ON IPs(network_fk);
+
+CREATE INDEX IF NOT EXISTS Networks_network_vlan
+ON Networks(network, vlan);
+
+CREATE INDEX IF NOT EXISTS Network_ID_network
+ON Network_ID(network_fk);
+
+CREATE INDEX IF NOT EXISTS SDI_Machines_machine_id
+ON SDI_Machines(machine_id);
+
+CREATE INDEX IF NOT EXISTS SDI_Interfaces_ip
+ON SDI_Interfaces(ip_fk);
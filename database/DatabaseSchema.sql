@@ -1,13 +1,13 @@
 CREATE TABLE Macs
 (
 	mac_pk INTEGER PRIMARY KEY,
-	mac TEXT UNIQUE
+	mac INTEGER UNIQUE
 );
 
 CREATE TABLE IPs
 (
 	ip_pk INTEGER PRIMARY KEY,
-	ip TEXT UNIQUE,
+	ip INTEGER UNIQUE,
 	vlan    INTEGER DEFAULT 1,
 	network_fk INTEGER,
 	machine_fk INTEGER,
@@ -19,9 +19,9 @@ CREATE TABLE IPs
 CREATE TABLE Networks
 (
     network_pk INTEGER PRIMARY KEY,
-    network TEXT,
+    network INTEGER,
     vlan INTEGER,
-    mask    TEXT
+    prefix  INTEGER
 );
 
 CREATE TABLE Machines
@@ -45,7 +45,8 @@ CREATE TABLE Services
     service_pk  INTEGER PRIMARY KEY,
     packet_fk INTEGER,
     req_res_flag INTEGER,
-    service TEXT
+    service TEXT,
+    subnet_mask INTEGER
 );
 
 CREATE TABLE Hosts
@@ -80,6 +81,11 @@ CREATE TABLE Packets
     user_agent_fk INTEGER,
     server_fk   INTEGER,
     protocol    TEXT,
+    vlan    INTEGER,
+    first_seen  REAL,
+    last_seen   REAL,
+    packet_count    INTEGER DEFAULT 1,
+    byte_count  INTEGER,
     FOREIGN KEY(source_ip_fk) REFERENCES IPs(ip_pk),
     FOREIGN KEY(dest_ip_fk) REFERENCES IPs(ip_pk),
     FOREIGN KEY(source_mac_fk) REFERENCES Macs(mac_pk),
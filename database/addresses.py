@@ -0,0 +1,59 @@
+from typing import Optional
+
+import socket
+
+"""
+Addresses:
+Conversions between the text form of IPv4 and MAC addresses, as the
+parsers produce them, and their integer form
+"""
+
+
+def ip_to_int(ip: str) -> int:
+    """
+    Method Name: ip_to_int
+    Purpose: Return the dotted quad ip as a 32-bit int
+    """
+    return int.from_bytes(socket.inet_aton(ip), "big")
+
+
+def int_to_ip(value: int) -> str:
+    """
+    Method Name: int_to_ip
+    Purpose: Return the 32-bit int as a dotted quad ip
+    """
+    return socket.inet_ntoa(value.to_bytes(4, "big"))
+
+
+def mac_to_int(mac: str) -> int:
+    """
+    Method Name: mac_to_int
+    Purpose: Return the colon separated mac as a 48-bit int
+    """
+    return int(mac.replace(":", ""), 16)
+
+
+def int_to_mac(value: int) -> str:
+    """
+    Method Name: int_to_mac
+    Purpose: Return the 48-bit int as a colon separated, lower case mac
+    """
+    digits = "{:012x}".format(value)
+    return ":".join(digits[i:i + 2] for i in range(0, 12, 2))
+
+
+def mask_to_prefix(mask: int) -> Optional[int]:
+    """
+    Method Name: mask_to_prefix
+    Purpose: Return the prefix length of the 32-bit netmask, None if its set bits are not contiguous
+    """
+    prefix = bin(mask).count("1")
+    return prefix if prefix_to_mask(prefix) == mask else None
+
+
+def prefix_to_mask(prefix: int) -> int:
+    """
+    Method Name: prefix_to_mask
+    Purpose: Return the 32-bit netmask with the first prefix bits set
+    """
+    return (0xffffffff << (32 - prefix)) & 0xffffffff
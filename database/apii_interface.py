@@ -1,11 +1,14 @@
 from typing import Any, Dict, List, Optional, Tuple
 
+from database.addresses import int_to_ip, ip_to_int, prefix_to_mask
 from database.db import Database
 
 class APIIInterface:
     """
     Class Name: APIIInterface
     Purpose: Provide an interface to the database for the APII module
+    Notes:   The database keeps ips as ints and networks as a base ip and a prefix length, the APII
+             gets and gives them as text. They are converted here and nowhere else
     """
 
     def __init__(self, database: Database) -> None:
@@ -16,42 +19,65 @@ class APIIInterface:
         Method Name: get_networks
         Purpose: return a list of "interpreted" networks stored in the database
         """
-        return self.__database.get_networks()
+        return [{"network": int_to_ip(network["network"]), "mask": int_to_ip(prefix_to_mask(network["prefix"])),
+                 "vlan": network["vlan"]}
+                for network in self.__database.get_networks()]
 
     def insert_network_id(self, ip: str, vlan: int, network_id: str, network_name: str) -> None:
         """
         Method Name: insert_network_id
         Purpose: insert unique network id returned from cypherpaths SDIOS restful
         """
-        self.__database.insert_network_id(ip, vlan, network_id, network_name)
+        self.__database.insert_network_id(ip_to_int(ip), vlan, network_id, network_name)
 
     def insert_interface_id(self, machine_id: str, interface_id: str, ip: str) -> None:
         """
         Method Name: insert_interface_id
         Purpose: Insert interface id passed from APII module into the database
         """
-        self.__database.insert_interface_id(machine_id, interface_id, ip)
+        self.__database.insert_interface_id(machine_id, interface_id, ip_to_int(ip))
 
     def get_machines(self) -> List[List[Tuple[str, int]]]:
         """
         Method Name: get_machines
         Purpose: Return a list of all "interpreted" machines stored in the Database
         """
-        return self.__database.get_machines()
+        return [[(int_to_ip(ip), vlan) for ip, vlan in machine] for machine in self.__database.get_machines()]
 
     def insert_machine_id(self, ip: str, machine_id: str, machine_name: str) -> None:
         """
         Method Name: insert_machine_id
         Purpose: insert machine id passed from APII module into the database
         """
-        self.__database.insert_machine_id(ip, machine_id, machine_name)
+        self.__database.insert_machine_id(ip_to_int(ip), machine_id, machine_name)
 
     def get_connections(self, ip: str, vlan: int) -> Optional[Dict[str, Any]]:
         """
         Method Name: get_connections
         Purpose: Return network id that machine at ip is connected to
         """
-        return self.__database.get_connections(ip, vlan)
+        return self.__database.get_connections(ip_to_int(ip), vlan)
+
+    def get_all_connections(self) -> List[Dict[str, Any]]:
+        """
+        Method Name: get_all_connections
+        Purpose: Return the network, interface and machine ids of every interface in one query
+        """
+        connections = self.__database.get_all_connections()
+        for connection in connections:
+            connection["ip"] = int_to_ip(connection["ip"])
+        return connections
+
+    def get_machine_topology(self) -> List[Dict[str, Any]]:
+        """
+        Method Name: get_machine_topology
+        Purpose: Return every machine with its router verdict and its interfaces, each with its SDI network id
+        """
+        machines = self.__database.get_machine_topology()
+        for machine in machines:
+            for interface in machine["interfaces"]:
+                interface["ip"] = int_to_ip(interface["ip"])
+        return machines
 
     def get_routers(self) -> List[str]:
         """
@@ -0,0 +1,199 @@
+from typing import Any, List, Set, Tuple
+
+import time
+
+from database.data_packets import DHCPPacket, IPPacket, IPPacketBatch
+from database.db import Database
+from database.flagger import Flagger
+
+
+class BatchWriter:
+    """
+    Class Name: BatchWriter
+    Responsibility: Buffer packets for the ParserInterface and write them to the database in
+                    batches, one transaction per batch.
+    Notes:          Ip packets are buffered as the columns of an IPPacketBatch, not as objects.
+                    Redundancy is decided as the packets arrive, against the values already in
+                    the database plus the ones waiting in the buffer, so every packet gets the
+                    same Flagger verdict it would get from the unbuffered insert methods.
+    """
+
+    def __init__(self, database: Database, batch_size: int, flush_interval: float) -> None:
+        """
+        Method Name: __init__
+        Purpose: Load the values already stored, a batch is written once it holds batch_size
+                 packets or flush_interval seconds have passed since the last write
+        """
+        self.__database = database
+        self.__batch_size = batch_size
+        self.__flush_interval = flush_interval
+        self.__last_flush = time.time()
+
+        known = database.get_known_values()
+        self.__known_ips = known["ips"]
+        self.__known_macs = known["macs"]
+        self.__known_hosts = known["hosts"]
+        self.__known_user_agents = known["user_agents"]
+        self.__known_servers = known["servers"]
+        self.__known_dhcp_subnets = known["dhcp_subnets"]
+
+        self.__ips = []  # type: List[Tuple[int, int]]
+        self.__macs = []  # type: List[int]
+        self.__hosts = []  # type: List[str]
+        self.__user_agents = []  # type: List[str]
+        self.__servers = []  # type: List[str]
+        self.__ip_packets = IPPacketBatch()
+        # Dhcp packets with the number of ip packets buffered before them
+        self.__dhcp_packets = []  # type: List[Tuple[int, DHCPPacket]]
+
+    def insert_ip_packet(self, packet: IPPacket) -> bool:
+        """
+        Method Name: insert_ip_packet
+        Purpose: Buffer the specified ip packet unless it is redundant
+        """
+
+        # Initialize flagger, all tests must be true to pass
+        flagger = Flagger()
+
+        # Vlan defaults to 0 like Database.insert_ip
+        vlan = packet.vlan_id if packet.vlan_id is not None else 0
+
+        flagger.test(self.__stage_ip(packet.source_ip, vlan))
+        flagger.test(self.__stage_ip(packet.dest_ip, vlan))
+        flagger.test(self.__stage(self.__known_macs, self.__macs, packet.source_mac))
+        flagger.test(self.__stage(self.__known_macs, self.__macs, packet.dest_mac))
+        flagger.test(self.__stage(self.__known_hosts, self.__hosts, str(packet.host)))
+        flagger.test(self.__stage(self.__known_user_agents, self.__user_agents, str(packet.user_agent)))
+        flagger.test(self.__stage(self.__known_servers, self.__servers, str(packet.server)))
+
+        # If the packet is redundant
+        if flagger.all_false():
+            return False
+
+        self.__ip_packets.append(packet)
+        self.__flush_if_due()
+
+        return True
+
+    def insert_flow(self, flow: IPPacket) -> None:
+        """
+        Method Name: insert_flow
+        Purpose: Buffer the specified flow record, flows are never redundant
+        """
+
+        vlan = flow.vlan_id if flow.vlan_id is not None else 0
+
+        self.__stage_ip(flow.source_ip, vlan)
+        self.__stage_ip(flow.dest_ip, vlan)
+        self.__stage(self.__known_macs, self.__macs, flow.source_mac)
+        self.__stage(self.__known_macs, self.__macs, flow.dest_mac)
+        self.__stage(self.__known_hosts, self.__hosts, str(flow.host))
+        self.__stage(self.__known_user_agents, self.__user_agents, str(flow.user_agent))
+        self.__stage(self.__known_servers, self.__servers, str(flow.server))
+
+        self.__ip_packets.append(flow)
+        self.__flush_if_due()
+
+    def insert_dhcp_packet(self, packet: DHCPPacket) -> None:
+        """
+        Method Name: insert_dhcp_packet
+        Purpose: Buffer the specified dhcp packet unless it is redundant
+        """
+
+        # Initialize flagger, all tests must be true to pass
+        flagger = Flagger()
+
+        # If packet is a request
+        if packet.request and packet.client_mac is not None:
+            flagger.test(self.__stage(self.__known_macs, self.__macs, packet.client_mac))
+        # If packet is a response
+        elif not packet.request and packet.client_ip is not None and packet.server_ip is not None and packet.client_mac is not None and packet.server_mac is not None:
+            flagger.test(self.__stage_ip(packet.client_ip, 0))
+            flagger.test(self.__stage_ip(packet.server_ip, 0))
+            flagger.test(self.__stage(self.__known_macs, self.__macs, packet.client_mac))
+            flagger.test(self.__stage(self.__known_macs, self.__macs, packet.server_mac))
+        # If packet is a response without a server that carries a subnet mask, as in ParserInterface
+        elif not packet.request and packet.subnet_mask is not None:
+            if packet.client_ip is not None:
+                flagger.test(self.__stage_ip(packet.client_ip, 0))
+            if packet.client_mac is not None:
+                flagger.test(self.__stage(self.__known_macs, self.__macs, packet.client_mac))
+
+        # The subnet mask given to the client counts as a value too, as in ParserInterface
+        if not packet.request and packet.client_ip is not None and packet.subnet_mask is not None:
+            subnet = (packet.client_ip, packet.subnet_mask)
+            flagger.test(subnet not in self.__known_dhcp_subnets)
+            self.__known_dhcp_subnets.add(subnet)
+
+        # If packet is not redundant
+        if not flagger.all_false():
+            # Foreign keys resolve to NULL for values unknown at this point, as they would if
+            # the packet were written right away
+            staged = DHCPPacket()
+            staged.client_ip = packet.client_ip if packet.client_ip in self.__known_ips else None
+            staged.server_ip = packet.server_ip if packet.server_ip in self.__known_ips else None
+            staged.client_mac = packet.client_mac if packet.client_mac in self.__known_macs else None
+            staged.server_mac = packet.server_mac if packet.server_mac in self.__known_macs else None
+            staged.request = packet.request
+            staged.subnet_mask = packet.subnet_mask
+
+            self.__dhcp_packets.append((len(self.__ip_packets), staged))
+            self.__flush_if_due()
+
+    def flush(self) -> None:
+        """
+        Method Name: flush
+        Purpose: Write every buffered value and packet to the database in one transaction
+        """
+
+        if self.__ips or self.__macs or self.__hosts or self.__user_agents or self.__servers \
+                or self.__ip_packets or self.__dhcp_packets:
+            self.__database.insert_packet_batch(self.__ips, self.__macs, self.__hosts, self.__user_agents,
+                                                self.__servers, self.__ip_packets, self.__dhcp_packets)
+
+        self.__ips = []
+        self.__macs = []
+        self.__hosts = []
+        self.__user_agents = []
+        self.__servers = []
+        self.__ip_packets = IPPacketBatch()
+        self.__dhcp_packets = []
+        self.__last_flush = time.time()
+
+    def __flush_if_due(self) -> None:
+        """
+        Method Name: __flush_if_due
+        Purpose: Flush once the batch is full or the flush interval has passed
+        """
+
+        if len(self.__ip_packets) + len(self.__dhcp_packets) >= self.__batch_size \
+                or time.time() - self.__last_flush >= self.__flush_interval:
+            self.flush()
+
+    def __stage_ip(self, ip: int, vlan: int) -> bool:
+        """
+        Method Name: __stage_ip
+        Purpose: Buffer an ip unless it is known, ips are unique regardless of vlan
+        """
+
+        if ip in self.__known_ips:
+            return False
+
+        self.__known_ips.add(ip)
+        self.__ips.append((ip, vlan))
+
+        return True
+
+    def __stage(self, known: Set[Any], pending: List[Any], value: Any) -> bool:
+        """
+        Method Name: __stage
+        Purpose: Buffer a value unless it is known, returning whether it was new
+        """
+
+        if value in known:
+            return False
+
+        known.add(value)
+        pending.append(value)
+
+        return True
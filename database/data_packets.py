@@ -1,4 +1,7 @@
-from typing import Optional
+from typing import Any, Iterator, List, Optional, Tuple
+
+from array import array
+
 
 """
 Data Packets:
@@ -7,33 +10,126 @@ store the granular data fields of different network packets
 which will be parsed out by the parser
 """
 
+# Stands in for a missing time in an IPPacketBatch
+NAN = float("nan")
+
 class IPPacket:
     """
     Class Name: IPPacket
     Responsibility: Store data from ip packets
+    Notes:          Slotted, millions of these pass through a parse. Ips are 32-bit ints and macs
+                    48-bit ints, as stored in the database
     """
 
-    source_port = None  # type: Optional[int]
-    dest_port = None  # type: Optional[int]
-    vlan_id = None  # type: Optional[int]
-    host = None  # type: Optional[str]
-    user_agent = None  # type: Optional[str]
-    server = None  # type: Optional[str]
+    __slots__ = ("source_ip", "dest_ip", "source_mac", "dest_mac", "source_port", "dest_port", "vlan_id",
+                 "host", "user_agent", "server", "first_seen", "last_seen", "packet_count", "byte_count")
 
-    def __init__(self, source_ip: str, dest_ip: str, source_mac: str, dest_mac: str) -> None:
+    def __init__(self, source_ip: int, dest_ip: int, source_mac: int, dest_mac: int) -> None:
         self.source_ip = source_ip
         self.dest_ip = dest_ip
         self.source_mac = source_mac
         self.dest_mac = dest_mac
+        self.source_port = None  # type: Optional[int]
+        self.dest_port = None  # type: Optional[int]
+        self.vlan_id = None  # type: Optional[int]
+        self.host = None  # type: Optional[str]
+        self.user_agent = None  # type: Optional[str]
+        self.server = None  # type: Optional[str]
+        # A single packet is a flow of one, the flow aggregator grows these
+        self.first_seen = None  # type: Optional[float]
+        self.last_seen = None  # type: Optional[float]
+        self.packet_count = 1
+        self.byte_count = None  # type: Optional[int]
 
 class DHCPPacket:
     """
     Class Name: DHCPPacket
     Responsibility: Store data from dhcp packets
+    Notes:          Ips and macs are ints, like those of IPPacket. Acknowledgements carry the
+                    subnet mask given to the client, as an int
+    """
+
+    __slots__ = ("client_ip", "client_mac", "server_ip", "server_mac", "request", "subnet_mask")
+
+    def __init__(self) -> None:
+        self.client_ip = None  # type: Optional[int]
+        self.client_mac = None  # type: Optional[int]
+        self.server_ip = None  # type: Optional[int]
+        self.server_mac = None  # type: Optional[int]
+        self.request = False
+        self.subnet_mask = None  # type: Optional[int]
+
+class IPPacketBatch:
     """
+    Class Name: IPPacketBatch
+    Responsibility: Hold a batch of ip packets as columns instead of one IPPacket each
+    Notes:          Ips and macs are kept in arrays of 32-bit and 64-bit ints, the text
+                    fields in lists. Missing numbers are stored as MISSING, or NaN for times.
+                    A buffered batch is a few dozen flat arrays the garbage collector never
+                    has to walk, however many packets it holds.
+    """
+
+    MISSING = -1
+
+    def __init__(self) -> None:
+        self.source_ips = array("I")
+        self.dest_ips = array("I")
+        self.source_macs = array("Q")
+        self.dest_macs = array("Q")
+        self.source_ports = array("i")
+        self.dest_ports = array("i")
+        self.vlan_ids = array("i")
+        self.hosts = []  # type: List[Optional[str]]
+        self.user_agents = []  # type: List[Optional[str]]
+        self.servers = []  # type: List[Optional[str]]
+        self.first_seen = array("d")
+        self.last_seen = array("d")
+        self.packet_counts = array("q")
+        self.byte_counts = array("q")
+
+    def __len__(self) -> int:
+        return len(self.source_ips)
+
+    def append(self, packet: IPPacket) -> None:
+        """
+        Method Name: append
+        Purpose: Add the fields of packet as the next row, packet itself is not kept
+        """
+        self.source_ips.append(packet.source_ip)
+        self.dest_ips.append(packet.dest_ip)
+        self.source_macs.append(packet.source_mac)
+        self.dest_macs.append(packet.dest_mac)
+        self.source_ports.append(self.__number(packet.source_port))
+        self.dest_ports.append(self.__number(packet.dest_port))
+        self.vlan_ids.append(self.__number(packet.vlan_id))
+        self.hosts.append(packet.host)
+        self.user_agents.append(packet.user_agent)
+        self.servers.append(packet.server)
+        self.first_seen.append(NAN if packet.first_seen is None else packet.first_seen)
+        self.last_seen.append(NAN if packet.last_seen is None else packet.last_seen)
+        self.packet_counts.append(packet.packet_count)
+        self.byte_counts.append(self.__number(packet.byte_count))
+
+    def rows(self) -> Iterator[Tuple[Any, ...]]:
+        """
+        Method Name: rows
+        Purpose: Yield every row as a tuple in IPPacket field order, with None for missing values
+        """
+        for row in zip(self.source_ips, self.dest_ips, self.source_macs, self.dest_macs,
+                       self.source_ports, self.dest_ports, self.vlan_ids,
+                       self.hosts, self.user_agents, self.servers,
+                       self.first_seen, self.last_seen, self.packet_counts, self.byte_counts):
+            (source_ip, dest_ip, source_mac, dest_mac, source_port, dest_port, vlan_id,
+             host, user_agent, server, first_seen, last_seen, packet_count, byte_count) = row
+            yield (source_ip, dest_ip, source_mac, dest_mac,
+                   self.__value(source_port), self.__value(dest_port), self.__value(vlan_id),
+                   host, user_agent, server,
+                   None if first_seen != first_seen else first_seen,
+                   None if last_seen != last_seen else last_seen,
+                   packet_count, self.__value(byte_count))
+
+    def __number(self, value: Optional[int]) -> int:
+        return self.MISSING if value is None else int(value)
 
-    client_ip = None  # type: Optional[str]
-    client_mac = None  # type: Optional[str]
-    server_ip = None  # type: Optional[str]
-    server_mac = None  # type: Optional[str]
-    request = False
+    def __value(self, number: int) -> Optional[int]:
+        return None if number == self.MISSING else number
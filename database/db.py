@@ -1,8 +1,60 @@
-from typing import Any, Dict, List, Optional, Set, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
 
+import contextlib
+import itertools
 import sqlite3
 
-from database.data_packets import DHCPPacket, IPPacket
+from database.data_packets import DHCPPacket, IPPacket, IPPacketBatch
+from database.interner import Interner
+
+# Stored in user_version. Files written with another layout are refused rather than misread,
+# version 2 stores ips and macs as integers and networks as a base and a prefix length, version 3
+# keeps the subnet mask of DHCP acknowledgements in Services
+SCHEMA_VERSION = 3
+
+# Value tables deduplicated when merging another database: (table, value columns, primary key)
+MERGED_VALUE_TABLES = [
+    ("IPs", "ip, vlan", "ip_pk"),
+    ("Macs", "mac", "mac_pk"),
+    ("Hosts", "host", "host_pk"),
+    ("User_Agents", "user_agent", "user_agent_pk"),
+    ("Servers", "server", "server_pk"),
+]
+
+# Joins an ip to its interface, SDI machine and network ids, formatted with an optional WHERE clause
+CONNECTION_QUERY = """
+    SELECT Machines.machine_pk, IPs.ip, IPs.vlan, Network_ID.id, SDI_Interfaces.interface_id, SDI_Machines.machine_id
+    FROM IPs
+    JOIN Machines ON Machines.machine_pk = IPs.machine_fk
+    JOIN SDI_Interfaces ON SDI_Interfaces.ip_fk = IPs.ip_pk
+    JOIN SDI_Machines ON SDI_Machines.sdi_machine_pk = SDI_Interfaces.sdi_machine_fk
+    JOIN Network_ID ON Network_ID.network_fk = IPs.network_fk
+    {}
+    """
+
+# Settings of a database file, suited to bulk loading: (pragma, value). The page size only
+# applies to a new file, it must be set before the schema is created
+PAGE_SIZE = 8192
+DISK_PRAGMAS = [
+    ("journal_mode", "WAL"),        # Readers do not block the writer, commits append to the log
+    ("synchronous", "NORMAL"),      # Sync at checkpoints only, safe with WAL
+    ("cache_size", "-262144"),      # 256 MiB of page cache
+    ("mmap_size", "1073741824"),    # Read up to 1 GiB of the file through memory mapping
+    ("temp_store", "MEMORY"),       # Sorts and temporary indexes stay in memory
+]
+
+# Tables written by the Interpreter and the APII, emptied by reset_interpretation
+INTERPRETED_TABLES = ["SDI_Interfaces", "SDI_Machines", "Network_ID", "Traits", "Machines", "Networks"]
+
+# Dimension tables kept in memory by an Interner: (table, value column, primary key)
+INTERNED_TABLES = [
+    ("IPs", "ip", "ip_pk"),
+    ("Macs", "mac", "mac_pk"),
+    ("Hosts", "host", "host_pk"),
+    ("User_Agents", "user_agent", "user_agent_pk"),
+    ("Servers", "server", "server_pk"),
+    ("Packet_Types", "type", "packet_type_pk"),
+]
 
 
 class Database:
@@ -11,24 +63,337 @@ class Database:
     Responsibility: Provide database bookkeeping operations to house data.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, path: Optional[str] = None) -> None:
         """
         Method Name: __init__
         Purpose: Load database schema, initialize database.
+        Notes:   Without a path the database is kept in memory. With a path it is stored in that
+                 file, which is created with the schema if it does not exist yet, or reopened with
+                 the data of earlier runs
         """
 
-        # Store database instance in memory
-        self.__database = sqlite3.connect(":memory:")
+        if path is None:
+            # Store database instance in memory
+            self.__database = sqlite3.connect(":memory:")
+        else:
+            self.__database = sqlite3.connect(path)
         self.__cursor = self.__database.cursor()
 
+        # Open transaction() blocks, insert methods only commit outside of them
+        self.__transaction_depth = 0
+
+        if path is not None:
+            self.__cursor.execute("PRAGMA page_size={}".format(PAGE_SIZE))
+            for pragma, value in DISK_PRAGMAS:
+                self.__cursor.execute("PRAGMA {}={}".format(pragma, value))
+
         # Read in database schema and execute, initializing database
-        with open("database/DatabaseSchema.sql") as f:
+        if self.__cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='table'").fetchone()[0] == 0:
+            with open("database/DatabaseSchema.sql") as f:
+                self.__cursor.executescript(f.read())
+            self.__cursor.execute("PRAGMA user_version={}".format(SCHEMA_VERSION))
+        else:
+            version = self.__cursor.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                self.__database.close()
+                raise ValueError("{} uses database layout {}, this nic1 needs layout {}. Parse the captures into a new file"
+                                 .format(path, version, SCHEMA_VERSION))
+
+        # Value to pk mappings of the dimension tables, filled on insert
+        self.__interners = {table: Interner() for table, _column, _pk in INTERNED_TABLES}
+        self.__ip_keys = self.__interners["IPs"]
+        self.__mac_keys = self.__interners["Macs"]
+        self.__host_keys = self.__interners["Hosts"]
+        self.__user_agent_keys = self.__interners["User_Agents"]
+        self.__server_keys = self.__interners["Servers"]
+        self.__packet_type_keys = self.__interners["Packet_Types"]
+
+        # Client ip and subnet mask pairs of the DHCP acknowledgements stored
+        self.__dhcp_subnets = set()  # type: Set[Tuple[int, int]]
+        self.__load_interners()
+
+    def __load_interners(self) -> None:
+        """
+        Method Name: __load_interners
+        Purpose: Fill every interner from the rows of its table, and the known DHCP subnets
+        """
+
+        for table, column, pk in INTERNED_TABLES:
+            interner = self.__interners[table]
+            interner.clear()
+            for value, key in self.__cursor.execute("SELECT {}, {} FROM {}".format(column, pk, table)):
+                interner.add(value, key)
+
+        self.__dhcp_subnets = set(self.get_dhcp_subnets())
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[None]:
+        """
+        Method Name: transaction
+        Purpose: Group every insert and update made inside the with block into one transaction,
+                 committed when the outermost block exits or rolled back on an exception
+        """
+
+        self.__transaction_depth += 1
+        try:
+            yield
+        except Exception:
+            self.__transaction_depth -= 1
+            if self.__transaction_depth == 0:
+                self.__database.rollback()
+            raise
+
+        self.__transaction_depth -= 1
+        self.__commit()
+
+    def __commit(self) -> None:
+        """
+        Method Name: __commit
+        Purpose: Commit, unless a transaction() block is open
+        """
+
+        if self.__transaction_depth == 0:
+            self.__database.commit()
+
+    def __inserted_pk(self) -> int:
+        """
+        Method Name: __inserted_pk
+        Purpose: Return the pk of the row written by the last INSERT
+        Notes:   lastrowid is only None before the cursor has inserted anything
+        """
+
+        pk = self.__cursor.lastrowid
+        if pk is None:
+            raise ValueError("No row has been inserted")
+        return pk
+
+    def close(self) -> None:
+        """
+        Method Name: close
+        Purpose: Commit and close the database, folding the write-ahead log of a database file
+                 back into it
+        """
+
+        self.__database.commit()
+        self.__database.close()
+
+    def reset_interpretation(self) -> None:
+        """
+        Method Name: reset_interpretation
+        Purpose: Delete everything the Interpreter and the APII wrote, keeping the parsed packets
+        Notes:   Run on a reopened database before parsing more files into it. The router ips
+                 added by the Interpreter appear in no packet and are deleted with the rest, so
+                 they are not mistaken for parsed values
+        """
+
+        with self.transaction():
+            for table in INTERPRETED_TABLES:
+                self.__cursor.execute("DELETE FROM {}".format(table))
+
+            self.__cursor.execute("""
+            DELETE FROM IPs
+            WHERE ip_pk NOT IN (SELECT source_ip_fk FROM Packets WHERE source_ip_fk IS NOT NULL
+                                UNION
+                                SELECT dest_ip_fk FROM Packets WHERE dest_ip_fk IS NOT NULL)
+            """)
+            self.__cursor.execute("UPDATE IPs SET network_fk=NULL, machine_fk=NULL "
+                                  "WHERE network_fk IS NOT NULL OR machine_fk IS NOT NULL")
+
+        self.__load_interners()
+
+    def create_indexes(self) -> None:
+        """
+        Method Name: create_indexes
+        Purpose: Create the secondary indexes used by the interpreter and APII queries and refresh
+                 the planner statistics
+        Notes:   Run once the packets are loaded, building an index in one pass is cheaper than
+                 updating it on every insert. Safe to call again
+        """
+
+        with open("database/DatabaseIndexes.sql") as f:
             self.__cursor.executescript(f.read())
 
+        self.__cursor.execute("ANALYZE")
+        self.__commit()
+
+    def set_trace_callback(self, callback: Optional[Callable[[str], None]]) -> None:
+        """
+        Method Name: set_trace_callback
+        Purpose: Call callback with the text of every statement the database runs, None stops tracing
+        """
+
+        self.__database.set_trace_callback(callback)
+
+    def explain_query_plan(self, statement: str) -> List[str]:
+        """
+        Method Name: explain_query_plan
+        Purpose: Return the detail lines of the query plan SQLite picks for statement
+        """
+
+        return [str(row[-1]) for row in self.__database.execute("EXPLAIN QUERY PLAN " + statement)]
+
+    def save(self, path: str) -> None:
+        """
+        Method Name: save
+        Purpose: Write a copy of the whole database to the file at path
+        """
+
+        self.__database.commit()
+
+        target = sqlite3.connect(path)
+        try:
+            self.__database.backup(target)
+        finally:
+            target.close()
+
+    def merge(self, path: str, flows: bool = False) -> None:
+        """
+        Method Name: merge
+        Purpose: Merge the packet data of a database written by save into this database
+        Notes:   IPs, Macs, Hosts, User_Agents and Servers are deduplicated by value, then the
+                 Packets and Services rows are copied with every foreign key remapped to the
+                 matching rows of this database. Packets a sequential run would have found
+                 redundant are left out, flows must be True if the IP rows are flows
+        """
+
+        # The redundancy checks run against the values stored before the merge
+        known_values = self.get_known_values()
+
+        # ATTACH is not allowed inside an open transaction
+        self.__database.commit()
+        self.__cursor.execute("ATTACH DATABASE ? AS worker", (path,))
+
+        try:
+            # Merged packets keep their order, shifted past the packets already stored
+            packet_offset = self.__cursor.execute("SELECT IFNULL(MAX(packet_pk), 0) FROM main.Packets").fetchone()[0]
+
+            self.__cursor.execute("CREATE TEMP TABLE Merged_Packets(worker_pk INTEGER PRIMARY KEY, packet_pk INTEGER)")
+            self.__cursor.executemany("INSERT INTO temp.Merged_Packets(worker_pk, packet_pk) VALUES(?, ?)",
+                                      ((worker_pk, packet_offset + index + 1) for index, worker_pk
+                                       in enumerate(self.__replay_redundancy(known_values, flows))))
+
+            # Redundant values are dropped by the UNIQUE attribute, as in the insert methods
+            for table, columns, pk in MERGED_VALUE_TABLES:
+                self.__cursor.execute("INSERT OR IGNORE INTO main.{0}({1}) SELECT {1} FROM worker.{0} ORDER BY {2}"
+                                      .format(table, columns, pk))
+
+            packet_query = """
+            INSERT INTO main.Packets(   packet_pk, source_ip_fk, dest_ip_fk, source_mac_fk, dest_mac_fk,
+                                        source_port, dest_port, packet_type_fk, host_fk,
+                                        user_agent_fk, server_fk, protocol, vlan,
+                                        first_seen, last_seen, packet_count, byte_count)
+            SELECT  m.packet_pk, sip.ip_pk, dip.ip_pk, smac.mac_pk, dmac.mac_pk,
+                    p.source_port, p.dest_port, pt.packet_type_pk, h.host_pk,
+                    ua.user_agent_pk, s.server_pk, p.protocol, p.vlan,
+                    p.first_seen, p.last_seen, p.packet_count, p.byte_count
+            FROM temp.Merged_Packets AS m
+            JOIN worker.Packets AS p ON p.packet_pk = m.worker_pk
+            LEFT JOIN worker.IPs AS wsip ON wsip.ip_pk = p.source_ip_fk
+            LEFT JOIN main.IPs AS sip ON sip.ip = wsip.ip
+            LEFT JOIN worker.IPs AS wdip ON wdip.ip_pk = p.dest_ip_fk
+            LEFT JOIN main.IPs AS dip ON dip.ip = wdip.ip
+            LEFT JOIN worker.Macs AS wsmac ON wsmac.mac_pk = p.source_mac_fk
+            LEFT JOIN main.Macs AS smac ON smac.mac = wsmac.mac
+            LEFT JOIN worker.Macs AS wdmac ON wdmac.mac_pk = p.dest_mac_fk
+            LEFT JOIN main.Macs AS dmac ON dmac.mac = wdmac.mac
+            LEFT JOIN worker.Packet_Types AS wpt ON wpt.packet_type_pk = p.packet_type_fk
+            LEFT JOIN main.Packet_Types AS pt ON pt.type = wpt.type
+            LEFT JOIN worker.Hosts AS wh ON wh.host_pk = p.host_fk
+            LEFT JOIN main.Hosts AS h ON h.host = wh.host
+            LEFT JOIN worker.User_Agents AS wua ON wua.user_agent_pk = p.user_agent_fk
+            LEFT JOIN main.User_Agents AS ua ON ua.user_agent = wua.user_agent
+            LEFT JOIN worker.Servers AS ws ON ws.server_pk = p.server_fk
+            LEFT JOIN main.Servers AS s ON s.server = ws.server
+            ORDER BY m.worker_pk
+            """
+            self.__cursor.execute(packet_query)
+
+            self.__cursor.execute("""INSERT INTO main.Services(packet_fk, req_res_flag, service, subnet_mask)
+                                  SELECT m.packet_pk, sv.req_res_flag, sv.service, sv.subnet_mask
+                                  FROM worker.Services AS sv
+                                  JOIN temp.Merged_Packets AS m ON m.worker_pk = sv.packet_fk
+                                  ORDER BY sv.service_pk""")
+
+            self.__database.commit()
+        except sqlite3.Error:
+            self.__database.rollback()
+            raise
+        finally:
+            self.__cursor.execute("DROP TABLE IF EXISTS temp.Merged_Packets")
+            self.__cursor.execute("DETACH DATABASE worker")
+
+        # The merged values were inserted behind the interners' backs
+        self.__load_interners()
+
+    def __replay_redundancy(self, known_values: Dict[str, Set[Any]], flows: bool) -> List[int]:
+        """
+        Method Name: __replay_redundancy
+        Purpose: Return the pks of the attached worker packets a sequential run would have kept, in order
+        Notes:   Every packet gets the tests of ParserInterface, against the known values and those of
+                 the packets kept before it. The tested values are read back from the worker rows, a
+                 value that was never tested has a NULL foreign key. Flows are always kept
+        """
+
+        known = set()  # type: Set[Tuple[str, Any]]
+        for kind, name in (("ip", "ips"), ("mac", "macs"), ("host", "hosts"), ("user_agent", "user_agents"),
+                           ("server", "servers"), ("dhcp_subnet", "dhcp_subnets")):
+            known.update((kind, value) for value in known_values[name])
+
+        packet_query = """
+        SELECT  p.packet_pk, pt.type, sip.ip, dip.ip, smac.mac, dmac.mac,
+                h.host, ua.user_agent, s.server, sv.req_res_flag, sv.subnet_mask
+        FROM worker.Packets AS p
+        LEFT JOIN worker.Packet_Types AS pt ON pt.packet_type_pk = p.packet_type_fk
+        LEFT JOIN worker.IPs AS sip ON sip.ip_pk = p.source_ip_fk
+        LEFT JOIN worker.IPs AS dip ON dip.ip_pk = p.dest_ip_fk
+        LEFT JOIN worker.Macs AS smac ON smac.mac_pk = p.source_mac_fk
+        LEFT JOIN worker.Macs AS dmac ON dmac.mac_pk = p.dest_mac_fk
+        LEFT JOIN worker.Hosts AS h ON h.host_pk = p.host_fk
+        LEFT JOIN worker.User_Agents AS ua ON ua.user_agent_pk = p.user_agent_fk
+        LEFT JOIN worker.Servers AS s ON s.server_pk = p.server_fk
+        LEFT JOIN worker.Services AS sv ON sv.packet_fk = p.packet_pk
+        ORDER BY p.packet_pk
+        """
+
+        kept = []  # type: List[int]
+        for (packet_pk, packet_type, source_ip, dest_ip, source_mac, dest_mac,
+             host, user_agent, server, request, subnet_mask) in self.__cursor.execute(packet_query).fetchall():
+            values = []  # type: List[Tuple[str, Any]]
+            if packet_type == "DHCP":
+                if request and source_mac is not None:
+                    values = [("mac", source_mac)]
+                elif not request and None not in (source_ip, dest_ip, source_mac, dest_mac):
+                    values = [("ip", source_ip), ("ip", dest_ip), ("mac", source_mac), ("mac", dest_mac)]
+                elif not request and subnet_mask is not None:
+                    values = [value for value in (("ip", source_ip), ("mac", source_mac)) if value[1] is not None]
+                if not request and source_ip is not None and subnet_mask is not None:
+                    values.append(("dhcp_subnet", (source_ip, subnet_mask)))
+                keep = not values
+            else:
+                values = [("ip", source_ip), ("ip", dest_ip), ("mac", source_mac), ("mac", dest_mac),
+                          ("host", host), ("user_agent", user_agent), ("server", server)]
+                keep = flows
+
+            new = [value for value in values if value not in known]
+            if keep or new:
+                kept.append(packet_pk)
+                known.update(new)
+
+        return kept
+
     #=================================================================================================
     # Data Access Methods
     #=================================================================================================
 
+    def get_intern_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Method Name: get_intern_stats
+        Purpose: Return the size and the hit and miss counters of every interner
+        """
+
+        return {table: {"size": len(interner), "hits": interner.hits, "misses": interner.misses}
+                for table, interner in self.__interners.items()}
+
     def print_all_tables(self) -> None:
         """
         Method Name: print_all_tables
@@ -53,6 +418,11 @@ class Database:
 
         print("\ntotal vlans: {}".format(vlan_num))
 
+        # Print key interning counters
+        print("\ninterners:\n[table, size, hits, misses]")
+        for table, stats in self.get_intern_stats().items():
+            print([table, stats["size"], stats["hits"], stats["misses"]])
+
     def __print_table(self, table_name: str) -> None:
         """
         Method Name: __print_table
@@ -78,11 +448,11 @@ class Database:
     def get_networks(self) -> List[Dict[str, Any]]:
         """
         Method Name: get_networks
-        Purpose:
+        Purpose: Return every network as its base ip, prefix length and vlan
         """
 
-        return [{"network": row[0], "mask": row[1], "vlan": row[2]}
-                for row in self.__cursor.execute("SELECT network, mask, vlan FROM Networks")]
+        return [{"network": row[0], "prefix": row[1], "vlan": row[2]}
+                for row in self.__cursor.execute("SELECT network, prefix, vlan FROM Networks")]
 
     def get_routers(self) -> List[str]:
         """
@@ -90,72 +460,57 @@ class Database:
         Purpose: Get a list of router machine ids from the SDI_Machines table
         """
 
-        machine_id_query = """
-        SELECT machine_id, machine_fk
-        FROM SDI_Machines
-        """
-
         router_query = """
-        SELECT machine_pk
-        FROM Machines
-        WHERE router_confidence > machine_confidence
+        SELECT SDI_Machines.machine_id
+        FROM SDI_Machines
+        JOIN Machines ON Machines.machine_pk = SDI_Machines.machine_fk
+        WHERE Machines.router_confidence > Machines.machine_confidence
+        ORDER BY SDI_Machines.sdi_machine_pk
         """
 
-        # Collect set of routers
-        router_pk_set = {row[0] for row in self.__cursor.execute(router_query)}
-
         # Collect list of routers
-        router_list = [row[0] for row in self.__cursor.execute(machine_id_query)
-                       if row[1] in router_pk_set]
+        router_list = [row[0] for row in self.__cursor.execute(router_query)]
 
         return router_list
 
-    def __get_server_fk(self, server: Optional[str]) -> int:
+    def __get_server_fk(self, server: Optional[str]) -> Optional[int]:
         """
         Method Name: get_server_fk
         Purpose: Get the foreign key of the specified server from the Servers table
         """
 
         # Get server fk matching specified server
-        server_fk = self.__cursor.execute("SELECT server_pk FROM Servers WHERE server=?", (str(server),)).fetchone()[0]
-
-        return server_fk
+        return self.__server_keys.lookup(str(server))
 
-    def __get_user_agent_fk(self, user_agent: Optional[str]) -> int:
+    def __get_user_agent_fk(self, user_agent: Optional[str]) -> Optional[int]:
         """
         Method Name: get_user_agent_fk
         Purpose: Get the foreign key of the specified user_agent from the User_Agents Table
         """
 
         # Get user agent fk matching specified user agent
-        user_agent_fk = self.__cursor.execute("SELECT user_agent_pk FROM User_Agents WHERE user_agent=?", (str(user_agent),)).fetchone()[0]
+        return self.__user_agent_keys.lookup(str(user_agent))
 
-        return user_agent_fk
-
-    def __get_host_fk(self, host: Optional[str]) -> int:
+    def __get_host_fk(self, host: Optional[str]) -> Optional[int]:
         """
         Method Name: get_host_fk
         Purpose: Get the foreign key of the specified host from the Hosts table
         """
 
         # get host fk matching specified host
-        host_fk = self.__cursor.execute("SELECT host_pk FROM Hosts WHERE host=?", (str(host),)).fetchone()[0]
-
-        return host_fk
+        return self.__host_keys.lookup(str(host))
 
 
-    def __get_packet_type_fk(self, packet_type_name: str) -> int:
+    def __get_packet_type_fk(self, packet_type_name: str) -> Optional[int]:
         """
         Method Name: __get_packet_type_fk
         Purpose: Get the foreign key of the specified packet type from the Packets table
         """
 
-        # Get packet type fk matching specified packet type name
-        packet_type_fk = self.__cursor.execute("SELECT packet_type_pk FROM Packet_Types WHERE type=?", (packet_type_name,)).fetchone()[0]
-
-        return packet_type_fk
+        # Get packet type fk matching specified packet type name, loaded with the schema
+        return self.__packet_type_keys.lookup(packet_type_name)
 
-    def __get_ip_fk(self, ip: Optional[str]) -> Optional[int]:
+    def __get_ip_fk(self, ip: Optional[int]) -> Optional[int]:
         """
         Method Name: get_ip_fk
         Purpose: Get the foreign key of the specified ip from the IPs table
@@ -164,16 +519,26 @@ class Database:
         if ip is None:
             return None
 
-        try:
-            # Get ip fk from IPs table
-            ip_pk = self.__cursor.execute("SELECT ip_pk FROM IPs WHERE ip=?", (ip,)).fetchone()[0]
-        except TypeError:
-            # If ip was not found
-            return None
+        # Get ip fk from the IPs interner, None if the ip was not found
+        return self.__ip_keys.lookup(ip)
 
-        return ip_pk
+    def get_known_values(self) -> Dict[str, Set[Any]]:
+        """
+        Method Name: get_known_values
+        Purpose: Return the sets of ips, macs, hosts, user agents, servers and DHCP subnets already stored
+        Notes:   Ips and macs are ints, DHCP subnets are (client ip, subnet mask) pairs of ints
+        """
+
+        return {
+            "ips": {value for value, _pk in self.__ip_keys},
+            "macs": {value for value, _pk in self.__mac_keys},
+            "hosts": {value for value, _pk in self.__host_keys},
+            "user_agents": {value for value, _pk in self.__user_agent_keys},
+            "servers": {value for value, _pk in self.__server_keys},
+            "dhcp_subnets": set(self.__dhcp_subnets),
+        }
 
-    def get_macs(self) -> List[str]:
+    def get_macs(self) -> List[int]:
         """
         Method Name: get_macs
         Purpose: Return the list of mac addresses from the Macs table
@@ -184,7 +549,7 @@ class Database:
 
         return mac_list
 
-    def __get_mac_fk(self, mac: Optional[str]) -> Optional[int]:
+    def __get_mac_fk(self, mac: Optional[int]) -> Optional[int]:
         """
         Method Name: get_mac_fk
         Purpose: Get the foreign key of the specified mac from the Macs table
@@ -193,14 +558,8 @@ class Database:
         if mac is None:
             return None
 
-        try:
-            # Get mac pk from Macs table
-            mac_pk = self.__cursor.execute("SELECT mac_pk FROM Macs WHERE mac=?", (mac,)).fetchone()[0]
-        except TypeError:
-            # If mac was not found
-            return None
-
-        return mac_pk
+        # Get mac pk from the Macs interner, None if the mac was not found
+        return self.__mac_keys.lookup(mac)
 
     def get_ips(self) -> List[Dict[str, Any]]:
         """
@@ -210,143 +569,182 @@ class Database:
 
         packet_type_fk = self.__get_packet_type_fk("IP")
 
-        # Select source and destination packets from Packets table
-        # only for IP packets
-        ip_pk_set = set()  # type: Set[int]
-
-        # Collect ip fks
-        for row in self.__cursor.execute("SELECT source_ip_fk, dest_ip_fk FROM Packets WHERE packet_type_fk=?", (packet_type_fk,)):
-            ip_pk_set.update(set(row))
-
-        dict_list = []
+        # Select the ips used as source or destination by IP packets
+        ip_query = """
+        SELECT ip, vlan
+        FROM IPs
+        WHERE ip_pk IN (SELECT source_ip_fk FROM Packets WHERE packet_type_fk=?
+                        UNION
+                        SELECT dest_ip_fk FROM Packets WHERE packet_type_fk=?)
+        ORDER BY ip_pk
+        """
 
         # Collect ip and vlan data, zip into a dictionary
-        for ip_pk in ip_pk_set:
-            for row in self.__cursor.execute("SELECT ip, vlan FROM IPs WHERE ip_pk=?", (ip_pk,)):
-                dict_list.append({"ip": row[0], "vlan": row[1]})
+        return [{"ip": row[0], "vlan": row[1]}
+                for row in self.__cursor.execute(ip_query, (packet_type_fk, packet_type_fk))]
 
-        return dict_list
-
-    def get_ip_for_mac(self, mac: str) -> List[str]:
+    def get_ip_for_mac(self, mac: int) -> List[int]:
         """
         Method Name: get_ip_for_mac
         Purpose: Get a list of ips associated with the specified mac
         """
 
         # Collect mac pk
-        mac_pk = self.__cursor.execute("SELECT mac_pk FROM Macs WHERE mac=?", (mac,)).fetchone()[0]
+        mac_pk = self.__get_mac_fk(mac)
 
-        sql_query_src = """
-        SELECT source_ip_fk
-        FROM Packets
-        WHERE source_mac_fk=?
+        sql_query = """
+        SELECT ip
+        FROM IPs
+        WHERE ip_pk IN (SELECT source_ip_fk FROM Packets WHERE source_mac_fk=?
+                        UNION
+                        SELECT dest_ip_fk FROM Packets WHERE dest_mac_fk=?)
+        ORDER BY ip_pk
         """
 
-        sql_query_dst = """
-        SELECT dest_ip_fk
-        FROM Packets
-        WHERE dest_mac_fk=?
+        ip_list = [row[0] for row in self.__cursor.execute(sql_query, (mac_pk, mac_pk))]
+
+        return ip_list
+
+    def get_mac_ips(self) -> List[Tuple[int, List[int]]]:
+        """
+        Method Name: get_mac_ips
+        Purpose: Get every mac in the Macs table along with the list of ips associated with it
+        Notes:   One grouped query replaces a get_ip_for_mac call per mac. Macs keep the order
+                 of get_macs and their ips are ordered like get_ip_for_mac
         """
 
-        ip_pk_set = {row[0] for row in self.__cursor.execute(sql_query_src, (mac_pk,))
-                     if row[0] is not None}
+        sql_query = """
+        SELECT pairs.mac_fk, IPs.ip
+        FROM (SELECT source_mac_fk AS mac_fk, source_ip_fk AS ip_fk FROM Packets
+              UNION
+              SELECT dest_mac_fk, dest_ip_fk FROM Packets) AS pairs
+        JOIN IPs ON IPs.ip_pk = pairs.ip_fk
+        ORDER BY pairs.mac_fk, IPs.ip_pk
+        """
 
-        ip_pk_set.update(row[0] for row in self.__cursor.execute(sql_query_dst, (mac_pk,))
-                         if row[0] is not None)
+        mac_ips = []  # type: List[Tuple[int, List[int]]]
+        ip_lists = {}  # type: Dict[int, List[int]]
 
-        ip_list = [self.__cursor.execute("SELECT ip FROM IPs WHERE ip_pk=?", (ip_pk,)).fetchone()[0]
-                   for ip_pk in ip_pk_set]
+        # Macs with no ips still get an entry
+        for mac_pk, mac in self.__cursor.execute("SELECT mac_pk, mac FROM Macs ORDER BY mac_pk").fetchall():
+            ip_lists[mac_pk] = []
+            mac_ips.append((mac, ip_lists[mac_pk]))
 
-        return ip_list
+        for mac_pk, ip in self.__cursor.execute(sql_query):
+            if mac_pk in ip_lists:
+                ip_lists[mac_pk].append(ip)
 
-    def get_machines(self) -> List[List[Tuple[str, int]]]:
+        return mac_ips
+
+    def get_dhcp_subnets(self) -> List[Tuple[int, int]]:
         """
-        Method Name: get_machines
-        Purpose: Get a list of ips associated with unique machines in the Machines table
+        Method Name: get_dhcp_subnets
+        Purpose: Get the client ip and subnet mask of every DHCP acknowledgement that carried a mask
         """
 
-        machine_list = []
-        ip_list = []
+        sql_query = """
+        SELECT IPs.ip, Services.subnet_mask
+        FROM Services
+        JOIN Packets ON Packets.packet_pk = Services.packet_fk
+        JOIN IPs ON IPs.ip_pk = Packets.source_ip_fk
+        WHERE Services.subnet_mask IS NOT NULL
+        ORDER BY Services.service_pk
+        """
 
-        ip_sql_query = """
-            SELECT ip, vlan
-            FROM IPs
-            WHERE machine_fk=?
-            """
+        return [(row[0], row[1]) for row in self.__cursor.execute(sql_query)]
 
-        machine_pk_sql_query = """
-            SELECT machine_pk
+    def get_machines(self) -> List[List[Tuple[int, int]]]:
+        """
+        Method Name: get_machines
+        Purpose: Get a list of ips associated with unique machines in the Machines table
+        """
+
+        machine_query = """
+            SELECT IPs.machine_fk, IPs.ip, IPs.vlan
             FROM Machines
+            JOIN IPs ON IPs.machine_fk = Machines.machine_pk
+            ORDER BY Machines.machine_pk, IPs.ip_pk
             """
-        # Nested cursors are required for the following queries
-        temp_cursor = self.__database.cursor()
 
-        # Collect machine list
-        for machine_pk in self.__cursor.execute(machine_pk_sql_query):
-            for ip, vlan in temp_cursor.execute(ip_sql_query, (machine_pk[0],)):
-                ip_list.append((ip, vlan))
-            if len(ip_list) > 0:
-                machine_list.append(list(ip_list))
-            ip_list.clear()
+        # Collect machine list, machines without ips are left out by the join
+        machine_list = []  # type: List[List[Tuple[int, int]]]
+        last_machine_pk = None
+
+        for machine_pk, ip, vlan in self.__cursor.execute(machine_query):
+            if machine_pk != last_machine_pk:
+                machine_list.append([])
+                last_machine_pk = machine_pk
+            machine_list[-1].append((ip, vlan))
 
         return machine_list
 
-    def get_connections(self, ip: str, vlan: int) -> Optional[Dict[str, Any]]:
+    def get_connections(self, ip: int, vlan: int) -> Optional[Dict[str, Any]]:
         """
         Method Name: get_connections
         Purpose: Resolves network connection for machine
         """
 
-        try:
-            # Collect ip_pk and network_fk
-            res = self.__cursor.execute("SELECT ip_pk, network_fk FROM IPs WHERE ip=?", (ip,)).fetchone()
-        except Exception:
-            # If matching ip not found
+        connection_query = CONNECTION_QUERY.format("WHERE IPs.ip=?") + "LIMIT 1"
+
+        # Collect ids, None if the ip, its interface, machine or network was not found
+        row = self.__cursor.execute(connection_query, (ip,)).fetchone()
+        if row is None:
             return None
 
-        ip_pk = res[0]
-        network_pk = res[1]
+        return {"network_id": row[3], "interface_id": row[4], "machine_id": row[5]}
 
-        try:
-            # Collect interface_id and sdi_machine_fk
-            res = self.__cursor.execute("SELECT interface_id, sdi_machine_fk FROM SDI_Interfaces WHERE ip_fk=?", (ip_pk,)).fetchone()
-        except Exception:
-            # If no matching ip_pk was found
-            return None
+    def get_all_connections(self) -> List[Dict[str, Any]]:
+        """
+        Method Name: get_all_connections
+        Purpose: Resolve the network connection of every interface at once
+        Notes:   Rows come in get_machines order, each with the ip and vlan it belongs to
+        """
 
-        interface_id = res[0]
-        sdi_machine_pk = res[1]
+        connection_query = CONNECTION_QUERY.format("") + "ORDER BY Machines.machine_pk, IPs.ip_pk"
 
-        try:
-            # Collect machine_id
-            machine_id = self.__cursor.execute("SELECT machine_id FROM SDI_Machines WHERE sdi_machine_pk=?", (sdi_machine_pk,)).fetchone()[0]
-        except Exception:
-            # If no matching sdi_machine_pk was found
-            return None
+        return [{"ip": row[1], "vlan": row[2], "network_id": row[3], "interface_id": row[4], "machine_id": row[5]}
+                for row in self.__cursor.execute(connection_query)]
 
-        try:
-            # Collect ids
-            network_id = self.__cursor.execute("SELECT id FROM Network_ID WHERE network_fk=?", (network_pk,)).fetchone()[0]
-        except Exception:
-            # If no matching network_pk was found
-            return None
+    def get_machine_topology(self) -> List[Dict[str, Any]]:
+        """
+        Method Name: get_machine_topology
+        Purpose: Get every machine with its mac, its router verdict and its interfaces, each with the id of the SDI
+                 network it belongs on (None if that network was not created)
+        Notes:   Machines come in get_machines order
+        """
 
-        self.__database.commit()
+        topology_query = """
+            SELECT Machines.machine_pk, Machines.mac, Machines.router_confidence > Machines.machine_confidence,
+                   IPs.ip, IPs.vlan, Network_ID.id
+            FROM Machines
+            JOIN IPs ON IPs.machine_fk = Machines.machine_pk
+            LEFT JOIN Network_ID ON Network_ID.network_fk = IPs.network_fk
+            ORDER BY Machines.machine_pk, IPs.ip_pk
+            """
 
-        return {"network_id": network_id, "interface_id": interface_id, "machine_id": machine_id}
+        machine_list = []  # type: List[Dict[str, Any]]
+        last_machine_pk = None
+
+        for machine_pk, mac, router, ip, vlan, network_id in self.__cursor.execute(topology_query):
+            if machine_pk != last_machine_pk:
+                machine_list.append({"mac": mac, "router": bool(router), "interfaces": []})
+                last_machine_pk = machine_pk
+            machine_list[-1]["interfaces"].append({"ip": ip, "vlan": vlan, "network_id": network_id})
+
+        return machine_list
 
     #=================================================================================================
     # Data Insertion Methods
     #=================================================================================================
 
-    def insert_interface_id(self, machine_id: str, interface_id: str, ip: str) -> bool:
+    def insert_interface_id(self, machine_id: str, interface_id: str, ip: int) -> bool:
         """
         Method Name: insert_interface_id
         Purpose: insert give interface_id into the database, setting relations to ip and SDI_machine_id tables
         """
 
         # Collect ip pk
-        ip_pk = self.__cursor.execute("SELECT ip_pk FROM IPs WHERE ip=?", (ip,)).fetchone()[0]
+        ip_pk = self.__get_ip_fk(ip)
 
         try:
             # Collect sdi machine pk
@@ -357,34 +755,36 @@ class Database:
 
         # Enter specified entry, interface_id, and ip_pk into SDI_Interfaces
         self.__cursor.execute("INSERT INTO SDI_Interfaces(sdi_machine_fk, interface_id, ip_fk) VALUES(?, ?, ?)", (entry, interface_id, ip_pk))
-        self.__database.commit()
+        self.__commit()
 
         return True
 
-    def insert_entry_ip_table(self, ip: str, network: Optional[str], machine_pk: int) -> None:
+    def insert_entry_ip_table(self, ip: int, network: Optional[int], machine_pk: int) -> None:
         """
         Method Name: insert_entry_ip_table
         Purpose: Insert given ip into IPs table setting relations to network and machine tables
         """
 
         # Collect network pk
-        network_pk = self.__cursor.execute("SELECT network_pk FROM Networks WHERE network=?", (str(network),)).fetchone()[0]
+        network_pk = self.__cursor.execute("SELECT network_pk FROM Networks WHERE network=?", (network,)).fetchone()[0]
 
         # Insert specified ip, network_pk, and machine_pk into IPs
         self.__cursor.execute("INSERT INTO IPs(ip, network_fk, machine_fk) VALUES(?, ?, ?)", (ip, network_pk, machine_pk))
-        self.__database.commit()
 
-    def update_ip_table(self, ip_list: List[str], machine_pk: int) -> None:
+        # Later foreign keys, such as the ip_fk of the router's interface, resolve through the interner
+        self.__ip_keys.add(ip, self.__inserted_pk())
+        self.__commit()
+
+    def update_ip_table(self, ip_list: List[int], machine_pk: int) -> None:
         """
         Method Name: update_ip_table
         Purpose: Update relation to machine in ip table for specified ip
         """
 
         # Update each ip row with ip in ip_list, inserting specified machine_pk into row
-        for ip in ip_list:
-            self.__cursor.execute("UPDATE IPs SET machine_fk=? WHERE ip=?", (machine_pk, ip))
+        self.__cursor.executemany("UPDATE IPs SET machine_fk=? WHERE ip=?", ((machine_pk, ip) for ip in ip_list))
 
-        self.__database.commit()
+        self.__commit()
 
     def insert_machine(self, mac: str, machine_confidence: float, router_confidence: float) -> int:
         """
@@ -394,11 +794,11 @@ class Database:
 
         # Insert specified mac, machine_confidence, and router_confidence into Machines
         self.__cursor.execute("INSERT INTO Machines(mac, machine_confidence, router_confidence) VALUES(?, ?, ?)", (mac, int(machine_confidence), int(router_confidence)))
-        self.__database.commit()
+        self.__commit()
 
         return self.__cursor.lastrowid
 
-    def insert_machine_id(self, ip: str, machine_id: str, machine_name: str) -> None:
+    def insert_machine_id(self, ip: int, machine_id: str, machine_name: str) -> None:
         """
         Method Name: insert_machine_id
         Purpose: Insert the specified machine_id into SDI_Machines, setting relation to Machines
@@ -410,12 +810,13 @@ class Database:
         # Insert specified machine_pk, machine_id, and machine_name into SDI_Machines
         self.__cursor.execute("INSERT INTO SDI_Machines(machine_fk, machine_id, name) VALUES(?, ?, ?)", (machine_pk, machine_id, machine_name))
 
-        self.__database.commit()
+        self.__commit()
 
-    def insert_network(self, network: str, mask: str, ip: str, vlan: int) -> bool:
+    def insert_network(self, network: int, prefix: int, ip: int, vlan: int) -> bool:
         """
         Method Name: insert_network
         Purpose: Insert the specified network information into the Networks table
+        Notes:   A network is its base ip and its prefix length
         """
 
         # Query if the network vlan pair already exists
@@ -426,7 +827,7 @@ class Database:
             # Insert it into the database
             # Ensure that we don't break any table constraints with the insert (should never except)
             try:
-                self.__cursor.execute("INSERT INTO Networks(network, mask, vlan) VALUES(?, ?, ?)", (network, mask, vlan))
+                self.__cursor.execute("INSERT INTO Networks(network, prefix, vlan) VALUES(?, ?, ?)", (network, prefix, vlan))
                 # Store the pk of the inserted row (used for updating row values later)
                 network_pk = self.__cursor.lastrowid
             except sqlite3.IntegrityError:
@@ -444,7 +845,37 @@ class Database:
 
         return True
 
-    def insert_network_id(self, ip: str, vlan: int, network_id: str, network_name: str) -> None:
+    def insert_networks(self, rows: List[Tuple[int, int, int, int]]) -> None:
+        """
+        Method Name: insert_networks
+        Purpose: Insert the networks of many ips at once, rows are (network, prefix, ip, vlan) as
+                 passed to insert_network
+        Notes:   Gives the same rows as calling insert_network for each row in order, with one
+                 executemany for the new networks and one for the ip assignments, in one transaction
+        """
+
+        with self.transaction():
+            # Networks already stored keep their pk, as insert_network would find them
+            network_keys = {(network, vlan): network_pk for network, vlan, network_pk
+                            in self.__cursor.execute("SELECT network, vlan, network_pk FROM Networks")}
+
+            new_networks = {}  # type: Dict[Tuple[int, int], int]
+            for network, prefix, _ip, vlan in rows:
+                if (network, vlan) not in network_keys and (network, vlan) not in new_networks:
+                    new_networks[(network, vlan)] = prefix
+
+            if new_networks:
+                last_pk = self.__cursor.execute("SELECT IFNULL(MAX(network_pk), 0) FROM Networks").fetchone()[0]
+                self.__cursor.executemany("INSERT INTO Networks(network, prefix, vlan) VALUES(?, ?, ?)",
+                                          ((network, prefix, vlan) for (network, vlan), prefix in new_networks.items()))
+                for network, vlan, network_pk in self.__cursor.execute(
+                        "SELECT network, vlan, network_pk FROM Networks WHERE network_pk > ?", (last_pk,)):
+                    network_keys[(network, vlan)] = network_pk
+
+            self.__cursor.executemany("UPDATE IPs SET network_fk=? WHERE ip=? AND vlan=?",
+                                      ((network_keys[(network, vlan)], ip, vlan) for network, _prefix, ip, vlan in rows))
+
+    def insert_network_id(self, ip: int, vlan: int, network_id: str, network_name: str) -> None:
         """
         Method Name: insert_network_id
         Purpose: Insert the specified network id and network name into the Network_ID table.
@@ -460,7 +891,7 @@ class Database:
         if network_pk is not None:
             # Insert specified network_pk, network_id, and network_name into Network_ID table
             self.__cursor.execute("INSERT INTO Network_Id(network_fk, id, name) VALUES(?, ?, ?)", (network_pk, network_id, network_name))
-            self.__database.commit()
+            self.__commit()
 
     def insert_host(self, host: Optional[str]) -> bool:
         """
@@ -468,6 +899,10 @@ class Database:
         Purpose: Insert the specified host into the Hosts table
         """
 
+        # If host is already in the table
+        if self.__host_keys.lookup(str(host)) is not None:
+            return False
+
         try:
             # Insert specified host into Hosts table
             self.__cursor.execute("INSERT INTO Hosts(host) VALUES(?)", (str(host),))
@@ -475,7 +910,8 @@ class Database:
             # If host is already in the table
             return False
 
-        self.__database.commit()
+        self.__host_keys.add(str(host), self.__inserted_pk())
+        self.__commit()
 
         return True
 
@@ -485,6 +921,10 @@ class Database:
         Purpose: Insert the specified user agent into the User_Agents table
         """
 
+        # If user agent is already in the table
+        if self.__user_agent_keys.lookup(str(user_agent)) is not None:
+            return False
+
         try:
             # Insert specified user agent into User_Agents table
             self.__cursor.execute("INSERT INTO User_Agents(user_agent) VALUES(?)", (str(user_agent),))
@@ -492,7 +932,8 @@ class Database:
             # If user_agent is already in the table
             return False
 
-        self.__database.commit()
+        self.__user_agent_keys.add(str(user_agent), self.__inserted_pk())
+        self.__commit()
 
         return True
 
@@ -502,6 +943,10 @@ class Database:
         Purpose: Insert the specified server into the Servers table
         """
 
+        # If server is already in the table
+        if self.__server_keys.lookup(str(server)) is not None:
+            return False
+
         try:
             # Insert specified server into Servers table
             self.__cursor.execute("INSERT INTO Servers(server) VALUES(?)", (str(server),))
@@ -509,17 +954,22 @@ class Database:
             # If server is already in the table
             return False
 
-        self.__database.commit()
+        self.__server_keys.add(str(server), self.__inserted_pk())
+        self.__commit()
 
         return True
 
-    def insert_ip(self, ip: str, vlan: int = 0) -> bool:
+    def insert_ip(self, ip: int, vlan: int = 0) -> bool:
         """
         Method Name: insert_ip
         Purpose: Insert specified ip address and vlan (default 0) into the database
         Notes: Redundant ips will not be inserted due to the UNIQUE attribute in the database schema
         """
 
+        # If ip is already in the table, whatever its vlan
+        if self.__ip_keys.lookup(ip) is not None:
+            return False
+
         try:
             # Insert specified ip and vlan data into IPs table
             self.__cursor.execute("INSERT INTO IPs(ip, vlan) VALUES(?, ?)", (ip, vlan))
@@ -527,17 +977,22 @@ class Database:
             # If ip and vlan combination is already in the table
             return False
 
-        self.__database.commit()
+        self.__ip_keys.add(ip, self.__inserted_pk())
+        self.__commit()
 
         return True
 
-    def insert_mac(self, mac: str) -> bool:
+    def insert_mac(self, mac: int) -> bool:
         """
         Method Name: insert_mac
         Purpose: Insert specified mac address into the database
         Notes: Redundant ips will not be inserted due to the UNIQUE attribute in the database schema
         """
 
+        # If mac is already in the table
+        if self.__mac_keys.lookup(mac) is not None:
+            return False
+
         try:
             # Insert specified mac into the Macs table
             self.__cursor.execute("INSERT INTO Macs(mac) VALUES(?)", (mac,))
@@ -545,10 +1000,25 @@ class Database:
             # If mac is already in the table
             return False
 
-        self.__database.commit()
+        self.__mac_keys.add(mac, self.__inserted_pk())
+        self.__commit()
 
         return True
 
+    def insert_dhcp_subnet(self, ip: int, subnet_mask: int) -> bool:
+        """
+        Method Name: insert_dhcp_subnet
+        Purpose: Record the subnet mask a DHCP server acknowledged the client ip with
+        Notes:   The mask is stored in Services by insert_dhcp_packet, with the acknowledgement carrying it.
+                 Like insert_ip, this returns whether the pair is new, so a repeated acknowledgement is redundant
+        """
+
+        if (ip, subnet_mask) in self.__dhcp_subnets:
+            return False
+
+        self.__dhcp_subnets.add((ip, subnet_mask))
+        return True
+
     def insert_ip_packet(self, packet: IPPacket) -> None:
         """
         Method Name: insert_ip_packet
@@ -567,19 +1037,22 @@ class Database:
         packet_query = """
             INSERT INTO Packets(    source_ip_fk, dest_ip_fk, source_mac_fk, dest_mac_fk,
                                     source_port, dest_port, packet_type_fk, host_fk,
-                                    user_agent_fk, server_fk)
+                                    user_agent_fk, server_fk, vlan,
+                                    first_seen, last_seen, packet_count, byte_count)
             VALUES(?, ?, ?, ?,
                    ?, ?, ?, ?,
-                   ?, ?)
+                   ?, ?, ?,
+                   ?, ?, ?, ?)
             """
         packet_values = (source_ip_fk, dest_ip_fk, source_mac_fk, dest_mac_fk,
                          packet.source_port, packet.dest_port, self.__get_packet_type_fk("IP"), host_fk,
-                         user_agent_fk, server_fk)
+                         user_agent_fk, server_fk, packet.vlan_id,
+                         packet.first_seen, packet.last_seen, packet.packet_count, packet.byte_count)
 
         # Insert data into Packets table
         self.__cursor.execute(packet_query, packet_values)
 
-        self.__database.commit()
+        self.__commit()
 
     def insert_dhcp_packet(self, packet: DHCPPacket) -> None:
         """
@@ -606,6 +1079,102 @@ class Database:
         # Collect row id of inserted packet
         _id = self.__cursor.lastrowid
 
-        # Insert id and packet.request into Services table
-        self.__cursor.execute("INSERT INTO Services( packet_fk, req_res_flag) VALUES(?, ?)", (_id, packet.request))
-        self.__database.commit()
+        # Insert id, packet.request and packet.subnet_mask into Services table
+        self.__cursor.execute("INSERT INTO Services( packet_fk, req_res_flag, subnet_mask) VALUES(?, ?, ?)",
+                              (_id, packet.request, packet.subnet_mask))
+        self.__commit()
+
+    def insert_packet_batch(self, ips: List[Tuple[int, int]], macs: List[int], hosts: List[str],
+                            user_agents: List[str], servers: List[str],
+                            ip_packets: IPPacketBatch, dhcp_packets: List[Tuple[int, DHCPPacket]]) -> None:
+        """
+        Method Name: insert_packet_batch
+        Purpose: Insert a batch of new values and packets in a single transaction
+        Notes:   The caller has already checked the packets for redundancy, foreign keys are
+                 resolved through the interners once the new values are stored. Every dhcp packet
+                 comes with the number of ip packets that arrived before it, so packets get their
+                 pks in the order they arrived, as with the unbuffered insert methods
+        """
+
+        ip_packet_query = """
+            INSERT INTO Packets(    source_ip_fk, dest_ip_fk, source_mac_fk, dest_mac_fk,
+                                    source_port, dest_port, packet_type_fk, host_fk,
+                                    user_agent_fk, server_fk, vlan,
+                                    first_seen, last_seen, packet_count, byte_count)
+            VALUES(?, ?, ?, ?,
+                   ?, ?, ?, ?,
+                   ?, ?, ?,
+                   ?, ?, ?, ?)
+            """
+
+        dhcp_packet_query = """
+            INSERT INTO Packets(source_ip_fk, dest_ip_fk, source_mac_fk, dest_mac_fk, packet_type_fk)
+            VALUES(?, ?, ?, ?, ?)
+            """
+
+        ip_type_fk = self.__get_packet_type_fk("IP")
+        dhcp_type_fk = self.__get_packet_type_fk("DHCP")
+
+        # The connection context manager commits the whole batch, or rolls it back on error
+        with self.__database:
+            self.__insert_interned_values("IPs", "ip, vlan", "ip_pk", ips)
+            self.__insert_interned_values("Macs", "mac", "mac_pk", [(mac,) for mac in macs])
+            self.__insert_interned_values("Hosts", "host", "host_pk", [(host,) for host in hosts])
+            self.__insert_interned_values("User_Agents", "user_agent", "user_agent_pk",
+                                          [(user_agent,) for user_agent in user_agents])
+            self.__insert_interned_values("Servers", "server", "server_pk", [(server,) for server in servers])
+
+            ip_rows = ip_packets.rows()
+            written = 0
+
+            # Services rows need the pk of their packet, so dhcp packets go one at a time, after the
+            # ip packets that arrived before them
+            for position, packet in dhcp_packets:
+                self.__cursor.executemany(ip_packet_query,
+                                          self.__ip_packet_values(itertools.islice(ip_rows, position - written), ip_type_fk))
+                written = position
+
+                self.__cursor.execute(dhcp_packet_query, (self.__get_ip_fk(packet.client_ip), self.__get_ip_fk(packet.server_ip),
+                                                          self.__get_mac_fk(packet.client_mac), self.__get_mac_fk(packet.server_mac),
+                                                          dhcp_type_fk))
+                self.__cursor.execute("INSERT INTO Services( packet_fk, req_res_flag, subnet_mask) VALUES(?, ?, ?)",
+                                      (self.__cursor.lastrowid, packet.request, packet.subnet_mask))
+                if packet.client_ip is not None and packet.subnet_mask is not None:
+                    self.__dhcp_subnets.add((packet.client_ip, packet.subnet_mask))
+
+            self.__cursor.executemany(ip_packet_query, self.__ip_packet_values(ip_rows, ip_type_fk))
+
+    def __ip_packet_values(self, rows: Iterator[Tuple[Any, ...]], ip_type_fk: Optional[int]) -> Iterator[Tuple[Any, ...]]:
+        """
+        Method Name: __ip_packet_values
+        Purpose: Yield the Packets values of IPPacketBatch rows, foreign keys resolved through the interners
+        """
+
+        for (source_ip, dest_ip, source_mac, dest_mac, source_port, dest_port, vlan_id,
+             host, user_agent, server, first_seen, last_seen, packet_count, byte_count) in rows:
+            yield (self.__get_ip_fk(source_ip), self.__get_ip_fk(dest_ip),
+                   self.__get_mac_fk(source_mac), self.__get_mac_fk(dest_mac),
+                   source_port, dest_port, ip_type_fk, self.__get_host_fk(host),
+                   self.__get_user_agent_fk(user_agent), self.__get_server_fk(server),
+                   vlan_id, first_seen, last_seen, packet_count, byte_count)
+
+    def __insert_interned_values(self, table: str, columns: str, pk: str, rows: List[Tuple[Any, ...]]) -> None:
+        """
+        Method Name: __insert_interned_values
+        Purpose: Insert rows into a dimension table with executemany, then intern the new rows
+        Notes:   The first of columns is the interned value. Rows get increasing pks, so the new
+                 ones are exactly those past the largest pk before the insert
+        """
+
+        if not rows:
+            return
+
+        interner = self.__interners[table]
+        last_pk = self.__cursor.execute("SELECT IFNULL(MAX({}), 0) FROM {}".format(pk, table)).fetchone()[0]
+
+        self.__cursor.executemany("INSERT OR IGNORE INTO {}({}) VALUES({})"
+                                  .format(table, columns, ", ".join("?" * len(rows[0]))), rows)
+
+        column = columns.split(",")[0]
+        for value, key in self.__cursor.execute("SELECT {}, {} FROM {} WHERE {} > ?".format(column, pk, table, pk), (last_pk,)):
+            interner.add(value, key)
@@ -0,0 +1,50 @@
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
+class Interner:
+    """
+    Class Name: Interner
+    Responsibility: Keep the value to primary key mapping of one dimension table in memory so
+                    foreign keys and redundancy checks are resolved without querying SQLite.
+    Usage:          Every lookup is counted as a hit or a miss, add is called with the pk of
+                    each row inserted into the table.
+    """
+
+    def __init__(self) -> None:
+        self.__keys = {}  # type: Dict[Any, int]
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.__keys)
+
+    def __iter__(self) -> Iterator[Tuple[Any, int]]:
+        return iter(self.__keys.items())
+
+    def lookup(self, value: Any) -> Optional[int]:
+        """
+        Method Name: lookup
+        Purpose: Return the pk stored for value, or None if the value is unknown
+        """
+        pk = self.__keys.get(value)
+
+        if pk is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return pk
+
+    def add(self, value: Any, pk: int) -> None:
+        """
+        Method Name: add
+        Purpose: Record the pk of a newly inserted value
+        """
+        self.__keys[value] = pk
+
+    def clear(self) -> None:
+        """
+        Method Name: clear
+        Purpose: Forget every value, the counters are kept
+        """
+        self.__keys.clear()
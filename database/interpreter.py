@@ -1,9 +1,9 @@
-from typing import List, Tuple
-
-import ipaddress
+from typing import List, Set, Tuple
 
+from database.addresses import int_to_ip, int_to_mac
 from database.db import Database
 from nicparser.ip_classes import Classes
+from nicparser.network_inference import NetworkInference
 
 
 CLASS_A_MASK_INT = 0xff
@@ -23,6 +23,10 @@ class Interpreter:
         # Create an instance of Classes for network masking
         self.__ip_classes = Classes()
 
+        # Subnets seen in the capture, filled in by interpret
+        self.__network_inference = NetworkInference()
+        self.__network_bases = set()  # type: Set[Tuple[int, int]]
+
         # Set confidence values for machine/router confidence calculations
         self.__max_confidence = 1.0
         self.__min_confidence = 0.0
@@ -34,30 +38,64 @@ class Interpreter:
         """
         Method Name: interpret
         Purpose: Call the specific interpreter methods
+        Notes:   The subnets seen in the capture are gathered first, the networks and the routers
+                 both depend on them
         """
+        # Every mac with its ips, from one grouped query
+        mac_ip_lists = self.__database.get_mac_ips()
+
+        self.__gather_subnets(mac_ip_lists)
         self.__interpret_networks()
-        self.__interpret_machines()
+        self.__interpret_machines(mac_ip_lists)
+
+
+    def __gather_subnets(self, mac_ip_lists: List[Tuple[int, List[int]]]) -> None:
+        """
+        Method Name: gather_subnets
+        Purpose: Record the evidence of subnets in the capture. The masks DHCP servers acknowledged
+        clients with come first, then the "#.#.#.1" addresses of the macs taken for routers, which
+        stand for the /24 they answer on unless a DHCP subnet holds them.
+        """
+        for ip, subnet_mask in self.__database.get_dhcp_subnets():
+            self.__network_inference.add_dhcp_subnet(ip, subnet_mask)
+
+        for _mac, mac_ip_list in mac_ip_lists:
+            router_confidence, machine_confidence = self.__calculate_confidence(mac_ip_list)
+            if router_confidence <= machine_confidence:
+                continue
+
+            for ip in mac_ip_list:
+                if self.__ip_classes.mask_ip_address(ip, CLASS_A_MASK_INT) == 1:
+                    self.__network_inference.add_router(ip)
 
 
     def __interpret_networks(self) -> None:
         """
         Method Name: interpret_networks
-        Purpose: Take IPs stored in the database and mask it based on classful masking
-        to get the network IP and network mask. The network table of the database is then
-        populated with the network IP, network mask, IP, and VLAN info (if it exists).
+        Purpose: Take IPs stored in the database and find the longest subnet seen in the capture that
+        holds them, or mask them based on classful masking, to get the network IP and network mask.
+        The network table of the database is then populated with the network IP, network mask, IP,
+        and VLAN info (if it exists).
         If there is no VLAN associated with the IP then we use the default value of "1".
         """
         # get_ips() returns list of dictionaries with ip and vlan key values
         ip_dict_list = self.__database.get_ips()
-        for ip_dict in ip_dict_list:
-            # Get network IP (masked_ip) and network mask based on classful masking function in ip_classes.py
-            masked_ip, network_mask = self.__ip_classes.get_network_with_mask_used(ip_dict["ip"])
 
-            if masked_ip is not None and network_mask is not None:
-                self.__database.insert_network(masked_ip, network_mask, ip_dict["ip"], ip_dict["vlan"])
+        # Get network IP (masked_ip) and prefix length of every ip at once, from the subnets gathered or
+        # classful masking in ip_classes.py
+        networks = self.__network_inference.get_networks_with_prefixes([ip_dict["ip"] for ip_dict in ip_dict_list])
 
+        # Write every network and ip assignment in one batch
+        rows = [(masked_ip, network_prefix, ip_dict["ip"], ip_dict["vlan"])
+                for ip_dict, (masked_ip, network_prefix) in zip(ip_dict_list, networks)
+                if masked_ip is not None and network_prefix is not None]
+        self.__database.insert_networks(rows)
 
-    def __calculate_confidence(self, mac_ip_list: List[str]) -> Tuple[float, float]:
+        # Remember the networks created with their vlan, routers made up later may need one of their own
+        self.__network_bases = {(row[0], row[3]) for row in rows}
+
+
+    def __calculate_confidence(self, mac_ip_list: List[int]) -> Tuple[float, float]:
         """
         Method Name: calculate_confidence
         Purpose: Find the router_confidence and machine_confidence for a given mac IP list.
@@ -83,7 +121,7 @@ class Interpreter:
         return router_confidence, machine_confidence
 
 
-    def __interpret_machines(self) -> None:
+    def __interpret_machines(self, mac_ip_lists: List[Tuple[int, List[int]]]) -> None:
         """
         Method Name: interpret_machines
         Purpose: For each mac address in the database, determine if it is a router or a regular machine.
@@ -91,45 +129,62 @@ class Interpreter:
         IPs that are associated with the router as a machine into the machine network table. If the mac address
         is a regular machine, then just insert it as a machine into the network table.
         """
-        mac_list = self.__database.get_macs()
+        # All Machines and IPs writes go out in a single transaction
+        with self.__database.transaction():
+            for mac, mac_ip_list in mac_ip_lists:
+                self.__interpret_mac(mac, mac_ip_list)
 
-        for mac_index, mac in enumerate(mac_list):
-            mac_ip_list = self.__database.get_ip_for_mac(mac)
 
-            # Determine if the mac is a router or a machine
-            router_confidence, machine_confidence = self.__calculate_confidence(mac_ip_list)
+    def __interpret_mac(self, mac: int, mac_ip_list: List[int]) -> None:
+        """
+        Method Name: interpret_mac
+        Purpose: Insert the machine, or the router and its machines, for one mac address and
+        the list of IPs associated with it. Machines are named by the text of their mac, and the
+        machines behind a router, which show no mac of their own, by the text of their IP. The
+        name identifies a machine in the SDI map of later runs, so it must not depend on the order
+        the machines were found in.
+        """
+        # Determine if the mac is a router or a machine
+        router_confidence, machine_confidence = self.__calculate_confidence(mac_ip_list)
+
+        # If the mac address is a regular machine
+        if router_confidence <= machine_confidence:
+            machine = self.__database.insert_machine(int_to_mac(mac), machine_confidence, router_confidence)
+            self.__database.update_ip_table(mac_ip_list, machine)
+            return
+
+        # Otherwise we are dealing with a router
+        machine = self.__database.insert_machine(int_to_mac(mac), machine_confidence, router_confidence)
+        ip_list_copy = list(mac_ip_list)
+
+        for ip_index, ip in enumerate(ip_list_copy):
+            # Assumption: the router's IP is "#.#.#.1"
+            masked_ip = self.__ip_classes.mask_ip_address(ip, CLASS_A_MASK_INT)
+
+            # If masked ip is "1", then we have found "#.#.#.1"
+            if masked_ip == 1:
+                # Associate the IP with the machine we created for the mac address
+                self.__database.update_ip_table([ip], machine)
 
-            # If the mac address is a regular machine
-            if router_confidence <= machine_confidence:
-                machine = self.__database.insert_machine(mac, machine_confidence, router_confidence)
-                self.__database.update_ip_table(mac_ip_list, machine)
-                continue
+                # Remove it from the ip list because we already created a machine for it
+                del mac_ip_list[ip_index]
+                break
+        else:
+            # Take the first IP off of the list, find "#.#.#", and add 1 to get "#.#.#.1"
+            masked_ip = self.__ip_classes.mask_ip_address(mac_ip_list[0], CLASS_C_MASK_INT) + 1
 
-            # Otherwise we are dealing with a router
-            machine = self.__database.insert_machine(mac, machine_confidence, router_confidence)
-            ip_list_copy = list(mac_ip_list)
-
-            for ip_index, ip in enumerate(ip_list_copy):
-                # Assumption: the router's IP is "#.#.#.1"
-                masked_ip = self.__ip_classes.mask_ip_address(ip, CLASS_A_MASK_INT)
-
-                # If masked ip is "1", then we have found "#.#.#.1"
-                if masked_ip == 1:
-                    # Associate the IP with the machine we created for the mac address
-                    self.__database.update_ip_table([ip], machine)
-
-                    # Remove it from the ip list because we already created a machine for it
-                    del mac_ip_list[ip_index]
-                    break
-            else:
-                # Take the first IP off of the list, find "#.#.#", and add 1 to get "#.#.#.1"
-                masked_ip = self.__ip_classes.mask_ip_address(mac_ip_list[0], CLASS_C_MASK_INT) + 1
-
-                network = self.__ip_classes.get_network(str(ipaddress.ip_address(masked_ip)))
-                self.__database.insert_entry_ip_table(str(ipaddress.ip_address(masked_ip)), network or None, machine)
-
-            # Keep track of number of machines associated with the mac address
-            for machine_index, ip in enumerate(mac_ip_list):
-                # When adding machines, the machine_conf is 1 and router_conf is 0.
-                machine = self.__database.insert_machine("{}:{}".format(mac_index, machine_index), 1, 0)
-                self.__database.update_ip_table([ip], machine)
+            network, network_prefix = self.__network_inference.get_network_with_prefix(masked_ip)
+
+            # A subnet seen in the capture may leave "#.#.#.1" out of the networks of the router's IPs,
+            # and the router's IPs may all be on other vlans than the vlan 1 it is put on
+            if network is not None and network_prefix is not None and (network, 1) not in self.__network_bases:
+                self.__database.insert_network(network, network_prefix, masked_ip, 1)
+                self.__network_bases.add((network, 1))
+
+            self.__database.insert_entry_ip_table(masked_ip, network, machine)
+
+        # Add a machine for every IP associated with the mac address
+        for ip in mac_ip_list:
+            # When adding machines, the machine_conf is 1 and router_conf is 0.
+            machine = self.__database.insert_machine(int_to_ip(ip), 1, 0)
+            self.__database.update_ip_table([ip], machine)
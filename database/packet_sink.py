@@ -0,0 +1,21 @@
+from database.data_packets import DHCPPacket, IPPacket
+
+
+class PacketSink:
+    """
+    Class Name: PacketSink
+    Responsibility: Interface for everything the parsers hand packets to, the ParserInterface
+                    itself or a stage placed in front of it
+    """
+
+    def insert_ip_packet(self, packet: IPPacket) -> bool:
+        raise NotImplementedError("PacketSink.insert_ip_packet not implemented")
+
+    def insert_flow(self, flow: IPPacket) -> None:
+        raise NotImplementedError("PacketSink.insert_flow not implemented")
+
+    def insert_dhcp_packet(self, packet: DHCPPacket) -> None:
+        raise NotImplementedError("PacketSink.insert_dhcp_packet not implemented")
+
+    def flush(self) -> None:
+        raise NotImplementedError("PacketSink.flush not implemented")
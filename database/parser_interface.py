@@ -1,16 +1,35 @@
+from typing import Optional
+
+from database.batch_writer import BatchWriter
 from database.data_packets import DHCPPacket, IPPacket
 from database.db import Database
 from database.flagger import Flagger
+from database.packet_sink import PacketSink
 
-class ParserInterface:
+class ParserInterface(PacketSink):
     """
     Class Name: ParserInterface
     Purpose: Provide an interface to the database for the Parser module
+    Notes:   With a batch_size above 0 packets are buffered by a BatchWriter and written in
+             batches, flush must then be called once parsing is done
     """
 
-    def __init__(self, database: Database) -> None:
+    def __init__(self, database: Database, batch_size: int = 0, flush_interval: float = 1.0) -> None:
         self.__database = database
 
+        self.__batch_writer = None  # type: Optional[BatchWriter]
+        if batch_size > 0:
+            self.__batch_writer = BatchWriter(database, batch_size, flush_interval)
+
+    def flush(self) -> None:
+        """
+        Method Name: flush
+        Purpose: Write out any buffered packets
+        """
+
+        if self.__batch_writer is not None:
+            self.__batch_writer.flush()
+
     def insert_ip_packet(self, packet: IPPacket) -> bool:
         """
         Method Name: insert_ip_packet
@@ -19,6 +38,9 @@ class ParserInterface:
                 If a packet is found to be redundant, it is not inserted
         """
 
+        if self.__batch_writer is not None:
+            return self.__batch_writer.insert_ip_packet(packet)
+
         # Initialize flagger, all tests must be true to pass
         flagger = Flagger()
 
@@ -49,6 +71,32 @@ class ParserInterface:
 
         return True
 
+    def insert_flow(self, flow: IPPacket) -> None:
+        """
+        Method Name: insert_flow
+        Purpose: Insert specified flow record into the database (granulate flow data)
+        Notes:     Flows are already unique conversations, so no redundancy check is made. A flow made
+                of known values is still stored, unlike a packet, so the macs and ips it pairs
+                reach the interpreter
+        """
+
+        if self.__batch_writer is not None:
+            self.__batch_writer.insert_flow(flow)
+            return
+
+        vlan = flow.vlan_id if flow.vlan_id is not None else 0
+
+        # Insert granularized flow data, values already stored are skipped
+        self.__database.insert_ip(flow.source_ip, vlan)
+        self.__database.insert_ip(flow.dest_ip, vlan)
+        self.__database.insert_mac(flow.source_mac)
+        self.__database.insert_mac(flow.dest_mac)
+        self.__database.insert_host(flow.host)
+        self.__database.insert_user_agent(flow.user_agent)
+        self.__database.insert_server(flow.server)
+
+        self.__database.insert_ip_packet(flow)
+
     def insert_dhcp_packet(self, packet: DHCPPacket) -> None:
         """
         Method Name: insert_dhcp_packet
@@ -57,6 +105,10 @@ class ParserInterface:
                 If a packet is found to be redundant, it is not inserted
         """
 
+        if self.__batch_writer is not None:
+            self.__batch_writer.insert_dhcp_packet(packet)
+            return
+
         # Initialize flagger, all tests must be true to pass
         flagger = Flagger()
 
@@ -69,6 +121,17 @@ class ParserInterface:
             flagger.test(self.__database.insert_ip(packet.server_ip))
             flagger.test(self.__database.insert_mac(packet.client_mac))
             flagger.test(self.__database.insert_mac(packet.server_mac))
+        # If packet is a response without a server that carries a subnet mask, the client is still stored,
+        # as get_dhcp_subnets finds the mask through the client ip
+        elif not packet.request and packet.subnet_mask is not None:
+            if packet.client_ip is not None:
+                flagger.test(self.__database.insert_ip(packet.client_ip))
+            if packet.client_mac is not None:
+                flagger.test(self.__database.insert_mac(packet.client_mac))
+
+        # The subnet mask given to the client counts as a value too, so a lease renewed with a new mask is kept
+        if not packet.request and packet.client_ip is not None and packet.subnet_mask is not None:
+            flagger.test(self.__database.insert_dhcp_subnet(packet.client_ip, packet.subnet_mask))
 
         # If packet is not redundant
         if not flagger.all_false():
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Query plan check:
+Runs every Database query against a synthetic capture, the same way nic1.py does,
+and asks SQLite for the plan of each statement. A full scan of a table that grows
+with the capture fails the check, unless the method reads that table as a whole on
+purpose. Run from the repository root with "make plancheck".
+"""
+
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+from types import FrameType
+
+import re
+import sqlite3
+import sys
+
+from database.addresses import ip_to_int, mac_to_int
+from database.apii_interface import APIIInterface
+from database.data_packets import DHCPPacket, IPPacket
+from database.db import Database
+from database.interpreter import Interpreter
+from database.parser_interface import ParserInterface
+
+# Tables that grow with the capture, a scan of any of them inside a lookup is quadratic overall
+LARGE_TABLES = frozenset(("Packets", "IPs", "Macs", "Hosts", "User_Agents", "Servers", "Services",
+                          "Machines", "Networks", "Network_ID", "SDI_Machines", "SDI_Interfaces"))
+
+# Methods that read whole tables by design: method name to the tables it may scan
+FULL_READS = {
+    "__load_interners": LARGE_TABLES,
+    "print_all_tables": LARGE_TABLES,
+    "__print_table": LARGE_TABLES,
+    "get_networks": frozenset(("Networks",)),
+    "insert_networks": frozenset(("Networks",)),
+    "get_mac_ips": frozenset(("Packets", "Macs")),
+    "get_dhcp_subnets": frozenset(("Services",)),
+    "get_machines": frozenset(("Machines", "IPs")),
+    "get_all_connections": LARGE_TABLES,
+    "get_machine_topology": frozenset(("Machines", "IPs")),
+    "get_routers": frozenset(("SDI_Machines", "Machines")),
+}  # type: Dict[str, FrozenSet[str]]
+
+# Matches "SCAN Packets" as well as the "SCAN TABLE Packets" of older SQLite versions
+SCAN_PATTERN = re.compile(r"^SCAN (?:TABLE )?(\w+)")
+
+EXPLAINED_STATEMENTS = ("SELECT", "UPDATE", "DELETE", "INSERT", "WITH")
+
+DB_MODULE = "database/db.py"
+
+
+def calling_method() -> str:
+    """
+    name: calling_method
+    purpose: Returns the name of the innermost Database method on the stack
+    """
+    frame = sys._getframe(1)  # type: Optional[FrameType]
+    while frame is not None:
+        if frame.f_code.co_filename.endswith(DB_MODULE):
+            return frame.f_code.co_name
+        frame = frame.f_back
+    return "?"
+
+
+def run_workload(database: Database, machines: int = 200, packets_per_machine: int = 10) -> None:
+    """
+    name: run_workload
+    purpose: Parses, interprets and provisions a synthetic capture through the same interfaces
+             nic1.py uses
+    """
+    parser_interface = ParserInterface(database)
+
+    for machine in range(machines):
+        mac = mac_to_int("02:00:00:00:{:02x}:{:02x}".format(machine >> 8, machine & 0xff))
+        ip = ip_to_int("10.{}.{}.{}".format(machine % 4, machine >> 8, machine & 0xff))
+
+        request = DHCPPacket()
+        request.client_ip = ip
+        request.client_mac = mac
+        request.request = True
+        parser_interface.insert_dhcp_packet(request)
+
+        # Servers on the first of each /24 acknowledge a share of the machines with a subnet mask
+        if machine % 8 == 0:
+            acknowledgement = DHCPPacket()
+            acknowledgement.client_ip = ip
+            acknowledgement.client_mac = mac
+            acknowledgement.server_ip = (ip & 0xffffff00) + 1
+            acknowledgement.server_mac = mac_to_int("02:00:00:01:00:{:02x}".format(machine % 4))
+            acknowledgement.subnet_mask = 0xffffff00
+            parser_interface.insert_dhcp_packet(acknowledgement)
+
+        for n in range(packets_per_machine):
+            peer = (machine + n + 1) % machines
+            packet = IPPacket(ip, ip_to_int("10.{}.{}.{}".format(peer % 4, peer >> 8, peer & 0xff)),
+                              mac, mac_to_int("02:00:00:00:{:02x}:{:02x}".format(peer >> 8, peer & 0xff)))
+            packet.source_port = 1024 + n
+            packet.dest_port = 80
+            packet.vlan_id = 1 + machine % 4
+            packet.host = "host{}.example".format(peer)
+            packet.user_agent = "agent/{}".format(n)
+            parser_interface.insert_ip_packet(packet)
+
+    parser_interface.flush()
+
+    database.create_indexes()
+    Interpreter(database).interpret()
+
+    # Stand in for the SDI ids APIInterface stores
+    apii_interface = APIIInterface(database)
+    for network in apii_interface.get_networks():
+        apii_interface.insert_network_id(network["network"], network["vlan"],
+                                         "network-{}".format(network["network"]), network["network"])
+
+    for index, machine_ips in enumerate(apii_interface.get_machines()):
+        machine_id = "machine-{}".format(index)
+        apii_interface.insert_machine_id(machine_ips[0][0], machine_id, machine_id)
+        for interface_ip, vlan in machine_ips:
+            apii_interface.insert_interface_id(machine_id, "interface-{}".format(interface_ip), interface_ip)
+            apii_interface.get_connections(interface_ip, vlan)
+
+    apii_interface.get_all_connections()
+    apii_interface.get_machine_topology()
+    apii_interface.get_routers()
+
+
+def check_plans(database: Database, statements: List[Tuple[str, str]]) -> List[str]:
+    """
+    name: check_plans
+    purpose: Explains every captured statement and describes each disallowed full scan once
+             per method, with the first statement that caused it
+    """
+    failures = []  # type: List[str]
+    explained = set()  # type: Set[str]
+    reported = set()  # type: Set[Tuple[str, str]]
+
+    for method, statement in statements:
+        if statement in explained or not statement.lstrip().upper().startswith(EXPLAINED_STATEMENTS):
+            continue
+        explained.add(statement)
+
+        try:
+            plan = database.explain_query_plan(statement)
+        except sqlite3.Error:
+            # Statements on an attached database that is gone again can not be explained
+            continue
+
+        for detail in plan:
+            match = SCAN_PATTERN.match(detail)
+            if match is None or match.group(1) not in LARGE_TABLES:
+                continue
+            if match.group(1) in FULL_READS.get(method, frozenset()) or (method, detail) in reported:
+                continue
+            reported.add((method, detail))
+            failures.append("{}: {}\n    {}".format(method, detail, " ".join(statement.split())))
+
+    return failures
+
+
+def main() -> int:
+    """
+    name: main
+    purpose: Traces the workload and prints every disallowed full scan, returns the exit status
+    """
+    database = Database()
+    statements = []  # type: List[Tuple[str, str]]
+    database.set_trace_callback(lambda statement: statements.append((calling_method(), statement)))
+
+    run_workload(database)
+    database.set_trace_callback(None)
+
+    failures = check_plans(database, statements)
+    for failure in failures:
+        print(failure)
+
+    print("{} statements traced, {} full scans".format(len(statements), len(failures)))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Subnet check:
+Hands DHCP acknowledgements to every packet sink nic1.py can parse into and checks
+that the subnet masks they carry come back from Database.get_dhcp_subnets, a lease
+renewed with a new mask included. Then checks the networks NetworkInference works out
+from such subnets and from routers: addresses outside every subnet keep their classful
+network, unless it has the same base address as a subnet. Run from the repository root
+with "make subnetcheck".
+"""
+
+from typing import List, Optional, Set, Tuple
+
+import sys
+
+from database.addresses import int_to_ip, ip_to_int, mac_to_int, prefix_to_mask
+from database.data_packets import DHCPPacket
+from database.db import Database
+from database.packet_sink import PacketSink
+from database.parser_interface import ParserInterface
+from nicparser.network_inference import NetworkInference
+from nicparser.result_cache import ResultRecorder
+
+CLIENT_IP = ip_to_int("10.4.5.20")
+CLIENT_MAC = mac_to_int("02:00:00:00:00:20")
+SERVER_IP = ip_to_int("10.4.5.1")
+SERVER_MAC = mac_to_int("02:00:00:00:00:01")
+
+# A lease acknowledged twice with a /24, then renewed with a /23
+MASKS = (0xffffff00, 0xffffff00, 0xfffffe00)
+
+ROUTER_IP = ip_to_int("172.16.5.1")
+SUBNET_IP = ip_to_int("172.16.0.20")
+
+# Addresses of the class B network of the router that nothing places in a subnet
+UNRELATED_IPS = [ip_to_int(ip) for ip in ("172.16.0.9", "172.16.4.3", "172.16.6.40", "172.16.9.1", "172.16.200.7")]
+
+
+def acknowledgement(subnet_mask: int, server: bool) -> DHCPPacket:
+    """
+    name: acknowledgement
+    purpose: Returns an acknowledgement of the client with the mask, from a server that
+             identifies itself or not
+    """
+    packet = DHCPPacket()
+    packet.client_ip = CLIENT_IP
+    packet.client_mac = CLIENT_MAC
+    packet.server_mac = SERVER_MAC
+    packet.subnet_mask = subnet_mask
+    if server:
+        packet.server_ip = SERVER_IP
+    return packet
+
+
+def check_sink(name: str, batch_size: int, recorded: bool, server: bool) -> Optional[str]:
+    """
+    name: check_sink
+    purpose: Parses the acknowledgements into a fresh database, describes what went wrong
+             if the subnets read back differ from the masks handed out
+    """
+    database = Database()
+    parser_interface = ParserInterface(database, batch_size)
+    sink = ResultRecorder(parser_interface) if recorded else parser_interface  # type: PacketSink
+
+    for subnet_mask in MASKS:
+        sink.insert_dhcp_packet(acknowledgement(subnet_mask, server))
+    sink.flush()
+
+    expected = set((CLIENT_IP, subnet_mask) for subnet_mask in MASKS)  # type: Set[Tuple[int, int]]
+    found = set(database.get_dhcp_subnets())
+    if found == expected:
+        return None
+    return "{}, {} server id: {} subnets read back, {} expected".format(
+        name, "with" if server else "without", len(found), len(expected))
+
+
+def check_subnets() -> List[str]:
+    """
+    name: check_subnets
+    purpose: Runs every sink with and without a server id, describes each failure
+    """
+    failures = []  # type: List[str]
+    for server in (True, False):
+        for name, batch_size, recorded in (("ParserInterface", 0, False), ("BatchWriter", 500, False),
+                                           ("ResultRecorder", 0, True)):
+            failure = check_sink(name, batch_size, recorded, server)
+            if failure is not None:
+                failures.append(failure)
+    return failures
+
+
+def describe(ip: int, network: Optional[int], prefix: Optional[int]) -> str:
+    return "{} in {}/{}".format(int_to_ip(ip), None if network is None else int_to_ip(network), prefix)
+
+
+def check_inference() -> List[str]:
+    """
+    name: check_inference
+    purpose: Works out the networks around a router and around a DHCP subnet sharing the base
+             of its class B network, describes each address placed where it should not be
+    """
+    failures = []  # type: List[str]
+
+    router = NetworkInference()
+    router.add_router(ROUTER_IP)
+    for ip in [ROUTER_IP + 8] + UNRELATED_IPS:
+        network, prefix = router.get_network_with_prefix(ip)
+        expected = (ROUTER_IP & 0xffffff00, 24) if ip == ROUTER_IP + 8 else (ip & 0xffff0000, 16)
+        if (network, prefix) != expected:
+            failures.append("router: {}, {} expected".format(describe(ip, network, prefix),
+                                                              describe(ip, *expected)))
+
+    # The class B network has the base of the subnet, the addresses outside the subnet need
+    # a network of their own that still holds them
+    same_base = NetworkInference()
+    same_base.add_dhcp_subnet(SUBNET_IP, 0xffffff00)
+    for ip in UNRELATED_IPS:
+        network, prefix = same_base.get_network_with_prefix(ip)
+        if ip & 0xffffff00 == SUBNET_IP & 0xffffff00:
+            placed = (network, prefix) == (SUBNET_IP & 0xffffff00, 24)
+        else:
+            placed = (network is not None and prefix is not None and network != SUBNET_IP & 0xffff0000 and
+                      ip & prefix_to_mask(prefix) == network)
+        if not placed:
+            failures.append("same base: {}".format(describe(ip, network, prefix)))
+
+    return failures
+
+
+def main() -> int:
+    """
+    name: main
+    purpose: Prints every failed check, returns the exit status
+    """
+    failures = check_subnets() + check_inference()
+    for failure in failures:
+        print(failure)
+
+    print("{} failed checks".format(len(failures)))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,25 @@
 #!/usr/bin/env python3
 
+from typing import Optional
+
 import argparse
+import os
 import pathlib
 import sys
+import time
 
 import settings
 from apii.api_interface import APIInterface
+from apii.emulator import Emulator
+from apii.journal import Journal
+from apii.sdi_map import SDIMap
 from authorizer.authorizer import Authorizer
 from database.db import Database
 from database.interpreter import Interpreter
+from nicparser.parallel_parser import ParallelParser
+from nicparser.parse_options import ENGINES, ParseOptions
 from nicparser.parser import Parser
+from nicparser.pipeline import format_stats
 
 cmds = argparse.ArgumentParser(
     description="Compile network information files into Cypherpath SDIs." + \
@@ -17,8 +27,51 @@ cmds = argparse.ArgumentParser(
 cmds.add_argument("-a", "--all",
                   help="display all available information while compiling",
                   action="store_true")
+cmds.add_argument("--api-workers", type=int, default=1,
+                  help="number of SDI OS API calls made at once while building the SDI (default: %(default)s)")
+cmds.add_argument("-b", "--batch-size", type=int, default=0,
+                  help="buffer parsed packets and write them to the database in batches of this size (default: off)")
+cmds.add_argument("--flush-interval", type=float, default=1.0,
+                  help="longest time in seconds a packet batch is buffered (default: %(default)s)")
+cmds.add_argument("--benchmark",
+                  help="build the SDI on a local SDI OS emulator instead of SDIOS_DOMAIN and report the API throughput",
+                  action="store_true")
+cmds.add_argument("--benchmark-latency", type=float, default=0.05,
+                  help="seconds the emulator adds to every call (default: %(default)s)")
+cmds.add_argument("--benchmark-error-rate", type=float, default=0.0,
+                  help="share of emulated calls failing with a server error (default: %(default)s)")
+cmds.add_argument("--benchmark-throttle-rate", type=float, default=0.0,
+                  help="share of emulated calls answered with 429 Too Many Requests (default: %(default)s)")
+cmds.add_argument("--cache", metavar="DIR",
+                  help="cache what is extracted from every file in this directory, files seen before are loaded from it")
+cmds.add_argument("--database", metavar="PATH",
+                  help="keep the parsed data in this database file, reopened by later runs to add files or build again")
+cmds.add_argument("-e", "--engine", choices=ENGINES, default=ENGINES[0],
+                  help="packet decoding engine, native reads pcap/pcapng without tshark, "
+                       "fields has tshark print only the fields nic1 uses (default: %(default)s)")
 cmds.add_argument("-f", "--files", nargs="+",
                   help="path to one or more pcap files or a directory of pcap files to compile")
+cmds.add_argument("--flows",
+                  help="store conversations (flows) instead of individual packets",
+                  action="store_true")
+cmds.add_argument("--journal", metavar="PATH",
+                  help="record every completed SDI OS call in this file, so a failed run can be resumed")
+cmds.add_argument("--max-flows", type=int, default=1000000,
+                  help="most flows held in memory before they are written (default: %(default)s)")
+cmds.add_argument("--memory-limit", type=int, default=0, metavar="MB",
+                  help="write out buffered packets whenever parsing uses more than this much memory (default: off)")
+cmds.add_argument("-j", "--jobs", type=int, default=1,
+                  help="number of worker processes used to parse the files (default: %(default)s)")
+cmds.add_argument("-p", "--pipeline",
+                  help="decode packets in background threads while the database is written, and report each stage",
+                  action="store_true")
+cmds.add_argument("--resume",
+                  help="continue the run recorded in --journal, answering its completed calls from the journal",
+                  action="store_true")
+cmds.add_argument("--sdi-map", metavar="PATH",
+                  help="save the ids of everything built in this file, for a later --update-sdi of the same SDI")
+cmds.add_argument("--update-sdi", metavar="ID",
+                  help="update the existing SDI ID from its --sdi-map, only sending new and changed objects")
 cmds.add_argument("-v", "--version",
                   help="print the version number",
                   action="store_true")
@@ -39,26 +92,65 @@ if args.version:
 
 # Initialize all the nic1 subsystems to process the files
 # If anything fails, exit
-if args.files:
+if args.files or args.database:
     try:
-        DB = Database()
-        parse = Parser(DB)
-        authorizer = Authorizer()
+        DB = Database(args.database)
+        # A reopened database still holds the interpretation and SDI ids of its last run
+        DB.reset_interpretation()
+        options = ParseOptions(args.engine, args.batch_size, args.flush_interval, args.flows, args.max_flows, args.cache,
+                               args.pipeline, args.memory_limit)
+        parse = Parser(DB, options)
+        parallel_parse = ParallelParser(DB, options, args.jobs)
+        emulator = None  # type: Optional[Emulator]
+        if args.benchmark:
+            # The emulator speaks plain http, which oauthlib refuses by default
+            os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
+            emulator = Emulator(args.benchmark_latency, args.benchmark_error_rate, args.benchmark_throttle_rate)
+            emulator.start()
+            authorizer = Authorizer(emulator.get_domain(), "http://", token_cache=False)
+        else:
+            authorizer = Authorizer()
+        if args.api_workers < 1:
+            raise ValueError("--api-workers must be at least 1")
+        if args.resume and not args.journal:
+            raise ValueError("--resume needs the --journal of the run to continue")
+        sdi_map = None  # type: Optional[SDIMap]
+        if args.update_sdi:
+            if not args.sdi_map:
+                raise ValueError("--update-sdi needs the --sdi-map of the SDI to update")
+            sdi_map = SDIMap.load(args.sdi_map, args.update_sdi)
     except ValueError as err:
         print(err.args)
         exit(1) #abnormal exit
 
     print("Compiling...")
-    # Loop through the specified files
-    for f in args.files:
+    # Collect the specified files
+    file_list = []
+    for f in args.files or []:
         f_path = pathlib.Path(f)
         if f_path.is_dir():
             for f_path in f_path.iterdir():
                 if f_path.is_file():
-                    parse.parse_file(f_path.as_posix())
+                    file_list.append(f_path.as_posix())
         else:
             if f_path.is_file():
-                parse.parse_file(f_path.as_posix())
+                file_list.append(f_path.as_posix())
+
+    # Parse them one at a time, or spread across worker processes
+    if args.jobs > 1:
+        parallel_parse.parse_files(file_list)
+    else:
+        for f in file_list:
+            parse.parse_file(f)
+        for line in format_stats(parse.get_pipeline_stats()):
+            print(line)
+        memory_guard = parse.get_memory_guard()
+        if memory_guard is not None:
+            print("Peak memory {} MiB, buffers written early {} times".format(memory_guard.get_peak() >> 20,
+                                                                            memory_guard.get_flushes()))
+
+    # Index the loaded packets before they are queried
+    DB.create_indexes()
 
     interpreter = Interpreter(DB)
     interpreter.interpret()
@@ -66,11 +158,34 @@ if args.files:
         DB.print_all_tables()
 
     # Create the SDI
-    apii = APIInterface(authorizer, DB)
+    journal = None  # type: Optional[Journal]
+    if args.journal:
+        journal = Journal(args.journal, args.resume)
+
+    apii = APIInterface(authorizer, DB, args.api_workers, journal, sdi_map)
 
-    apii.start(authorizer.get_username(), ", ".join(args.files))
-    apii.add_networks()
-    apii.add_machines()
-    apii.connect()
-    apii.specify_machines()
+    start_time = time.time()
+    if args.update_sdi:
+        apii.update(args.update_sdi)
+    else:
+        apii.start(authorizer.get_username(), ", ".join(args.files or [args.database]))
+        apii.provision()
+    provision_time = time.time() - start_time
     apii.print_success()
+    authorizer.close()
+    DB.close()
+
+    if args.sdi_map:
+        apii.get_sdi_map().save(args.sdi_map)
+
+    if journal is not None:
+        journal.close()
+        if args.resume:
+            print("Resumed {} calls from {}".format(journal.get_replayed(), args.journal))
+
+    if emulator is not None:
+        emulator.stop()
+        stats = emulator.get_stats()
+        print("Benchmark: {} calls in {:.2f}s, {:.1f} calls/sec with {} API workers, {} errors, {} throttled".format(
+            stats["calls"], provision_time, stats["calls"] / provision_time, args.api_workers,
+            stats["errors"], stats["throttled"]))
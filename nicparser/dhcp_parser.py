@@ -1,9 +1,7 @@
-from pyshark.packet.packet import Packet
-from pyshark.packet.fields import LayerField
-
+from database.addresses import ip_to_int, mac_to_int
 from database.data_packets import DHCPPacket
-from database.parser_interface import ParserInterface
-from nicparser.parse import Parse
+from database.packet_sink import PacketSink
+from nicparser.parse import Parse, PacketView
 
 
 DHCPREQUEST = "3"
@@ -21,33 +19,39 @@ class DHCPParser(Parse):
                     mask.
     """
 
-    def __init__(self, interface_object: ParserInterface) -> None:
+    def __init__(self, interface_object: PacketSink) -> None:
         self.__interface_obj = interface_object
 
-    def parse_interface(self, this_packet: Packet) -> None:
-        if "dhcp" not in this_packet.bootp.field_names:
+    def parse_interface(self, this_packet: PacketView) -> None:
+        bootp_fields = this_packet.fields("bootp")
+        if "dhcp" not in bootp_fields:
             return
 
         try:
+            bootp_layer = this_packet.layer("bootp")
+            option_dhcp = bootp_layer.option_dhcp
             packet = DHCPPacket()
 
-            if this_packet.bootp.option_dhcp == DHCPREQUEST or this_packet.bootp.option_dhcp == DHCPINFORM:
+            if option_dhcp == DHCPREQUEST or option_dhcp == DHCPINFORM:
                 packet.server_ip = None
                 packet.server_mac = None
-                packet.client_ip = this_packet["ip"].src
-                packet.client_mac = this_packet["eth"].src
+                packet.client_ip = ip_to_int(this_packet.layer("ip").src)
+                packet.client_mac = mac_to_int(this_packet.layer("eth").src)
                 packet.request = True
 
-            elif this_packet.bootp.option_dhcp == DHCPACK:
-                if "option_dhcp_server_id" in this_packet.bootp.field_names:
-                    packet.server_ip = this_packet.bootp.option_dhcp_server_id
+            elif option_dhcp == DHCPACK:
+                if "option_dhcp_server_id" in bootp_fields:
+                    packet.server_ip = ip_to_int(bootp_layer.option_dhcp_server_id)
+
+                if "ip_your" in bootp_fields:
+                    packet.client_ip = ip_to_int(bootp_layer.ip_your)
 
-                if "ip_your" in this_packet.bootp.field_names:
-                    packet.client_ip = this_packet.bootp.ip_your
+                if "option_subnet_mask" in bootp_fields:
+                    packet.subnet_mask = ip_to_int(bootp_layer.option_subnet_mask)
 
                 # Insert DHCP packet into database.
-                packet.client_mac = this_packet["eth"].dst
-                packet.server_mac = this_packet["eth"].src
+                packet.client_mac = mac_to_int(this_packet.layer("eth").dst)
+                packet.server_mac = mac_to_int(this_packet.layer("eth").src)
                 packet.request = False
 
             self.__interface_obj.insert_dhcp_packet(packet)
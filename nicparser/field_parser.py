@@ -0,0 +1,162 @@
+from typing import List, Optional
+
+import shutil
+import subprocess
+import tempfile
+
+from database.addresses import ip_to_int, mac_to_int
+from database.data_packets import DHCPPacket, IPPacket
+from database.packet_sink import PacketSink
+from nicparser.dhcp_parser import DHCPACK, DHCPINFORM, DHCPREQUEST
+from nicparser.vlan_parser import VLAN_IPV4
+
+
+# Fields tshark prints for every packet, in the order they are unpacked in __parse_row.
+# frame.protocols lists the layers, standing in for the layer names of a pyshark packet.
+FIELDS = ["frame.protocols", "frame.time_epoch", "frame.len",
+          "eth.src", "eth.dst", "vlan.id", "vlan.etype", "ip.src", "ip.dst",
+          "tcp.srcport", "tcp.dstport", "udp.srcport", "udp.dstport",
+          "bootp.option.dhcp", "bootp.ip.your", "bootp.option.dhcp_server_id",
+          "bootp.option.subnet_mask", "http.host", "http.user_agent", "http.server"]
+
+# Only the first occurrence of a field is printed, the outermost vlan tag and ip header like
+# the layers pyshark exposes first
+TSHARK_ARGS = ["-n", "-T", "fields", "-E", "separator=/t", "-E", "occurrence=f"]
+
+# Bytes of tshark output buffered at a time
+READ_BUFFER_SIZE = 1 << 20
+
+
+class FieldParser:
+    """
+    name: FieldParser
+    responsibility: The "fields" engine. tshark still dissects the capture, but only prints
+                    the dozen fields nic1 uses as one tab separated row per packet, instead of
+                    a full packet tree for pyshark to rebuild. Rows become the same IPPacket
+                    and DHCPPacket records the pyshark strategies produce, following the same
+                    precedence as Parser.parse_file: bootp first, then vlan tagged IPv4, then
+                    plain IPv4.
+    """
+
+    def __init__(self, interface_object: PacketSink) -> None:
+        self.__interface_obj = interface_object
+
+    def parse_file(self, file_str: str) -> None:
+        """
+        name: parse_file
+        purpose: Runs tshark over the file and parses its rows as they are printed. The tshark
+                 process is always ended before returning. A missing tshark or one that fails
+                 raises ValueError.
+
+        """
+        tshark = shutil.which("tshark")
+        if tshark is None:
+            raise ValueError("tshark was not found on the PATH")
+
+        command = [tshark, "-r", file_str] + TSHARK_ARGS
+        for field in FIELDS:
+            command += ["-e", field]
+
+        # Warnings go to a file, a pipe only read once stdout is done would stall tshark as
+        # soon as it filled up
+        with tempfile.TemporaryFile(mode="w+") as errors:
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=errors,
+                                       bufsize=READ_BUFFER_SIZE, universal_newlines=True)
+            try:
+                for line in process.stdout or []:
+                    self.__parse_row(line.rstrip("\n").split("\t"))
+            finally:
+                if process.poll() is None:
+                    process.kill()
+                process.communicate()
+
+            if process.returncode != 0:
+                errors.seek(0)
+                raise ValueError("tshark failed: {}".format(errors.read().strip()))
+
+    def __parse_row(self, row: List[str]) -> None:
+        """
+        name: __parse_row
+        purpose: Hands one row to the DHCP or IP record builder
+
+        """
+        if len(row) != len(FIELDS):
+            return
+
+        (protocols, time_epoch, length, eth_src, eth_dst, vlan_id, vlan_etype, ip_src, ip_dst,
+         tcp_srcport, tcp_dstport, udp_srcport, udp_dstport,
+         dhcp_type, ip_your, dhcp_server_id, subnet_mask, http_host, http_user_agent, http_server) = row
+        layers = protocols.split(":")
+
+        if "bootp" in layers:
+            # Plain BOOTP without a DHCP message type is ignored, as by DHCPParser
+            if dhcp_type:
+                self.__insert_dhcp(dhcp_type, eth_src, eth_dst, ip_src, ip_your, dhcp_server_id, subnet_mask)
+            return
+
+        vlan = 1
+        if "vlan" in layers:
+            try:
+                if int(vlan_etype, 16) != VLAN_IPV4:
+                    return
+                vlan = int(vlan_id)
+            except ValueError:
+                return
+
+        if "ip" not in layers or "eth" not in layers:
+            return
+
+        packet = IPPacket(ip_to_int(ip_src), ip_to_int(ip_dst), mac_to_int(eth_src), mac_to_int(eth_dst))
+
+        # UDP ports win over TCP ports, as in IPParser
+        if "tcp" in layers:
+            packet.source_port = self.__port(tcp_srcport)
+            packet.dest_port = self.__port(tcp_dstport)
+        if "udp" in layers:
+            packet.source_port = self.__port(udp_srcport)
+            packet.dest_port = self.__port(udp_dstport)
+
+        if "http" in layers:
+            packet.host = http_host or None
+            packet.user_agent = http_user_agent or None
+            packet.server = http_server or None
+
+        packet.vlan_id = vlan
+        packet.first_seen = packet.last_seen = float(time_epoch)
+        packet.byte_count = int(length)
+
+        self.__interface_obj.insert_ip_packet(packet)
+
+    def __insert_dhcp(self, dhcp_type: str, eth_src: str, eth_dst: str, ip_src: str, ip_your: str,
+                      dhcp_server_id: str, subnet_mask: str) -> None:
+        """
+        name: __insert_dhcp
+        purpose: Mirrors DHCPParser, requests record the client and acknowledgements record
+                 the assigned address, the server and the subnet mask
+
+        """
+        packet = DHCPPacket()
+
+        if dhcp_type == DHCPREQUEST or dhcp_type == DHCPINFORM:
+            packet.client_ip = self.__ip(ip_src)
+            packet.client_mac = self.__mac(eth_src)
+            packet.request = True
+
+        elif dhcp_type == DHCPACK:
+            packet.server_ip = self.__ip(dhcp_server_id)
+            packet.client_ip = self.__ip(ip_your)
+            packet.client_mac = self.__mac(eth_dst)
+            packet.server_mac = self.__mac(eth_src)
+            packet.subnet_mask = self.__ip(subnet_mask)
+            packet.request = False
+
+        self.__interface_obj.insert_dhcp_packet(packet)
+
+    def __port(self, value: str) -> Optional[int]:
+        return int(value) if value else None
+
+    def __ip(self, value: str) -> Optional[int]:
+        return ip_to_int(value) if value else None
+
+    def __mac(self, value: str) -> Optional[int]:
+        return mac_to_int(value) if value else None
@@ -0,0 +1,87 @@
+from typing import Dict, Hashable, Union
+
+import copy
+
+from database.data_packets import DHCPPacket, IPPacket
+from database.packet_sink import PacketSink
+
+
+class FlowAggregator(PacketSink):
+    """
+    name: FlowAggregator
+    responsibility: Sits between the parse strategies and the ParserInterface and collapses ip
+                    packets into flows keyed by addresses, ports, vlan and http fields. Each
+                    flow keeps its first and last seen times and packet and byte counters, and
+                    only the flow records are written.
+                    DHCP packets are held in the same ordered buffer, so the database sees
+                    every value in the order the capture first showed it.
+    """
+
+    def __init__(self, interface_object: PacketSink, max_flows: int = 1000000) -> None:
+        """
+        name: __init__
+        purpose: At most max_flows records are buffered, a full buffer is written out and a
+                 flow seen again afterwards starts a new record
+        """
+        self.__interface_obj = interface_object
+        self.__max_flows = max_flows
+        self.__dhcp_count = 0
+        self.__records = {}  # type: Dict[Hashable, Union[IPPacket, DHCPPacket]]
+
+    def insert_ip_packet(self, packet: IPPacket) -> bool:
+        """
+        name: insert_ip_packet
+        purpose: Adds the packet to its flow, returning whether it started a new one
+
+        """
+        key = (packet.source_ip, packet.dest_ip, packet.source_mac, packet.dest_mac,
+               packet.source_port, packet.dest_port, packet.vlan_id,
+               packet.host, packet.user_agent, packet.server)
+
+        flow = self.__records.get(key)
+
+        if isinstance(flow, IPPacket):
+            flow.packet_count += 1
+            if packet.last_seen is not None:
+                flow.last_seen = packet.last_seen if flow.last_seen is None else max(flow.last_seen, packet.last_seen)
+            if packet.byte_count is not None:
+                flow.byte_count = packet.byte_count + (flow.byte_count or 0)
+            return False
+
+        self.__add(key, copy.copy(packet))
+        return True
+
+    def insert_dhcp_packet(self, packet: DHCPPacket) -> None:
+        """
+        name: insert_dhcp_packet
+        purpose: Queues the dhcp packet behind the flows seen before it
+
+        """
+        self.__dhcp_count += 1
+        self.__add(("dhcp", self.__dhcp_count), packet)
+
+    def flush(self) -> None:
+        """
+        name: flush
+        purpose: Writes every buffered record to the ParserInterface and flushes it
+
+        """
+        for record in self.__records.values():
+            if isinstance(record, IPPacket):
+                self.__interface_obj.insert_flow(record)
+            else:
+                self.__interface_obj.insert_dhcp_packet(record)
+
+        self.__records.clear()
+        self.__interface_obj.flush()
+
+    def __add(self, key: Hashable, record: Union[IPPacket, DHCPPacket]) -> None:
+        """
+        name: __add
+        purpose: Buffers a new record, writing the buffer out first when it is full
+
+        """
+        if len(self.__records) >= self.__max_flows:
+            self.flush()
+
+        self.__records[key] = record
@@ -1,12 +1,17 @@
-from typing import Optional, Tuple
+from typing import List, Optional, Sequence, Tuple
 
-import ipaddress
+# NumPy is optional, get_networks_with_prefixes falls back to plain Python without it
+try:
+    import numpy  # type: ignore
+except ImportError:
+    numpy = None
 
 class Classes:
     """
     name: Classes
     responsibility: This class will apply classful masking to an ip and return
                     the network. It is an rudametary way to get a network.
+                    Ips and networks are 32-bit ints, masks are prefix lengths.
 
     """
 
@@ -17,52 +22,77 @@ class Classes:
         self.__class_a_mask = 4278190080
         self.__class_b_mask = 4294901760
         self.__class_c_mask = 4294967040
-        self.__default_ip_mask = int(ipaddress.ip_address("0.0.0.0"))
+        self.__class_a_prefix = 8
+        self.__class_b_prefix = 16
+        self.__class_c_prefix = 24
+        self.__default_prefix = 0
 
     
-    def mask_ip_address(self, ipaddr: str, mask: int) -> int:
+    def mask_ip_address(self, ip_integer: int, mask: int) -> int:
         """
         name: mask_ip_address
         purpose: Masks an ip address with the given mask value
         """
-        ip_integer = int(ipaddress.ip_address(ipaddr))
         return ip_integer & mask
 
     
-    def get_network(self, ipaddr: str) -> Optional[str]:
+    def get_network(self, ip_integer: int) -> Optional[int]:
         """
         name: get_network
         purpose: Returns the network for a given ip
         """
-        masked_ip, _mask_used = self.get_network_with_mask_used(ipaddr)
+        masked_ip, _prefix_used = self.get_network_with_prefix(ip_integer)
         return masked_ip
 
 
-    def get_network_with_mask_used(self, ipaddr: str) -> Tuple[Optional[str], Optional[str]]:
+    def get_network_with_prefix(self, ip_integer: int) -> Tuple[Optional[int], Optional[int]]:
         """
-        name: get_network_with_mask_used
+        name: get_network_with_prefix
         purpose: Returns the network for a given ip,
-                 along with the mask used
+                 along with the prefix length of the mask used
         """
-        ip_integer = int(ipaddress.ip_address(ipaddr))
-
         if ip_integer < 0 or ip_integer > self.__class_c_threshold:
             return None, None
 
         # These defaults will be used if the given ipaddr
         # is exactly the value of the class c threshold
         masked_ip = ip_integer
-        mask_used = self.__default_ip_mask
+        prefix_used = self.__default_prefix
 
         if ip_integer < self.__class_a_threshold:
             masked_ip = ip_integer & self.__class_a_mask
-            mask_used = self.__class_a_mask
+            prefix_used = self.__class_a_prefix
         elif ip_integer < self.__class_b_threshold:
             masked_ip = ip_integer & self.__class_b_mask
-            mask_used = self.__class_b_mask
+            prefix_used = self.__class_b_prefix
         elif ip_integer < self.__class_c_threshold:
             masked_ip = ip_integer & self.__class_c_mask
-            mask_used = self.__class_c_mask
+            prefix_used = self.__class_c_prefix
+
+        # Return the now-masked IP and the prefix length of the mask that was used
+        return masked_ip, prefix_used
+
+
+    def get_networks_with_prefixes(self, ip_integers: Sequence[int]) -> List[Tuple[Optional[int], Optional[int]]]:
+        """
+        name: get_networks_with_prefixes
+        purpose: Returns get_network_with_prefix of every ip, in order. With NumPy the
+                 whole list is masked at once as a uint32 array
+        """
+        if numpy is None or not ip_integers:
+            return [self.get_network_with_prefix(ip_integer) for ip_integer in ip_integers]
+
+        ips = numpy.fromiter(ip_integers, dtype=numpy.uint32, count=len(ip_integers))
+
+        # Same order of tests as get_network_with_prefix, the first that holds picks the class
+        classes = [ips < self.__class_a_threshold, ips < self.__class_b_threshold, ips < self.__class_c_threshold]
+        masks = numpy.select(classes, [numpy.uint32(self.__class_a_mask), numpy.uint32(self.__class_b_mask),
+                                       numpy.uint32(self.__class_c_mask)], numpy.uint32(0xffffffff))
+        prefixes = numpy.select(classes, [self.__class_a_prefix, self.__class_b_prefix, self.__class_c_prefix],
+                                self.__default_prefix)
 
-        # Return the now-masked IP and the mask that was used
-        return str(ipaddress.ip_address(masked_ip)), str(ipaddress.ip_address(mask_used))
+        networks = list(zip((ips & masks.astype(numpy.uint32)).tolist(),
+                            prefixes.tolist()))  # type: List[Tuple[Optional[int], Optional[int]]]
+        for index in numpy.flatnonzero(ips > self.__class_c_threshold).tolist():
+            networks[index] = (None, None)
+        return networks
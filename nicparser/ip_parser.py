@@ -1,8 +1,7 @@
-from pyshark.packet.packet import Packet
-
+from database.addresses import ip_to_int, mac_to_int
 from database.data_packets import IPPacket
-from database.parser_interface import ParserInterface
-from nicparser.parse import Parse
+from database.packet_sink import PacketSink
+from nicparser.parse import Parse, PacketView
 
 class IPParser(Parse):
     """
@@ -12,13 +11,13 @@ class IPParser(Parse):
                    an IPPacket into the database
     """
 
-    def __init__(self, interface_object: ParserInterface, vlan_id: int = 1) -> None:
+    def __init__(self, interface_object: PacketSink, vlan_id: int = 1) -> None:
         self.__interface_obj = interface_object
         self.__vlan_id = vlan_id
 
-    # first enumerate packet layers
-    # then check up from ethernet layer
-    def parse_interface(self, this_packet: Packet) -> None:
+    # layers were enumerated by the PacketView
+    # check up from ethernet layer
+    def parse_interface(self, this_packet: PacketView) -> None:
         """"
         name: parse_interface
         purpose: Concrete IP parser
@@ -26,19 +25,22 @@ class IPParser(Parse):
         """
 
         # Get layers typs in packet for checking packet type
-        layers = [layer.layer_name for layer in this_packet.layers]
+        layers = this_packet.layers
 
         # This only supports IP over Ethernet.
         if "ip" not in layers or "eth" not in layers:
             return
 
-        packet = IPPacket(this_packet["ip"].src, this_packet["ip"].dst, this_packet["eth"].src, this_packet["eth"].dst)
+        ip_layer = this_packet.layer("ip")
+        eth_layer = this_packet.layer("eth")
+        packet = IPPacket(ip_to_int(ip_layer.src), ip_to_int(ip_layer.dst),
+                          mac_to_int(eth_layer.src), mac_to_int(eth_layer.dst))
 
         # If packet is a TCP packet grab tcp port
         if "tcp" in layers:
             try:
-                packet.source_port = this_packet["tcp"].srcport
-                packet.dest_port = this_packet["tcp"].dstport
+                packet.source_port = this_packet.layer("tcp").srcport
+                packet.dest_port = this_packet.layer("tcp").dstport
             except AttributeError:
                 packet.source_port = None
                 packet.dest_port = None
@@ -46,26 +48,29 @@ class IPParser(Parse):
         # If packet is UDP grab port
         if "udp" in layers:
             try:
-                packet.source_port = this_packet["udp"].srcport
-                packet.dest_port = this_packet["udp"].dstport
+                packet.source_port = this_packet.layer("udp").srcport
+                packet.dest_port = this_packet.layer("udp").dstport
             except AttributeError:
                 packet.source_port = None
                 packet.dest_port = None
 
         if "http" in layers:
             try:
-                if "user_agent" in this_packet.http.field_names:
-                    packet.user_agent = this_packet.http.user_agent
+                http_layer = this_packet.layer("http")
+                http_fields = this_packet.fields("http")
+
+                if "user_agent" in http_fields:
+                    packet.user_agent = http_layer.user_agent
                 else:
                     packet.user_agent = None
 
-                if "server" in this_packet.http.field_names:
-                    packet.server = this_packet.http.server
+                if "server" in http_fields:
+                    packet.server = http_layer.server
                 else:
                     packet.server = None
 
-                if "host" in this_packet.http.field_names:
-                    packet.host = this_packet.http.host
+                if "host" in http_fields:
+                    packet.host = http_layer.host
                 else:
                     packet.host = None
             except AttributeError:
@@ -74,5 +79,7 @@ class IPParser(Parse):
                 packet.user_agent = None
 
         packet.vlan_id = self.__vlan_id
+        packet.first_seen = packet.last_seen = float(this_packet.packet.sniff_timestamp)
+        packet.byte_count = int(this_packet.packet.length)
 
         self.__interface_obj.insert_ip_packet(packet)
@@ -0,0 +1,96 @@
+from typing import Optional
+
+import os
+
+from database.data_packets import DHCPPacket, IPPacket
+from database.packet_sink import PacketSink
+
+
+# Records passed on between two looks at the resident set size
+CHECK_INTERVAL = 4096
+
+STATM_PATH = "/proc/self/statm"
+
+
+def resident_bytes() -> Optional[int]:
+    """
+    name: resident_bytes
+    purpose: Returns the resident set size of this process, None where /proc is not available
+    """
+    try:
+        with open(STATM_PATH) as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class MemoryGuard(PacketSink):
+    """
+    name: MemoryGuard
+    responsibility: Sits in front of the rest of the sinks and keeps the process under a memory
+                    limit. Every CHECK_INTERVAL records it reads the resident set size, and once
+                    it is over the limit it flushes the sinks behind it, writing out the packets
+                    buffered for a batch and the flows held by a FlowAggregator.
+                    Flows are then split where the flush fell, as after a full --max-flows buffer.
+    """
+
+    def __init__(self, interface_object: PacketSink, limit: int) -> None:
+        """
+        name: __init__
+        purpose: limit is in bytes
+        """
+        self.__interface_obj = interface_object
+        self.__limit = limit
+        self.__count = 0
+        self.__peak = 0
+        self.__flushes = 0
+        self.__warned = False
+
+    def get_peak(self) -> int:
+        """
+        name: get_peak
+        purpose: Returns the highest resident set size seen, in bytes
+        """
+        return self.__peak
+
+    def get_flushes(self) -> int:
+        return self.__flushes
+
+    def insert_ip_packet(self, packet: IPPacket) -> bool:
+        new = self.__interface_obj.insert_ip_packet(packet)
+        self.__tick()
+        return new
+
+    def insert_dhcp_packet(self, packet: DHCPPacket) -> None:
+        self.__interface_obj.insert_dhcp_packet(packet)
+        self.__tick()
+
+    def flush(self) -> None:
+        self.__interface_obj.flush()
+
+    def __tick(self) -> None:
+        """
+        name: __tick
+        purpose: Counts a record, checking the memory use every CHECK_INTERVAL of them
+        """
+        self.__count += 1
+        if self.__count < CHECK_INTERVAL:
+            return
+        self.__count = 0
+
+        rss = resident_bytes()
+        if rss is None:
+            return
+        self.__peak = max(self.__peak, rss)
+        if rss <= self.__limit:
+            return
+
+        self.__flushes += 1
+        self.__interface_obj.flush()
+
+        # The process may hold on to the memory the flush freed, so this is only reported once
+        rss = resident_bytes()
+        if rss is not None and rss > self.__limit and not self.__warned:
+            self.__warned = True
+            print("Warning: {} MiB in use after writing every buffered packet, above the {} MiB limit".format(
+                rss >> 20, self.__limit >> 20))
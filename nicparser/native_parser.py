@@ -0,0 +1,219 @@
+from typing import Dict, Optional
+
+import mmap
+import struct
+
+from database.data_packets import DHCPPacket, IPPacket
+from database.packet_sink import PacketSink
+from nicparser.dhcp_parser import DHCPACK, DHCPINFORM, DHCPREQUEST
+from nicparser.pcap_reader import PcapReader
+
+
+LINKTYPE_ETHERNET = 1
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_VLAN = 0x8100
+ETHERTYPE_QINQ = 0x88a8
+
+IP_PROTO_TCP = 6
+IP_PROTO_UDP = 17
+
+BOOTP_PORTS = (67, 68)
+BOOTP_FIXED_LENGTH = 236
+DHCP_MAGIC_COOKIE = b"\x63\x82\x53\x63"
+DHCP_OPTION_PAD = 0
+DHCP_OPTION_SUBNET_MASK = 1
+DHCP_OPTION_MESSAGE_TYPE = 53
+DHCP_OPTION_SERVER_ID = 54
+DHCP_OPTION_END = 255
+
+# The TCP ports tshark hands to its HTTP dissector by default
+HTTP_TCP_PORTS = frozenset((80, 1900, 2710, 2869, 3128, 3132, 5985, 8080, 8088, 11371))
+HTTP_START_TOKENS = (b"GET ", b"POST ", b"HEAD ", b"PUT ", b"DELETE ", b"OPTIONS ",
+                     b"CONNECT ", b"TRACE ", b"PATCH ", b"HTTP/")
+
+ETHERNET_HEADER = struct.Struct("!6s6sH")
+VLAN_TAG = struct.Struct("!HH")
+IPV4_HEADER = struct.Struct("!BxHxxHxB2xII")
+PORTS = struct.Struct("!HH")
+ADDRESS = struct.Struct("!I")
+
+
+class NativeParser:
+    """
+    name: NativeParser
+    responsibility: Built-in decoding engine. It reads pcap and pcapng files through a
+                    PcapReader and decodes only the headers nic1 uses (Ethernet, 802.1Q,
+                    IPv4, TCP/UDP ports, BOOTP/DHCP and the HTTP host, user agent and
+                    server headers). The resulting IPPacket and DHCPPacket records are
+                    the same ones the pyshark strategies hand to the ParserInterface.
+    """
+
+    def __init__(self, interface_object: PacketSink) -> None:
+        self.__interface_obj = interface_object
+
+    def parse_file(self, file_str: str) -> None:
+        """
+        name: parse_file
+        purpose: Decodes every Ethernet frame of the file, packet by packet
+
+        """
+        with PcapReader(file_str) as reader:
+            buf = reader.buffer
+            for link_type, timestamp, length, offset, captured_length in reader.frames():
+                if link_type == LINKTYPE_ETHERNET:
+                    self.__decode_ethernet(buf, offset, offset + captured_length, timestamp, length)
+
+    def __decode_ethernet(self, buf: mmap.mmap, offset: int, end: int, timestamp: float, length: int) -> None:
+        """
+        name: __decode_ethernet
+        purpose: Walks the link and network headers of one frame and hands it to the DHCP
+                 or IP decoder, following the same precedence as Parser.parse_file:
+                 bootp first, then vlan tagged IPv4, then plain IPv4.
+        """
+        if offset + ETHERNET_HEADER.size > end:
+            return
+
+        dst_mac, src_mac, ethertype = ETHERNET_HEADER.unpack_from(buf, offset)
+        offset += ETHERNET_HEADER.size
+
+        # Only the outermost tag decides the vlan, exactly like the vlan layer pyshark exposes
+        vlan_id = None  # type: Optional[int]
+        vlan_ethertype = 0
+        while ethertype == ETHERTYPE_VLAN or ethertype == ETHERTYPE_QINQ:
+            if offset + VLAN_TAG.size > end:
+                return
+            tci, ethertype = VLAN_TAG.unpack_from(buf, offset)
+            offset += VLAN_TAG.size
+            if vlan_id is None:
+                vlan_id = tci & 0x0fff
+                vlan_ethertype = ethertype
+
+        if ethertype != ETHERTYPE_IPV4 or offset + 20 > end:
+            return
+
+        version_ihl, total_length, fragment, protocol, src_ip, dst_ip = IPV4_HEADER.unpack_from(buf, offset)
+        header_length = (version_ihl & 0x0f) * 4
+        if version_ihl >> 4 != 4 or header_length < 20:
+            return
+
+        # Ethernet padding is not part of the datagram
+        end = min(end, offset + total_length)
+        transport = offset + header_length
+
+        # Fragments only carry a transport header once reassembled, which we do not do
+        has_transport = fragment & 0x3fff == 0 and transport + PORTS.size <= end
+        source_port = dest_port = None  # type: Optional[int]
+        if has_transport and (protocol == IP_PROTO_TCP or protocol == IP_PROTO_UDP):
+            source_port, dest_port = PORTS.unpack_from(buf, transport)
+
+        if protocol == IP_PROTO_UDP and (source_port in BOOTP_PORTS or dest_port in BOOTP_PORTS):
+            self.__decode_dhcp(buf, transport + 8, end, src_mac, dst_mac, src_ip)
+            return
+
+        if vlan_id is not None and vlan_ethertype != ETHERTYPE_IPV4:
+            return
+
+        packet = IPPacket(src_ip, dst_ip, int.from_bytes(src_mac, "big"), int.from_bytes(dst_mac, "big"))
+        packet.source_port = source_port
+        packet.dest_port = dest_port
+
+        if protocol == IP_PROTO_TCP and has_transport and \
+                (source_port in HTTP_TCP_PORTS or dest_port in HTTP_TCP_PORTS) and transport + 13 <= end:
+            payload = transport + (buf[transport + 12] >> 4) * 4
+            if payload < end:
+                self.__decode_http(buf[payload:end], packet)
+
+        packet.vlan_id = vlan_id if vlan_id is not None else 1
+        packet.first_seen = packet.last_seen = timestamp
+        packet.byte_count = length
+
+        self.__interface_obj.insert_ip_packet(packet)
+
+    def __decode_http(self, payload: bytes, packet: IPPacket) -> None:
+        """
+        name: __decode_http
+        purpose: Copies the Host, User-Agent and Server headers of an HTTP request or
+                 response held in a single segment into the packet
+        """
+        if not payload.startswith(HTTP_START_TOKENS):
+            return
+
+        header_end = payload.find(b"\r\n\r\n")
+        if header_end != -1:
+            payload = payload[:header_end]
+
+        for line in payload.split(b"\r\n")[1:]:
+            name, _sep, value = line.partition(b":")
+            name = name.strip().lower()
+            if name == b"host":
+                packet.host = value.strip().decode("latin-1")
+            elif name == b"user-agent":
+                packet.user_agent = value.strip().decode("latin-1")
+            elif name == b"server":
+                packet.server = value.strip().decode("latin-1")
+
+    def __decode_dhcp(self, buf: mmap.mmap, offset: int, end: int,
+                      src_mac: bytes, dst_mac: bytes, src_ip: int) -> None:
+        """
+        name: __decode_dhcp
+        purpose: Mirrors DHCPParser for a BOOTP payload. Plain BOOTP without a DHCP message
+                 type option is ignored, requests record the client and acknowledgements
+                 record the assigned address, the server and the subnet mask.
+        """
+        options_start = offset + BOOTP_FIXED_LENGTH + len(DHCP_MAGIC_COOKIE)
+        if options_start > end or buf[options_start - 4:options_start] != DHCP_MAGIC_COOKIE:
+            return
+
+        options = self.__dhcp_options(buf, options_start, end)
+        message_type = options.get(DHCP_OPTION_MESSAGE_TYPE)
+        if not message_type:
+            return
+
+        packet = DHCPPacket()
+
+        if message_type[0] == int(DHCPREQUEST) or message_type[0] == int(DHCPINFORM):
+            packet.server_ip = None
+            packet.server_mac = None
+            packet.client_ip = src_ip
+            packet.client_mac = int.from_bytes(src_mac, "big")
+            packet.request = True
+
+        elif message_type[0] == int(DHCPACK):
+            server_id = options.get(DHCP_OPTION_SERVER_ID)
+            if server_id is not None and len(server_id) == 4:
+                packet.server_ip = int.from_bytes(server_id, "big")
+
+            subnet_mask = options.get(DHCP_OPTION_SUBNET_MASK)
+            if subnet_mask is not None and len(subnet_mask) == 4:
+                packet.subnet_mask = int.from_bytes(subnet_mask, "big")
+
+            # yiaddr sits 16 bytes into the BOOTP header
+            packet.client_ip = ADDRESS.unpack_from(buf, offset + 16)[0]
+            packet.client_mac = int.from_bytes(dst_mac, "big")
+            packet.server_mac = int.from_bytes(src_mac, "big")
+            packet.request = False
+
+        self.__interface_obj.insert_dhcp_packet(packet)
+
+    def __dhcp_options(self, buf: mmap.mmap, offset: int, end: int) -> Dict[int, bytes]:
+        """
+        name: __dhcp_options
+        purpose: Collects DHCP options into a code to value dictionary
+        """
+        options = {}  # type: Dict[int, bytes]
+
+        while offset < end:
+            code = buf[offset]
+            if code == DHCP_OPTION_END:
+                break
+            if code == DHCP_OPTION_PAD:
+                offset += 1
+                continue
+            if offset + 2 > end:
+                break
+            length = buf[offset + 1]
+            options.setdefault(code, buf[offset + 2:offset + 2 + length])
+            offset += 2 + length
+
+        return options
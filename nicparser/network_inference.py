@@ -0,0 +1,80 @@
+from typing import List, Optional, Sequence, Tuple
+
+from database.addresses import mask_to_prefix, prefix_to_mask
+from nicparser.ip_classes import Classes
+from nicparser.prefix_trie import PrefixTrie
+
+
+ROUTER_PREFIX = 24
+
+
+class NetworkInference:
+    """
+    name: NetworkInference
+    responsibility: Works out the network of an ip from what the capture shows about its
+                    subnets, the masks DHCP servers hand out and the addresses routers
+                    answer on. Every ip gets the longest subnet holding it, and ips no
+                    subnet holds fall back to classful masking through Classes.
+                    Ips and networks are 32-bit ints, masks are prefix lengths.
+    """
+
+    def __init__(self) -> None:
+        self.__ip_classes = Classes()
+        self.__subnets = PrefixTrie()
+
+    def add_dhcp_subnet(self, ip: int, subnet_mask: int) -> None:
+        """
+        name: add_dhcp_subnet
+        purpose: Records the subnet of an address a DHCP server acknowledged with the mask,
+                 masks whose bits are not contiguous are ignored
+
+        """
+        prefix = mask_to_prefix(subnet_mask)
+        if prefix is not None:
+            self.__subnets.insert(ip, prefix)
+
+    def add_router(self, ip: int) -> None:
+        """
+        name: add_router
+        purpose: Records the /24 a router answers on, unless a subnet recorded before
+                 already holds the router
+
+        """
+        if self.__subnets.longest_match(ip) is None:
+            self.__subnets.insert(ip, ROUTER_PREFIX)
+
+    def get_network_with_prefix(self, ip: int) -> Tuple[Optional[int], Optional[int]]:
+        """
+        name: get_network_with_prefix
+        purpose: Returns the network for a given ip, along with the prefix length of its
+                 mask, like Classes.get_network_with_prefix
+
+        """
+        match = self.__subnets.longest_match(ip)
+        if match is not None:
+            return match
+
+        network, prefix = self.__ip_classes.get_network_with_prefix(ip)
+        if network is None or prefix is None or prefix == 0:
+            return network, prefix
+
+        # Networks are told apart by their base address, so only a classful network sharing its
+        # base with a longer recorded subnet is narrowed, until the base is its own
+        while True:
+            match = self.__subnets.longest_match(network)
+            if match is None or match[1] <= prefix:
+                return network, prefix
+            prefix += 1
+            network = ip & prefix_to_mask(prefix)
+
+    def get_networks_with_prefixes(self, ips: Sequence[int]) -> List[Tuple[Optional[int], Optional[int]]]:
+        """
+        name: get_networks_with_prefixes
+        purpose: Returns get_network_with_prefix of every ip, in order. Without any recorded
+                 subnet this is classful masking of the whole list
+
+        """
+        if not len(self.__subnets):
+            return self.__ip_classes.get_networks_with_prefixes(ips)
+
+        return [self.get_network_with_prefix(ip) for ip in ips]
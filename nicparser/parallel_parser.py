@@ -0,0 +1,64 @@
+from typing import List, Tuple
+
+import multiprocessing
+import os
+import tempfile
+
+from database.db import Database
+from nicparser.parse_options import ParseOptions
+from nicparser.parser import Parser
+
+
+def parse_worker(task: Tuple[str, ParseOptions, str]) -> str:
+    """
+    name: parse_worker
+    purpose: Runs in a worker process. Parses one file into a private Database and saves
+             it to a temporary file in the given directory, returning its path for the
+             driver to merge.
+    """
+    file_str, options, directory = task
+
+    database = Database()
+    Parser(database, options).parse_file(file_str)
+
+    handle, path = tempfile.mkstemp(prefix="nic1_", suffix=".sqlite", dir=directory)
+    os.close(handle)
+    database.save(path)
+
+    return path
+
+
+class ParallelParser:
+    """
+    name: ParallelParser
+    responsibility: Spreads pcap files across a pool of worker processes. Every worker parses
+                    its file into a private Database, which the driver merges into the shared
+                    Database as results arrive, in the order the files were given. The merge
+                    drops the packets a sequential run would have found redundant, so the
+                    result matches parsing the files one after the other.
+    """
+
+    def __init__(self, database: Database, options: ParseOptions, jobs: int) -> None:
+        if jobs < 1:
+            raise ValueError("The number of jobs must be at least 1")
+
+        self.__database = database
+        self.__options = options
+        self.__jobs = jobs
+
+    def parse_files(self, file_list: List[str]) -> None:
+        """
+        name: parse_files
+        purpose: Parses every file in file_list and merges the results into the database
+
+        """
+        # Files of workers whose results are never merged, after an error, go with the directory
+        with tempfile.TemporaryDirectory(prefix="nic1_") as directory:
+            tasks = [(file_str, self.__options, directory) for file_str in file_list]
+
+            with multiprocessing.Pool(min(self.__jobs, max(len(tasks), 1))) as pool:
+                for path in pool.imap(parse_worker, tasks):
+                    try:
+                        self.__database.merge(path, self.__options.flows)
+                    finally:
+                        os.remove(path)
@@ -1,10 +1,92 @@
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
 from pyshark.packet.packet import Packet
 
+
+class PacketView:
+    """
+    name: PacketView
+    responsibility: What the strategies need from a pyshark packet, gathered in one pass over
+                    its layers. Holds the set of layer names, the first layer of every name, as
+                    pyshark's own lookups return, and the field names of those layers once
+                    they are asked for.
+    """
+
+    def __init__(self, packet: Packet) -> None:
+        self.packet = packet
+        self.__layers = {}  # type: Dict[str, Any]
+        self.__fields = {}  # type: Dict[str, FrozenSet[str]]
+
+        for layer in packet.layers:
+            if layer.layer_name not in self.__layers:
+                self.__layers[layer.layer_name] = layer
+        self.layers = frozenset(self.__layers)
+
+    def layer(self, name: str) -> Any:
+        return self.__layers[name]
+
+    def fields(self, name: str) -> FrozenSet[str]:
+        """
+        name: fields
+        purpose: Returns the field names of the named layer, pyshark builds them anew every time
+
+        """
+        fields = self.__fields.get(name)
+        if fields is None:
+            fields = self.__fields[name] = frozenset(self.__layers[name].field_names)
+        return fields
+
+
 class Parse:
     """"
     name: Parse
     responsibility: Strategy Interface for parsing of various types of packets
 
     """
-    def parse_interface(self, this_packet: Packet) -> None:
+    def parse_interface(self, this_packet: PacketView) -> None:
         raise NotImplementedError("Parse.parse_interface not implemented")
+
+
+class DispatchTable:
+    """
+    name: DispatchTable
+    responsibility: Picks the strategy for a packet from its layers. Strategies are registered
+                    with the layer they handle, and the first registered layer a packet has
+                    wins. A capture only holds a handful of layer combinations, so the choice
+                    made for each combination is remembered and later packets are dispatched
+                    with a single lookup.
+    """
+
+    def __init__(self) -> None:
+        self.__strategies = []  # type: List[Tuple[str, Parse]]
+        self.__chosen = {}  # type: Dict[FrozenSet[str], Optional[Parse]]
+
+    def register(self, layer: str, strategy: Parse) -> None:
+        """
+        name: register
+        purpose: Adds a strategy, below every one registered before it
+
+        """
+        self.__strategies.append((layer, strategy))
+        self.__chosen = {}
+
+    def dispatch(self, packet: Packet) -> None:
+        """
+        name: dispatch
+        purpose: Hands the packet to its strategy, packets no strategy handles are ignored
+
+        """
+        view = PacketView(packet)
+        try:
+            strategy = self.__chosen[view.layers]
+        except KeyError:
+            strategy = self.__chosen[view.layers] = self.__choose(view.layers)
+
+        if strategy is not None:
+            strategy.parse_interface(view)
+
+    def __choose(self, layers: FrozenSet[str]) -> Optional[Parse]:
+        for layer, strategy in self.__strategies:
+            if layer in layers:
+                return strategy
+        return None
@@ -0,0 +1,47 @@
+from typing import Optional
+
+# Available packet decoding engines, the first one is the default
+ENGINES = ("pyshark", "native", "fields")
+
+
+class ParseOptions:
+    """
+    name: ParseOptions
+    responsibility: Holds the settings that decide how captures are decoded and written to the
+                    database. They travel as one object so worker processes parse exactly like
+                    the driver does.
+    """
+
+    def __init__(self, engine: str = ENGINES[0], batch_size: int = 0, flush_interval: float = 1.0,
+                 flows: bool = False, max_flows: int = 1000000, cache_dir: Optional[str] = None,
+                 pipeline: bool = False, memory_limit: int = 0) -> None:
+        """
+        name: __init__
+        purpose: engine is one of ENGINES. A batch_size above 0 buffers packets and writes them
+                 in batches of that size, or after flush_interval seconds, whichever comes first.
+                 flows stores conversations instead of packets, holding up to max_flows of them
+                 in memory before writing. With a cache_dir, the records extracted from every file
+                 are cached there and files parsed before are loaded from it. pipeline decodes
+                 packets in background threads while the database is written. A memory_limit
+                 above 0 writes out buffered packets whenever the process uses more than that
+                 many MiB.
+        """
+        if engine not in ENGINES:
+            raise ValueError("Unknown parsing engine: {}".format(engine))
+        if batch_size < 0:
+            raise ValueError("The batch size can not be negative")
+        if flush_interval <= 0:
+            raise ValueError("The flush interval must be positive")
+        if max_flows < 1:
+            raise ValueError("The flow limit must be at least 1")
+        if memory_limit < 0:
+            raise ValueError("The memory limit can not be negative")
+
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.flows = flows
+        self.max_flows = max_flows
+        self.cache_dir = cache_dir
+        self.pipeline = pipeline
+        self.memory_limit = memory_limit
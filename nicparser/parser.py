@@ -1,40 +1,240 @@
+from typing import Any, Callable, Dict, List, Optional
+
 import pyshark
 
 from database.db import Database
+from database.packet_sink import PacketSink
 from database.parser_interface import ParserInterface
 from nicparser.dhcp_parser import DHCPParser
+from nicparser.field_parser import FieldParser
+from nicparser.flow_aggregator import FlowAggregator
 from nicparser.ip_parser import IPParser
+from nicparser.memory_guard import MemoryGuard
+from nicparser.native_parser import NativeParser
+from nicparser.parse_options import ParseOptions
+from nicparser.parse import DispatchTable
+from nicparser.pipeline import Channel, ChannelSink, Pipeline, merge_stats
+from nicparser.result_cache import DHCP_RECORD, FLOW_RECORD, FLUSH_RECORD, IP_RECORD, ResultCache, ResultRecorder, decode_record
 from nicparser.vlan_parser import VlanParser
 
+# Engines that decode a whole file at once instead of handing pyshark packets to the strategies
+FILE_ENGINES = {"native": NativeParser, "fields": FieldParser}  # type: Dict[str, Callable[[PacketSink], Any]]
+
 class Parser:
     """
     name: Parser
     responsibility: This class parses pcap files and inputs packet information into the database
                     It uses pyshark to do most of the heavy lifting, with the exception of DHCP
                     parameter request lists.
+                    The "native" engine skips tshark and decodes the capture itself, the
+                    "fields" engine has tshark print only the fields nic1 uses.
+                    With flows enabled, packets pass through a FlowAggregator on their way
+                    to the ParserInterface.
+                    With a cache directory, a ResultRecorder keeps what reaches the
+                    ParserInterface, and files found in the ResultCache are replayed from it
+                    without being decoded.
+                    With the pipeline option, packets are read and converted to records in
+                    background threads while this thread writes the records of the packets
+                    before them.
+                    Captures are streamed, pyshark drops every packet once it is handed over
+                    and its tshark process is closed after each file. With a memory limit, a
+                    MemoryGuard in front of the other sinks writes out buffered packets when
+                    the process grows past it.
     """
-    def __init__(self, database: Database) -> None:
-        interface = ParserInterface(database)
+    def __init__(self, database: Database, options: Optional[ParseOptions] = None) -> None:
+        if options is None:
+            options = ParseOptions()
+
+        parser_interface = ParserInterface(database, options.batch_size, options.flush_interval)
+
+        self.__cache = None  # type: Optional[ResultCache]
+        self.__recorder = None  # type: Optional[ResultRecorder]
 
-        self.__ip_parser = IPParser(interface)
-        self.__vlan_parser = VlanParser(interface)
-        self.__dhcp_parser = DHCPParser(interface)
+        interface = parser_interface  # type: PacketSink
+        if options.cache_dir is not None:
+            self.__cache = ResultCache(options.cache_dir, options)
+            self.__recorder = ResultRecorder(parser_interface)
+            interface = self.__recorder
+        if options.flows:
+            interface = FlowAggregator(interface, options.max_flows)
+        self.__memory_guard = None  # type: Optional[MemoryGuard]
+        if options.memory_limit > 0:
+            self.__memory_guard = MemoryGuard(interface, options.memory_limit << 20)
+            interface = self.__memory_guard
+
+        self.__engine = options.engine
+        self.__pipeline = options.pipeline
+        self.__pipeline_stats = {}  # type: Dict[str, Any]
+        self.__parser_interface = parser_interface
+        self.__interface = interface
+        self.__dispatch_table = self.__build_dispatch_table(interface)
+        self.__file_parser = FILE_ENGINES[self.__engine](interface) if self.__engine in FILE_ENGINES else None
 
     def parse_file(self, file_str: str) -> None:
         """
         name: parse_file
         purpose: Takes in a pcap file and delagates, packet by packet to one of the
-                 concrete stategy classes.
+                 concrete stategy classes. Cached files are replayed instead.
 
         """
-        capture = pyshark.FileCapture(file_str)
+        if self.__cache is None or self.__recorder is None:
+            self.__parse_file(file_str)
+            return
+
+        key = self.__cache.key(file_str)
+        records = self.__cache.load(key)
+        if records is not None:
+            self.__replay(records)
+            return
+
+        self.__recorder.start()
+        if self.__parse_file(file_str):
+            self.__cache.store(key, self.__recorder.get_records())
 
-        for packet in capture:
-            layers = [layer.layer_name for layer in packet.layers]
+    def get_cache_stats(self) -> Optional[Dict[str, int]]:
+        """
+        name: get_cache_stats
+        purpose: Returns the cache hits and misses, None without a cache
+
+        """
+        return None if self.__cache is None else self.__cache.get_stats()
+
+    def get_memory_guard(self) -> Optional[MemoryGuard]:
+        return self.__memory_guard
+
+    def get_pipeline_stats(self) -> Dict[str, Any]:
+        """
+        name: get_pipeline_stats
+        purpose: Returns the stats of every pipeline run so far, merged by merge_stats
 
-            if "bootp" in layers:
-                self.__dhcp_parser.parse_interface(packet)
-            elif "vlan" in layers:
-                self.__vlan_parser.parse_interface(packet)
-            elif "ip" in layers:
-                self.__ip_parser.parse_interface(packet)
+        """
+        return self.__pipeline_stats
+
+    def __parse_file(self, file_str: str) -> bool:
+        """
+        name: __parse_file
+        purpose: Decodes the file, returning whether all of it was read
+
+        """
+        if self.__pipeline:
+            return self.__parse_file_pipelined(file_str)
+
+        if self.__file_parser is not None:
+            try:
+                self.__file_parser.parse_file(file_str)
+            except ValueError as err:
+                print("Skipping {}: {}".format(file_str, err))
+                self.__interface.flush()
+                return False
+            self.__interface.flush()
+            return True
+
+        capture = pyshark.FileCapture(file_str, keep_packets=False)
+        try:
+            for packet in capture:
+                self.__dispatch_table.dispatch(packet)
+        finally:
+            capture.close()
+
+        # Write out anything still buffered by the interface
+        self.__interface.flush()
+        return True
+
+    def __build_dispatch_table(self, interface: PacketSink) -> DispatchTable:
+        """
+        name: __build_dispatch_table
+        purpose: Registers the strategies writing to interface, bootp first, then vlan, then ip
+
+        """
+        dispatch_table = DispatchTable()
+        dispatch_table.register("bootp", DHCPParser(interface))
+        dispatch_table.register("vlan", VlanParser(interface))
+        dispatch_table.register("ip", IPParser(interface))
+        return dispatch_table
+
+    def __parse_file_pipelined(self, file_str: str) -> bool:
+        """
+        name: __parse_file_pipelined
+        purpose: Decodes the file in a Pipeline. pyshark packets are read in one thread and
+                 converted to records in another, the other engines do both in one. This
+                 thread is the single writer, applying the records in order.
+
+        """
+        pipeline = Pipeline()
+        records = pipeline.channel("records")
+        sink = ChannelSink(records)
+
+        if self.__engine in FILE_ENGINES:
+            file_parser = FILE_ENGINES[self.__engine](sink)
+            pipeline.stage("decode", lambda: file_parser.parse_file(file_str), None, records)
+        else:
+            packets = pipeline.channel("packets")
+            pipeline.stage("read", lambda: self.__read_packets(file_str, packets), None, packets)
+            pipeline.stage("convert", lambda: self.__convert_packets(packets, sink), packets, records)
+
+        try:
+            stats = pipeline.run("write", lambda: self.__write_records(records), records)
+        except ValueError as err:
+            if self.__engine not in FILE_ENGINES:
+                raise
+            print("Skipping {}: {}".format(file_str, err))
+            return False
+
+        merge_stats(self.__pipeline_stats, stats)
+        return True
+
+    def __read_packets(self, file_str: str, packets: Channel) -> None:
+        """
+        name: __read_packets
+        purpose: Read stage, dissects the file with tshark
+
+        """
+        capture = pyshark.FileCapture(file_str, keep_packets=False)
+        try:
+            for packet in capture:
+                packets.put(packet)
+        finally:
+            capture.close()
+
+    def __convert_packets(self, packets: Channel, sink: ChannelSink) -> None:
+        """
+        name: __convert_packets
+        purpose: Convert stage, turns pyshark packets into records with strategies of its own
+
+        """
+        dispatch_table = self.__build_dispatch_table(sink)
+        for packet in packets:
+            dispatch_table.dispatch(packet)
+
+    def __write_records(self, records: Channel) -> None:
+        """
+        name: __write_records
+        purpose: Write stage, hands every record to the interface, then flushes it
+
+        """
+        for kind, packet in records:
+            if kind == IP_RECORD:
+                self.__interface.insert_ip_packet(packet)
+            elif kind == DHCP_RECORD:
+                self.__interface.insert_dhcp_packet(packet)
+            else:
+                self.__interface.flush()
+
+        self.__interface.flush()
+
+    def __replay(self, records: List[List[Any]]) -> None:
+        """
+        name: __replay
+        purpose: Hands cached records to the ParserInterface as the file would have
+
+        """
+        for record in records:
+            kind, packet = decode_record(record)
+            if kind == FLOW_RECORD:
+                self.__parser_interface.insert_flow(packet)
+            elif kind == DHCP_RECORD:
+                self.__parser_interface.insert_dhcp_packet(packet)
+            elif kind == FLUSH_RECORD:
+                self.__parser_interface.flush()
+            else:
+                self.__parser_interface.insert_ip_packet(packet)
@@ -0,0 +1,197 @@
+from typing import Dict, Iterator, List, Tuple
+
+import mmap
+import struct
+
+
+# pcap magic numbers as read little endian
+PCAP_MAGIC_USEC = 0xa1b2c3d4
+PCAP_MAGIC_NSEC = 0xa1b23c4d
+PCAP_MAGIC_USEC_SWAPPED = 0xd4c3b2a1
+PCAP_MAGIC_NSEC_SWAPPED = 0x4d3cb2a1
+
+# pcapng block types
+PCAPNG_SECTION_HEADER = 0x0a0d0d0a
+PCAPNG_INTERFACE_DESCRIPTION = 0x00000001
+PCAPNG_PACKET = 0x00000002
+PCAPNG_SIMPLE_PACKET = 0x00000003
+PCAPNG_ENHANCED_PACKET = 0x00000006
+PCAPNG_BYTE_ORDER_MAGIC = 0x1a2b3c4d
+
+# pcapng interface option holding the timestamp resolution
+PCAPNG_IF_TSRESOL = 9
+
+PCAP_GLOBAL_HEADER_LENGTH = 24
+PCAP_RECORD_HEADER_LENGTH = 16
+
+# (link_type, timestamp, wire_length, data_offset, captured_length)
+Frame = Tuple[int, float, int, int, int]
+
+
+class PcapReader:
+    """
+    name: PcapReader
+    responsibility: Memory-maps a pcap or pcapng file and walks its record headers,
+                    yielding the position of every captured frame inside the mapping.
+                    Frame bytes are never copied here, the decoder reads them straight
+                    out of the buffer.
+    """
+
+    def __init__(self, file_str: str) -> None:
+        self.__file = open(file_str, "rb")
+
+        try:
+            self.buffer = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self.__file.close()
+            raise ValueError("{} is empty".format(file_str))
+
+        if len(self.buffer) < 4:
+            self.close()
+            raise ValueError("{} is not a pcap or pcapng file".format(file_str))
+
+        magic = struct.unpack_from("<I", self.buffer, 0)[0]
+        if magic == PCAPNG_SECTION_HEADER:
+            self.__pcapng = True
+        elif magic in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC, PCAP_MAGIC_USEC_SWAPPED, PCAP_MAGIC_NSEC_SWAPPED):
+            self.__pcapng = False
+        else:
+            self.close()
+            raise ValueError("{} is not a pcap or pcapng file".format(file_str))
+
+    def __enter__(self) -> "PcapReader":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        name: close
+        purpose: Releases the mapping and the underlying file
+        """
+        self.buffer.close()
+        self.__file.close()
+
+    def frames(self) -> Iterator[Frame]:
+        """
+        name: frames
+        purpose: Yields (link_type, timestamp, wire_length, data_offset, captured_length)
+                 for every frame in the file, stopping quietly at a truncated record.
+        """
+        if self.__pcapng:
+            return self.__pcapng_frames()
+        return self.__pcap_frames()
+
+    def __pcap_frames(self) -> Iterator[Frame]:
+        """
+        name: __pcap_frames
+        purpose: Walks classic libpcap records
+        """
+        buf = self.buffer
+        size = len(buf)
+
+        if size < PCAP_GLOBAL_HEADER_LENGTH:
+            return
+
+        magic = struct.unpack_from("<I", buf, 0)[0]
+        endian = "<" if magic in (PCAP_MAGIC_USEC, PCAP_MAGIC_NSEC) else ">"
+        resolution = 1e-9 if magic in (PCAP_MAGIC_NSEC, PCAP_MAGIC_NSEC_SWAPPED) else 1e-6
+        link_type = struct.unpack_from(endian + "I", buf, 20)[0] & 0x0fffffff
+
+        record = struct.Struct(endian + "IIII")
+        offset = PCAP_GLOBAL_HEADER_LENGTH
+
+        while offset + PCAP_RECORD_HEADER_LENGTH <= size:
+            ts_sec, ts_frac, captured_length, wire_length = record.unpack_from(buf, offset)
+            offset += PCAP_RECORD_HEADER_LENGTH
+
+            if offset + captured_length > size:
+                return
+
+            yield link_type, ts_sec + ts_frac * resolution, wire_length, offset, captured_length
+            offset += captured_length
+
+    def __pcapng_frames(self) -> Iterator[Frame]:
+        """
+        name: __pcapng_frames
+        purpose: Walks pcapng blocks, tracking the interfaces of every section so packet
+                 blocks can be tagged with the right link type and timestamp resolution.
+        """
+        buf = self.buffer
+        size = len(buf)
+        endian = "<"
+        interfaces = []  # type: List[Tuple[int, float]]
+        offset = 0
+
+        while offset + 12 <= size:
+            block_type = struct.unpack_from(endian + "I", buf, offset)[0]
+
+            # The section header fixes the byte order of everything after it
+            if block_type == PCAPNG_SECTION_HEADER:
+                byte_order = struct.unpack_from("<I", buf, offset + 8)[0]
+                endian = "<" if byte_order == PCAPNG_BYTE_ORDER_MAGIC else ">"
+                interfaces = []
+
+            block_length = struct.unpack_from(endian + "I", buf, offset + 4)[0]
+            if block_length < 12 or offset + block_length > size:
+                return
+
+            if block_type == PCAPNG_INTERFACE_DESCRIPTION:
+                link_type = struct.unpack_from(endian + "H", buf, offset + 8)[0]
+                options = self.__pcapng_options(endian, offset + 16, offset + block_length - 4)
+                interfaces.append((link_type, self.__pcapng_resolution(options)))
+
+            elif block_type == PCAPNG_ENHANCED_PACKET or block_type == PCAPNG_PACKET:
+                if block_type == PCAPNG_ENHANCED_PACKET:
+                    interface_id, ts_high, ts_low, captured_length, wire_length = \
+                        struct.unpack_from(endian + "IIIII", buf, offset + 8)
+                else:
+                    interface_id, _drops, ts_high, ts_low, captured_length, wire_length = \
+                        struct.unpack_from(endian + "HHIIII", buf, offset + 8)
+
+                if interface_id < len(interfaces):
+                    link_type, resolution = interfaces[interface_id]
+                    captured_length = min(captured_length, block_length - 32)
+                    yield (link_type, ((ts_high << 32) | ts_low) * resolution, wire_length,
+                           offset + 28, captured_length)
+
+            elif block_type == PCAPNG_SIMPLE_PACKET:
+                if interfaces:
+                    link_type = interfaces[0][0]
+                    wire_length = struct.unpack_from(endian + "I", buf, offset + 8)[0]
+                    yield link_type, 0.0, wire_length, offset + 12, min(wire_length, block_length - 16)
+
+            offset += block_length
+
+    def __pcapng_options(self, endian: str, start: int, end: int) -> Dict[int, bytes]:
+        """
+        name: __pcapng_options
+        purpose: Collects the options of a pcapng block into a code to value dictionary
+        """
+        buf = self.buffer
+        options = {}  # type: Dict[int, bytes]
+
+        while start + 4 <= end:
+            code, length = struct.unpack_from(endian + "HH", buf, start)
+            if code == 0:
+                break
+            options[code] = buf[start + 4:start + 4 + length]
+            # Option values are padded to 32 bits
+            start += 4 + ((length + 3) & ~3)
+
+        return options
+
+    def __pcapng_resolution(self, options: Dict[int, bytes]) -> float:
+        """
+        name: __pcapng_resolution
+        purpose: Converts an if_tsresol option into seconds per timestamp unit
+        """
+        tsresol = options.get(PCAPNG_IF_TSRESOL)
+        if not tsresol:
+            return 1e-6
+
+        exponent = tsresol[0] & 0x7f
+        if tsresol[0] & 0x80:
+            return 2.0 ** -exponent
+        return 10.0 ** -exponent
@@ -0,0 +1,264 @@
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import queue
+import threading
+import time
+
+from database.data_packets import DHCPPacket, IPPacket
+from database.packet_sink import PacketSink
+from nicparser.result_cache import DHCP_RECORD, FLUSH_RECORD, IP_RECORD
+
+
+# Chunks a Channel holds before its producer has to wait
+QUEUE_SIZE = 64
+
+# Items moved through a Channel at a time, so the queue is not locked once per packet
+CHUNK_SIZE = 256
+
+# Seconds a blocked producer waits before checking whether its consumer gave up
+ABANDON_POLL_INTERVAL = 0.1
+
+# Marks the end of a Channel
+END = None
+
+
+class PipelineAborted(Exception):
+    """
+    name: PipelineAborted
+    responsibility: Raised in a stage putting items on a Channel its consumer abandoned
+    """
+    pass
+
+
+class Channel:
+    """
+    name: Channel
+    responsibility: Bounded queue between two pipeline stages. A full queue makes the producer
+                    wait, which keeps a fast stage from running ahead of a slow one. Items are
+                    grouped in chunks of CHUNK_SIZE. The queue depth and the time either side
+                    spent waiting are kept for the stats.
+                    A consumer that fails abandons the channel, its producer then stops at its
+                    next put instead of waiting for room forever.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.__queue = queue.Queue(QUEUE_SIZE)  # type: queue.Queue
+        self.__abandoned = threading.Event()
+        self.__chunk = []  # type: List[Any]
+        self.__items = 0
+        self.__max_depth = 0
+        self.__depth_total = 0
+        self.__puts = 0
+        self.__producer_wait = 0.0
+        self.__consumer_wait = 0.0
+
+    def put(self, item: Any) -> None:
+        """
+        name: put
+        purpose: Adds an item, handing the chunk to the queue once it is full
+        """
+        self.__chunk.append(item)
+        if len(self.__chunk) >= CHUNK_SIZE:
+            self.__put_chunk()
+
+    def close(self) -> None:
+        """
+        name: close
+        purpose: Hands over the last partial chunk and marks the end of the items
+        """
+        if self.__chunk:
+            self.__put_chunk()
+        self.__put(END)
+
+    def __iter__(self) -> Iterator[Any]:
+        """
+        name: __iter__
+        purpose: Yields the items in the order they were put, until the channel is closed
+        """
+        while True:
+            started = time.perf_counter()
+            chunk = self.__queue.get()
+            self.__consumer_wait += time.perf_counter() - started
+
+            if chunk is END:
+                return
+            yield from chunk
+
+    def abandon(self) -> None:
+        """
+        name: abandon
+        purpose: Tells the producer no more items will be read
+        """
+        self.__abandoned.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"items": self.__items,
+                "max_depth": self.__max_depth,
+                "mean_depth": self.__depth_total / self.__puts if self.__puts else 0.0,
+                "producer_wait": self.__producer_wait,
+                "consumer_wait": self.__consumer_wait}
+
+    def __put_chunk(self) -> None:
+        chunk, self.__chunk = self.__chunk, []
+        self.__items += len(chunk)
+        self.__put(chunk)
+
+    def __put(self, chunk: Optional[List[Any]]) -> None:
+        """
+        name: __put
+        purpose: Waits for room in the queue, giving up once the channel is abandoned
+        """
+        depth = self.__queue.qsize()
+        self.__max_depth = max(self.__max_depth, depth)
+        self.__depth_total += depth
+        self.__puts += 1
+
+        started = time.perf_counter()
+        while True:
+            if self.__abandoned.is_set():
+                raise PipelineAborted()
+            try:
+                self.__queue.put(chunk, timeout=ABANDON_POLL_INTERVAL)
+                break
+            except queue.Full:
+                pass
+        self.__producer_wait += time.perf_counter() - started
+
+
+class ChannelSink(PacketSink):
+    """
+    name: ChannelSink
+    responsibility: PacketSink handed to the parse strategies inside a pipeline. Records are
+                    put on a Channel for the writer instead of being written, as (kind, packet)
+                    pairs using the record kinds of the ResultCache. Flushes travel along with
+                    them so the writer flushes at the same points.
+    """
+
+    def __init__(self, channel: Channel) -> None:
+        self.__channel = channel
+
+    def insert_ip_packet(self, packet: IPPacket) -> bool:
+        self.__channel.put((IP_RECORD, packet))
+        return True
+
+    def insert_dhcp_packet(self, packet: DHCPPacket) -> None:
+        self.__channel.put((DHCP_RECORD, packet))
+
+    def flush(self) -> None:
+        self.__channel.put((FLUSH_RECORD, None))
+
+
+class Pipeline:
+    """
+    name: Pipeline
+    responsibility: Runs the stages of parsing one file at the same time. Every stage but the
+                    last runs in its own thread and passes its output to the next one through a
+                    Channel. The last stage, the writer, runs in the calling thread, as the
+                    database connection is bound to it.
+                    A stage that fails abandons its input, which stops the stages before it,
+                    and closes its output, so the stages after it finish what they were given.
+                    The first failure is raised from run once every stage is done.
+    """
+
+    def __init__(self) -> None:
+        self.__errors = []  # type: List[BaseException]
+        self.__threads = []  # type: List[threading.Thread]
+        self.__channels = []  # type: List[Channel]
+        self.__stage_times = []  # type: List[Tuple[str, float, Channel]]
+
+    def channel(self, name: str) -> Channel:
+        """
+        name: channel
+        purpose: Creates a Channel belonging to this pipeline
+        """
+        channel = Channel(name)
+        self.__channels.append(channel)
+        return channel
+
+    def stage(self, name: str, work: Callable[[], None], source: Optional[Channel], output: Channel) -> None:
+        """
+        name: stage
+        purpose: Starts work, reading source and writing output, in a thread. output is closed
+                 once work returns, so the stage reading it sees the end.
+        """
+        thread = threading.Thread(target=self.__run_stage, args=(name, work, source, output),
+                                  name="nic1-" + name, daemon=True)
+        self.__threads.append(thread)
+        thread.start()
+
+    def run(self, name: str, work: Callable[[], None], source: Channel) -> Dict[str, Any]:
+        """
+        name: run
+        purpose: Runs the last stage, reading source, in this thread. Waits for the others and
+                 returns the seconds every stage took and the stats of every channel.
+        """
+        self.__run_stage(name, work, source, None)
+        for thread in self.__threads:
+            thread.join()
+
+        # Stages stopped by an abandoned channel only follow the failure that caused it
+        errors = [err for err in self.__errors if not isinstance(err, PipelineAborted)]
+        if errors:
+            raise errors[0]
+
+        # A stage counts the items it read, the first one those it produced
+        return {"stages": {name: {"seconds": seconds, "items": channel.get_stats()["items"]}
+                           for name, seconds, channel in self.__stage_times},
+                "channels": {channel.name: channel.get_stats() for channel in self.__channels}}
+
+    def __run_stage(self, name: str, work: Callable[[], None], source: Optional[Channel], output: Optional[Channel]) -> None:
+        started = time.perf_counter()
+        try:
+            work()
+        except BaseException as err:
+            self.__errors.append(err)
+            if source is not None:
+                source.abandon()
+        finally:
+            counted = source if source is not None else output
+            if counted is not None:
+                self.__stage_times.append((name, time.perf_counter() - started, counted))
+
+        if output is not None:
+            try:
+                output.close()
+            except PipelineAborted as err:
+                self.__errors.append(err)
+
+
+def merge_stats(total: Dict[str, Any], stats: Dict[str, Any]) -> None:
+    """
+    name: merge_stats
+    purpose: Adds the stats of one Pipeline run to those of earlier runs
+    """
+    for name, stage in stats["stages"].items():
+        totals = total.setdefault("stages", {}).setdefault(name, {"seconds": 0.0, "items": 0})
+        totals["seconds"] += stage["seconds"]
+        totals["items"] += stage["items"]
+
+    for name, channel in stats["channels"].items():
+        totals = total.setdefault("channels", {}).setdefault(name, {"items": 0, "max_depth": 0, "depth_weight": 0.0,
+                                                                    "producer_wait": 0.0, "consumer_wait": 0.0})
+        totals["items"] += channel["items"]
+        totals["max_depth"] = max(totals["max_depth"], channel["max_depth"])
+        totals["depth_weight"] += channel["mean_depth"] * channel["items"]
+        totals["producer_wait"] += channel["producer_wait"]
+        totals["consumer_wait"] += channel["consumer_wait"]
+
+
+def format_stats(total: Dict[str, Any]) -> List[str]:
+    """
+    name: format_stats
+    purpose: Describes the stats gathered by merge_stats, one line per stage and channel
+    """
+    lines = []
+    for name, stage in total.get("stages", {}).items():
+        rate = stage["items"] / stage["seconds"] if stage["seconds"] else 0.0
+        lines.append("Stage {}: {} items in {:.2f}s, {:.0f} items/sec".format(name, stage["items"], stage["seconds"], rate))
+
+    for name, channel in total.get("channels", {}).items():
+        mean_depth = channel["depth_weight"] / channel["items"] if channel["items"] else 0.0
+        lines.append("Queue {}: depth {:.1f} mean, {} max of {} chunks, producer waited {:.2f}s, consumer waited {:.2f}s"
+                     .format(name, mean_depth, channel["max_depth"], QUEUE_SIZE, channel["producer_wait"], channel["consumer_wait"]))
+    return lines
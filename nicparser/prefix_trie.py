@@ -0,0 +1,96 @@
+from typing import List, Optional, Tuple
+
+from database.addresses import prefix_to_mask
+
+
+class PrefixNode:
+    """
+    name: PrefixNode
+    responsibility: One node of a PrefixTrie. Terminal nodes are stored prefixes, the others
+                    only branch where stored prefixes part ways.
+    """
+
+    __slots__ = ("network", "prefix", "children", "terminal")
+
+    def __init__(self, network: int, prefix: int, terminal: bool) -> None:
+        self.network = network
+        self.prefix = prefix
+        self.children = [None, None]  # type: List[Optional[PrefixNode]]
+        self.terminal = terminal
+
+
+class PrefixTrie:
+    """
+    name: PrefixTrie
+    responsibility: Compressed binary trie of IPv4 prefixes, networks being 32-bit ints and
+                    masks prefix lengths. A node is only kept where a prefix is stored or where
+                    two stored prefixes part ways, so a lookup visits at most 33 nodes however
+                    many prefixes are stored.
+    """
+
+    def __init__(self) -> None:
+        self.__root = PrefixNode(0, 0, False)
+        self.__size = 0
+
+    def __len__(self) -> int:
+        return self.__size
+
+    def insert(self, network: int, prefix: int) -> None:
+        """
+        name: insert
+        purpose: Stores the prefix, host bits of the network are cleared
+
+        """
+        network &= prefix_to_mask(prefix)
+        node = self.__root
+
+        while node.prefix < prefix:
+            bit = self.__bit(network, node.prefix)
+            child = node.children[bit]
+
+            if child is None:
+                node.children[bit] = PrefixNode(network, prefix, True)
+                self.__size += 1
+                return
+
+            # Leading bits the new prefix shares with the child
+            common = min(prefix, child.prefix, 32 - (network ^ child.network).bit_length())
+            if common == child.prefix:
+                node = child
+                continue
+
+            # The child parts ways with the new prefix above its own length, so a node is put
+            # in between, which is the new prefix itself if the child lies within it
+            branch = PrefixNode(network & prefix_to_mask(common), common, common == prefix)
+            branch.children[self.__bit(child.network, common)] = child
+            if common < prefix:
+                branch.children[self.__bit(network, common)] = PrefixNode(network, prefix, True)
+            node.children[bit] = branch
+            self.__size += 1
+            return
+
+        if not node.terminal:
+            node.terminal = True
+            self.__size += 1
+
+    def longest_match(self, ip: int) -> Optional[Tuple[int, int]]:
+        """
+        name: longest_match
+        purpose: Returns the network and prefix of the longest stored prefix holding the ip,
+                 None if there is none
+
+        """
+        match = None  # type: Optional[Tuple[int, int]]
+        node = self.__root  # type: Optional[PrefixNode]
+
+        while node is not None and (ip ^ node.network) >> (32 - node.prefix) == 0:
+            if node.terminal:
+                match = node.network, node.prefix
+            if node.prefix == 32:
+                break
+            node = node.children[self.__bit(ip, node.prefix)]
+
+        return match
+
+    def __bit(self, value: int, position: int) -> int:
+        return (value >> (31 - position)) & 1
@@ -0,0 +1,198 @@
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+
+import settings
+from database.data_packets import DHCPPacket, IPPacket
+from database.packet_sink import PacketSink
+from database.parser_interface import ParserInterface
+from nicparser.parse_options import ParseOptions
+
+
+# Bumped whenever a change to the parsers changes what they extract, so older entries are not used
+CACHE_VERSION = 3
+
+# Bytes read at a time while hashing a capture
+HASH_CHUNK_SIZE = 1 << 20
+
+# Record kinds, the first item of every stored record
+IP_RECORD = "i"
+FLOW_RECORD = "f"
+DHCP_RECORD = "d"
+FLUSH_RECORD = "x"
+
+IP_FIELDS = ("source_ip", "dest_ip", "source_mac", "dest_mac", "source_port", "dest_port", "vlan_id",
+             "host", "user_agent", "server", "first_seen", "last_seen", "packet_count", "byte_count")
+DHCP_FIELDS = ("client_ip", "client_mac", "server_ip", "server_mac", "request", "subnet_mask")
+
+
+def encode_record(kind: str, packet: Any) -> List[Any]:
+    """
+    name: encode_record
+    purpose: Flattens a packet into a list of its field values, led by its kind
+    """
+    fields = DHCP_FIELDS if kind == DHCP_RECORD else IP_FIELDS
+    return [kind] + [getattr(packet, field) for field in fields]
+
+
+def decode_record(record: List[Any]) -> Tuple[str, Any]:
+    """
+    name: decode_record
+    purpose: Rebuilds the (kind, packet) pair flattened by encode_record, flushes have no packet
+    """
+    kind = record[0]
+    if kind == FLUSH_RECORD:
+        return kind, None
+    if kind == DHCP_RECORD:
+        packet = DHCPPacket()  # type: Any
+        fields = DHCP_FIELDS  # type: Tuple[str, ...]
+    else:
+        packet = IPPacket(record[1], record[2], record[3], record[4])
+        fields = IP_FIELDS
+
+    for field, value in zip(fields, record[1:]):
+        setattr(packet, field, value)
+    return kind, packet
+
+
+class ResultRecorder(PacketSink):
+    """
+    name: ResultRecorder
+    responsibility: Sits in front of the ParserInterface and keeps a copy of every record handed
+                    to it while a file is parsed. Those records only depend on the file, the
+                    redundancy checks against the database come after them.
+                    A packet whose values were all seen earlier in the same file is redundant
+                    whatever the database holds, so it is left out. Flows are always kept.
+    """
+
+    def __init__(self, interface_object: ParserInterface) -> None:
+        self.__interface_obj = interface_object
+        self.__records = []  # type: List[List[Any]]
+        self.__seen = set()  # type: Set[Tuple[str, Any]]
+
+    def start(self) -> None:
+        """
+        name: start
+        purpose: Forgets the records and values of the previous file
+        """
+        self.__records = []
+        self.__seen = set()
+
+    def get_records(self) -> List[List[Any]]:
+        return self.__records
+
+    def insert_ip_packet(self, packet: IPPacket) -> bool:
+        values = [("ip", packet.source_ip), ("ip", packet.dest_ip), ("mac", packet.source_mac),
+                  ("mac", packet.dest_mac), ("host", packet.host), ("user_agent", packet.user_agent),
+                  ("server", packet.server)]
+        if self.__see(values):
+            self.__records.append(encode_record(IP_RECORD, packet))
+        return self.__interface_obj.insert_ip_packet(packet)
+
+    def insert_flow(self, flow: IPPacket) -> None:
+        self.__records.append(encode_record(FLOW_RECORD, flow))
+        self.__interface_obj.insert_flow(flow)
+
+    def insert_dhcp_packet(self, packet: DHCPPacket) -> None:
+        # Only the values the ParserInterface tests count, a packet testing none is never redundant
+        values = []  # type: List[Tuple[str, Any]]
+        if packet.request and packet.client_mac is not None:
+            values = [("mac", packet.client_mac)]
+        elif not packet.request and None not in (packet.client_ip, packet.server_ip, packet.client_mac, packet.server_mac):
+            values = [("ip", packet.client_ip), ("ip", packet.server_ip),
+                      ("mac", packet.client_mac), ("mac", packet.server_mac)]
+        elif not packet.request and packet.subnet_mask is not None:
+            values = [value for value in (("ip", packet.client_ip), ("mac", packet.client_mac)) if value[1] is not None]
+        if not packet.request and packet.client_ip is not None and packet.subnet_mask is not None:
+            values.append(("dhcp_subnet", (packet.client_ip, packet.subnet_mask)))
+
+        if not values or self.__see(values):
+            self.__records.append(encode_record(DHCP_RECORD, packet))
+        self.__interface_obj.insert_dhcp_packet(packet)
+
+    def flush(self) -> None:
+        # A FlowAggregator flushes whenever its buffer fills, the replay flushes at the same points
+        self.__records.append([FLUSH_RECORD])
+        self.__interface_obj.flush()
+
+    def __see(self, values: List[Tuple[str, Any]]) -> bool:
+        """
+        name: __see
+        purpose: Marks the values as seen, returning whether any of them was new
+        """
+        new = [value for value in values if value not in self.__seen]
+        self.__seen.update(new)
+        return len(new) > 0
+
+
+class ResultCache:
+    """
+    name: ResultCache
+    responsibility: Stores the records extracted from capture files in a directory, one
+                    gzipped JSON file per capture. Entries are named by a blake2b hash of the
+                    capture contents, the nic1 and cache versions and the parse options that
+                    change the records, so a renamed or moved file still hits and a changed
+                    one never does.
+    """
+
+    def __init__(self, directory: str, options: ParseOptions) -> None:
+        os.makedirs(directory, exist_ok=True)
+
+        self.__directory = directory
+        self.__salt = "nic1 {} cache {} engine {} flows {} max_flows {}\n".format(
+            settings.VERSION, CACHE_VERSION, options.engine, options.flows,
+            options.max_flows if options.flows else 0).encode("utf-8")
+        self.__hits = 0
+        self.__misses = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        return {"hits": self.__hits, "misses": self.__misses}
+
+    def key(self, file_str: str) -> str:
+        """
+        name: key
+        purpose: Hashes the file contents along with the settings of this cache
+        """
+        digest = hashlib.blake2b(self.__salt, digest_size=20)
+        with open(file_str, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def load(self, key: str) -> Optional[List[List[Any]]]:
+        """
+        name: load
+        purpose: Returns the records stored under key, None if there are none or they can not
+                 be read
+        """
+        try:
+            with gzip.open(self.__path(key), "rt", encoding="utf-8") as f:
+                records = json.load(f)
+        except (OSError, EOFError, ValueError):
+            self.__misses += 1
+            return None
+
+        self.__hits += 1
+        return records
+
+    def store(self, key: str, records: List[List[Any]]) -> None:
+        """
+        name: store
+        purpose: Writes the records under key. The entry is written to a temporary file and
+                 moved in place, so parallel writers and interrupted runs never leave a torn one
+        """
+        handle, temp_path = tempfile.mkstemp(dir=self.__directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as f:
+                json.dump(records, f, separators=(",", ":"))
+            os.replace(temp_path, self.__path(key))
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def __path(self, key: str) -> str:
+        return os.path.join(self.__directory, "{}.json.gz".format(key))
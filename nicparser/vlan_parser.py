@@ -1,8 +1,8 @@
-from pyshark.packet.packet import Packet
+from typing import Dict
 
-from database.parser_interface import ParserInterface
+from database.packet_sink import PacketSink
 from nicparser.ip_parser import IPParser
-from nicparser.parse import Parse
+from nicparser.parse import Parse, PacketView
 
 VLAN_IPV4 = 0x800
 
@@ -13,23 +13,30 @@ class VlanParser(Parse):
         Concrete VLAN parser. This takes packets with a VLAN tag and
         parses them.
         Currently it only checks for IPV4 packets.
+        Every VLAN keeps the IPParser made for its first packet.
     """
 
-    def __init__(self, interface_object: ParserInterface) -> None:
+    def __init__(self, interface_object: PacketSink) -> None:
         self.__interface_obj = interface_object
+        self.__ip_parsers = {}  # type: Dict[str, IPParser]
 
-    ## first enumerate packet layers
-    ## then check up from ethernet layer
-    def parse_interface(self, this_packet: Packet) -> None:
+    ## layers were enumerated by the PacketView
+    ## check up from ethernet layer
+    def parse_interface(self, this_packet: PacketView) -> None:
         """"
           name: parse_interface
           purpose: Concrete Vlan parser
         """
 
+        vlan_layer = this_packet.layer("vlan")
         try:
-            if int(this_packet.vlan.etype, 16) != VLAN_IPV4:
+            if int(vlan_layer.etype, 16) != VLAN_IPV4:
                 raise ValueError
+            vlan_id = str(vlan_layer.id)
+            ip_parser = self.__ip_parsers.get(vlan_id)
+            if ip_parser is None:
+                ip_parser = self.__ip_parsers[vlan_id] = IPParser(self.__interface_obj, int(vlan_id))
         except (AttributeError, ValueError):
             pass
         else:
-            IPParser(self.__interface_obj, int(this_packet.vlan.id)).parse_interface(this_packet)
+            ip_parser.parse_interface(this_packet)
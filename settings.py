@@ -1,5 +1,7 @@
 """nic1 Settings"""
 
+from typing import Optional
+
 # Current NIC1 version
 VERSION = "0.5"
 
@@ -25,3 +27,13 @@ SDIOS_CREDS = {
     "client_id": "",
     "client_secret": ""
 }
+
+# Refresh the SDI OS tokens from a background thread shortly before they expire,
+# instead of checking them before every call.
+SDIOS_BACKGROUND_REFRESH = True
+
+# File the SDI OS tokens are cached in between runs, so a new run can skip
+# fetching them with the credentials above. It is created readable by the
+# owner only. Set to None to disable the cache.
+# Example "~/.nic1_tokens"
+SDIOS_TOKEN_CACHE = None  # type: Optional[str]
@@ -1,7 +1,9 @@
 from typing import Any, Dict, Iterator
 
 
-class Capture: ...
+class Capture:
+    def close(self) -> None: ...
+
 class FileCapture(Capture):
     def __init__(self,
             input_file: str=None,
@@ -5,6 +5,8 @@ from pyshark.packet.layer import Layer
 
 class Packet(Pickleable):
     layers = None # type: Iterable[Layer]
+    sniff_timestamp = None # type: str
+    length = None # type: int
 
     def __init__(self,
             layers: List[Layer]=None,
@@ -5,6 +5,8 @@ from oauthlib.oauth2 import Client
 
 
 class OAuth2Session(Session):
+    token = None # type: Dict[Any, Any]
+
     def __init__(self,
             client_id: str=None,
             client: Client=None,